@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Micro-benchmark of ``format_sse_event``.
+
+Compares the formatter with the previous implementation, which returned
+``str`` that had to be encoded again before being sent to the client, on
+two paths:
+
+- ``format``: formatting an event message;
+- ``payload``: formatting an event received from the broker, as the hubs
+  do. The data is then taken from the payload instead of being serialized
+  again, which is where most of the time is saved.
+
+::
+
+    $ python benchmarks/bench_format.py
+    $ python benchmarks/bench_format.py --codec \
+        invenio_sse.codecs:fastest_codec
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import timeit
+
+from invenio_sse.hub import Event
+from invenio_sse.utils import format_sse_event, obj_or_import_string
+
+EVENTS = {
+    'small': {'data': 'hello', 'id': 1234567890, 'event': 'edit'},
+    'record': {
+        'data': {
+            'title': 'A title',
+            'creators': [{'name': 'Doe, John'}, {'name': 'Doe, Jane'}],
+            'keywords': ['sse', 'redis', 'invenio'] * 5,
+            'description': 'lorem ipsum dolor sit amet ' * 20,
+        },
+        'id': 1234567890,
+        'event': 'edit',
+        'retry': 5000,
+    },
+}
+
+
+def legacy_format_sse_event(event):
+    """Format an event as the previous implementation, then encode it."""
+    lines = [
+        'data: {0}'.format(line)
+        for line in json.dumps(event['data']).splitlines()
+    ]
+    if event.get('event'):
+        lines.insert(0, 'event:{event}'.format(**event))
+    if event.get('id'):
+        lines.append('id:{id}'.format(**event))
+    if event.get('retry'):
+        lines.append('retry:{retry}'.format(**event))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def legacy_format_payload(payload):
+    """Decode a payload and format its event as previously."""
+    return legacy_format_sse_event(
+        Event('sse', json.loads(payload.decode('utf-8'))).message)
+
+
+def bench(func, event, number, repeat):
+    """Get the best time per call in microseconds."""
+    timer = timeit.Timer(lambda: func(event))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--number', type=int, default=100000)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--codec', default='invenio_sse.codecs:JSONCodec',
+                        help='Import path of the codec of the new formatter.')
+    args = parser.parse_args()
+    codec = obj_or_import_string(args.codec)()
+
+    def current_format_sse_event(event):
+        return format_sse_event(event, codec=codec)
+
+    def current_format_payload(payload):
+        return Event.from_payload('sse', payload, codec=codec).frame
+
+    print('{0:<18}{1:>12}{2:>12}{3:>10}'.format(
+        'event', 'legacy (us)', 'bytes (us)', 'speedup'))
+    for name, event in sorted(EVENTS.items()):
+        # as published by _SSEState, with the data last
+        message = dict(event)
+        message['data'] = message.pop('data')
+        payload = json.dumps(message).encode('utf-8')
+        assert legacy_format_sse_event(event) == format_sse_event(event)
+        assert legacy_format_payload(payload) == \
+            Event.from_payload('sse', payload).frame
+        for path, legacy_func, current_func, arg in (
+                ('format', legacy_format_sse_event,
+                 current_format_sse_event, event),
+                ('payload', legacy_format_payload,
+                 current_format_payload, payload)):
+            legacy = bench(legacy_func, arg, args.number, args.repeat)
+            current = bench(current_func, arg, args.number, args.repeat)
+            print('{0:<18}{1:>12.3f}{2:>12.3f}{3:>9.2f}x'.format(
+                '{0} {1}'.format(name, path), legacy, current,
+                legacy / current))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Benchmark suite of Invenio-SSE.
+
+Measures, against a Redis server, `fakeredis
+<https://pypi.org/project/fakeredis/>`_ or another broker:
+
+- ``format``: events formatted per second by ``format_sse_event``;
+- ``publish``: events published per second, one by one and in batches;
+- ``latency``: time from ``publish()`` to the formatted event yielded by
+  ``messages()``;
+- ``memory``: Python memory allocated per idle subscriber.
+
+Run it with Invenio-SSE installed, e.g. with ``pip install -e .[tests]``, and
+save the results to compare them with the ones of another version::
+
+    $ python benchmarks/bench_sse.py --redis-url redis://localhost:6379/15
+    $ python benchmarks/bench_sse.py --fakeredis --json results.json
+    $ python benchmarks/bench_sse.py --fakeredis --compare results.json
+    $ python benchmarks/bench_sse.py \
+        --broker invenio_sse.brokers.memory:MemoryBroker
+
+The Redis database is not flushed, use a dedicated one.
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from bench_format import EVENTS
+from flask import Flask
+
+from invenio_sse import InvenioSSE
+from invenio_sse.utils import HEARTBEAT, format_sse_event
+
+
+def create_app(args):
+    """Create the application and return it with the SSE state."""
+    app = Flask('bench_sse')
+    if args.fakeredis:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        app.config['SSE_REDIS_CLIENT_FACTORY'] = \
+            lambda app, role: fakeredis.FakeStrictRedis(server=server)
+    app.config.update(
+        SSE_BROKER=args.broker,
+        SSE_REDIS_URL=args.redis_url,
+        SSE_JSON_CODEC=args.codec,
+        SSE_SUBSCRIBER_QUEUE_SIZE=0,
+        SSE_IDLE_TIMEOUT=None,
+        SSE_HEARTBEAT_INTERVAL=0.1,
+    )
+    InvenioSSE(app)
+    return app, app.extensions['invenio-sse']
+
+
+def percentile(values, percent):
+    """Get a percentile of sorted values."""
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def bench_format(state, args):
+    """Measure the events formatted per second."""
+    results = {}
+    for name, event in sorted(EVENTS.items()):
+        start = time.perf_counter()
+        for _ in range(args.number):
+            format_sse_event(event, codec=state.codec)
+        results[name] = args.number / (time.perf_counter() - start)
+    return {'format.{0}.events_per_sec'.format(name): value
+            for name, value in results.items()}
+
+
+def bench_publish(state, args):
+    """Measure the events published per second."""
+    data = EVENTS['record']['data']
+    start = time.perf_counter()
+    for _ in range(args.events):
+        state.publish(data, channel='bench-publish')
+    single = args.events / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with state.batch() as batch:
+        for _ in range(args.events):
+            batch.publish(data, channel='bench-publish')
+    batched = args.events / (time.perf_counter() - start)
+    return {
+        'publish.single.events_per_sec': single,
+        'publish.batch.events_per_sec': batched,
+    }
+
+
+def bench_latency(state, args):
+    """Measure the time from publish to formatted event, in milliseconds."""
+    messages = state.messages(channel='bench-latency')
+    # Wait for the subscription, the first events may be published before.
+    while True:
+        state.publish('warmup', channel='bench-latency')
+        if next(messages) != HEARTBEAT:
+            break
+    latencies = []
+    try:
+        for i in range(args.events):
+            start = time.perf_counter()
+            state.publish(i, channel='bench-latency')
+            frame = next(messages)
+            while frame == HEARTBEAT or b'warmup' in frame:
+                frame = next(messages)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        messages.close()
+    latencies.sort()
+    return {
+        'latency.p50_ms': percentile(latencies, 50),
+        'latency.p95_ms': percentile(latencies, 95),
+        'latency.p99_ms': percentile(latencies, 99),
+    }
+
+
+def bench_memory(state, args):
+    """Measure the memory allocated per idle subscriber, in bytes."""
+    results = {}
+    for count in args.subscribers:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        subscriptions = [state.hub.subscribe(['bench-idle'])
+                         for _ in range(count)]
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        for subscription in subscriptions:
+            subscription.close()
+        results['memory.{0}.bytes_per_subscriber'.format(count)] = \
+            float(after - before) / count
+    return results
+
+
+BENCHMARKS = {
+    'format': bench_format,
+    'publish': bench_publish,
+    'latency': bench_latency,
+    'memory': bench_memory,
+}
+
+
+def main():
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help='Benchmarks to run: {0} (default: all).'.format(
+                            ', '.join(sorted(BENCHMARKS))))
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15')
+    parser.add_argument('--fakeredis', action='store_true',
+                        help='Use fakeredis instead of a Redis server.')
+    parser.add_argument('--broker',
+                        default='invenio_sse.brokers.redis:RedisBroker',
+                        help='Import path of the broker.')
+    parser.add_argument('--codec', default='invenio_sse.codecs:JSONCodec',
+                        help='Import path of the JSON codec.')
+    parser.add_argument('--number', type=int, default=100000,
+                        help='Events formatted per event kind.')
+    parser.add_argument('--events', type=int, default=2000,
+                        help='Events published and received.')
+    parser.add_argument('--subscribers', type=lambda value: [
+        int(count) for count in value.split(',')], default=[1000, 10000],
+        help='Comma-separated numbers of idle subscribers.')
+    parser.add_argument('--json', help='Save the results to a JSON file.')
+    parser.add_argument('--compare', help='Compare with saved results.')
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark {0}'.format(name))
+
+    app, state = create_app(args)
+    results = {}
+    with app.app_context():
+        for name in args.benchmarks or sorted(BENCHMARKS):
+            results.update(BENCHMARKS[name](state, args))
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as fp:
+            previous = json.load(fp)
+    for name, value in sorted(results.items()):
+        line = '{0:<42}{1:>14.3f}'.format(name, value)
+        if previous.get(name):
+            line += '{0:>+10.1f}%'.format(
+                (value - previous[name]) / previous[name] * 100)
+        print(line)
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
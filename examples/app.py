@@ -52,7 +52,7 @@ Send a message through the console:
 
 from __future__ import absolute_import, print_function
 
-from flask import Blueprint, Flask, current_app, render_template, request
+from flask import Blueprint, Flask, render_template, request
 
 from invenio_sse import InvenioSSE
 from invenio_sse.proxies import current_sse
@@ -73,14 +73,20 @@ blueprint = Blueprint(
 def sse():
     """Stream server-sent events.
 
-    Use ``channel`` URL argument to stream events from a different channel
-    than the default, ``sse``.
+    Use ``channel`` URL arguments to stream events from different channels
+    than the default, ``sse``, and ``pattern`` URL arguments to stream events
+    from all the channels matching a pattern, e.g.
+    ``/sse?channel=project-1&pattern=user-1-*``. When streaming several
+    channels, the data of each event tells its channel. Use ``type`` URL
+    arguments to only receive events of some types.
     """
-    channel = request.args.get('channel', 'sse')
+    channels = request.args.getlist('channel') or ['sse']
+    patterns = request.args.getlist('pattern')
+    types = request.args.getlist('type')
 
-    return current_app.response_class(
-        current_sse.messages(channel=channel),
-        mimetype='text/event-stream',
+    return current_sse.response(
+        current_sse.messages(channel=channels, patterns=patterns,
+                             types=types),
     )
 
 app.register_blueprint(blueprint)
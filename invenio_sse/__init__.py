@@ -47,12 +47,12 @@ You initialize Invenio SSE like a normal Flask extension:
 >>> @blueprint.route("/sse")
 ... def sse():
 ...     channel = request.args.get('channel', 'sse')
-...     return current_app.response_class(
-...         current_sse.messages(channel=channel),
-...         mimetype='text/event-stream',
-...     )
+...     return current_sse.response(current_sse.messages(channel=channel))
 >>> app.register_blueprint(blueprint)
 
+``current_sse.response()`` compresses the stream with gzip or deflate when
+``SSE_COMPRESSION`` is enabled and the client accepts it.
+
 In order for the following examples to work, you need to work within an
 Flask application context so let's push one:
 
@@ -94,6 +94,15 @@ channel to publish the message:
 >>> res.status_code
 200
 
+Several messages can be sent through a single Redis round-trip by publishing
+them in a batch:
+
+>>> with current_sse.batch() as batch:
+...     batch.publish({'code': 'ACK', 'msg': 'first'}, channel='cool_channel')
+...     batch.publish({'code': 'ACK', 'msg': 'second'}, channel='cool_channel')
+>>> len(batch.results)
+2
+
 Publishing messages from the command line:
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 You can also publish messages using the CLI that this package provides (we will
@@ -106,6 +115,9 @@ use the example app):
     $ echo '{"code": "ACK", "msg": "cool message"}' | \
       flask sse publish --channel cool_channel
 
+Use ``--lines`` to publish each line of the input as a separate event, in a
+single batch.
+
 To see more about the CLI ``flask sse publish --help``.
 
 Receiving messages
@@ -139,6 +151,11 @@ we send in the examples above:
     }
 
 
+A single connection can also stream several channels, e.g.
+``/sse?channel=cool_channel&channel=other_channel`` in the example
+application, in which case the data of each event is
+``{"channel": ..., "data": ...}``.
+
 You can find a complete example on how to use Invenio-SSE in the examples
 folder.
 """
@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Asyncio streaming of server-sent events.
+
+Holding a connection open with :meth:`invenio_sse.ext._SSEState.messages`
+blocks a WSGI worker thread for its whole lifetime. On an asyncio server a
+single event loop can instead hold a large number of idle connections:
+
+.. code-block:: python
+
+    from invenio_sse.aio import create_asgi_app
+
+    def authorize(scope, channels, patterns):
+        return all(channel.startswith('public:') for channel in channels)
+
+    sse_app = create_asgi_app(app, authorize)
+
+The ASGI application streams the channels given in the ``channel`` query
+arguments, optionally restricted to the event types given in ``type``
+arguments, like the ``/sse`` endpoint of the example application, once
+``authorize`` accepted them. Channel patterns, given in ``pattern``
+arguments, must be enabled explicitly. As on the WSGI endpoints, the events
+published after the ``Last-Event-ID`` header of a request are replayed from
+the channel history. Use
+:meth:`invenio_sse.ext._SSEState.messages_async` and :func:`send_events` to
+build your own endpoints.
+
+This module requires ``redis>=5.0.0``, which ships an asyncio client.
+"""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+import inspect
+import logging
+import weakref
+from operator import attrgetter
+
+try:
+    from urllib.parse import parse_qs
+except ImportError:  # pragma: no cover
+    from urlparse import parse_qs
+
+from .coalesce import Throttle
+from .compression import StreamCompressor, negotiate_encoding
+from .hub import SSEHub, Subscription
+from .utils import HEARTBEAT, format_sse_retry
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSubscription(Subscription):
+    """A single SSE client listening to a channel of an asyncio hub."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the subscription.
+
+        Accepts the same arguments as :class:`invenio_sse.hub.Subscription`.
+        """
+        super(AsyncSubscription, self).__init__(*args, **kwargs)
+        self._wakeup = asyncio.Event()
+        self._ready = asyncio.Event()
+        if self.ready.is_set():
+            self._ready.set()
+
+    def confirm(self, key):
+        """Mark the Redis subscription of a channel or pattern as confirmed.
+
+        :param key: ``('channel', name)`` or ``('pattern', name)``.
+        """
+        super(AsyncSubscription, self).confirm(key)
+        if self.ready.is_set():
+            self._ready.set()
+
+    async def wait_ready(self, timeout=None):
+        """Wait until Redis confirmed all the subscriptions.
+
+        :param timeout: Optional maximum time to wait, in seconds.
+        :returns: Whether the subscription is ready.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready.is_set()
+
+    def put(self, event):
+        """Enqueue an event, applying the overflow policy if it is full.
+
+        :returns: The number of dropped events.
+        """
+        dropped = self._push(event)
+        self._wakeup.set()
+        return dropped
+
+    async def get(self):
+        """Wait for the next :class:`~invenio_sse.hub.Event`.
+
+        :returns: The event, or ``None`` once the subscription is closed and
+                  all its events consumed.
+        """
+        while not self._events and not self.closed:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        return self._pop()
+
+    def stop(self, retry=None, discard=False):
+        """End the stream once the pending events are consumed.
+
+        :param retry: Optional reconnection time hint for the client, in
+                      milliseconds.
+        :param discard: Drop the pending events instead, e.g. when the
+                        client lost access to them.
+        """
+        if discard:
+            self._events.clear()
+        self._close(retry)
+        self._wakeup.set()
+
+
+class AsyncSSEHub(SSEHub):
+    """Asyncio counterpart of :class:`invenio_sse.hub.SSEHub`.
+
+    One hub is used per event loop. It owns a single asyncio Redis pub/sub
+    connection and a reader task dispatching the events to the subscribers
+    of each channel and pattern.
+    """
+
+    subscription_class = AsyncSubscription
+
+    def __init__(self, redis, queue_size=0, overflow='drop_oldest',
+                 overflow_retry=None, codec=None, instrumentation=None,
+                 backoff=None, drop_retry=None):
+        """Initialize the hub.
+
+        :param redis: An asyncio Redis client, or any client of a broker
+                      whose ``pubsub()`` is an asyncio pub/sub, see
+                      :meth:`invenio_sse.brokers.Broker.async_client`.
+        :param queue_size: Maximum number of pending messages per subscriber.
+        :param overflow: Policy applied to subscribers whose queue is full,
+                         see :data:`invenio_sse.hub.OVERFLOW_POLICIES`.
+        :param overflow_retry: Reconnection time sent to subscribers
+                               disconnected because of overflow.
+        :param codec: Codec of the published payloads.
+        :param instrumentation: Optional
+            :class:`invenio_sse.instrumentation.Instrumentation`.
+        :param backoff: :class:`invenio_sse.hub.Backoff` between the attempts
+                        to reconnect to Redis.
+        :param drop_retry: Optional range of the reconnection time sent to
+                           the subscribers dropped when Redis is unreachable.
+        """
+        super(AsyncSSEHub, self).__init__(
+            redis.pubsub, queue_size=queue_size, overflow=overflow,
+            overflow_retry=overflow_retry, codec=codec,
+            instrumentation=instrumentation, backoff=backoff,
+            drop_retry=drop_retry)
+        self._task = None
+        self._commands = asyncio.Lock()
+
+    async def subscribe(self, channels, patterns=(), types=None,
+                        predicate=None):
+        """Register a new subscriber to channels and channel patterns.
+
+        :param channels: Name or list of names of the channels.
+        :param patterns: List of channel patterns.
+        :param types: Optional list of accepted event types.
+        :param predicate: Optional callable filtering events on their data.
+        :returns: An :class:`AsyncSubscription`.
+        """
+        subscription = self._subscription(
+            channels, patterns, types=types, predicate=predicate)
+        async with self._commands:
+            if self._pubsub is None:
+                self._pubsub = self._pubsub_factory()
+            for key in subscription.keys:
+                subscribers = self._subscriptions.setdefault(key, set())
+                if not subscribers:
+                    await self._send('subscribe', key)
+                if key in self._confirmed:
+                    subscription.confirm(key)
+                subscribers.add(subscription)
+            if self._task is None:
+                self._task = asyncio.ensure_future(self._run())
+        if self.instrumentation is not None:
+            self.instrumentation.subscribed(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        """Remove a subscriber, unsubscribing the channels it was the last of.
+
+        :param subscription: An :class:`AsyncSubscription` of this hub.
+        """
+        removed = False
+        async with self._commands:
+            for key in subscription.keys:
+                subscribers = self._subscriptions.get(key)
+                if subscribers is None or subscription not in subscribers:
+                    continue
+                removed = True
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[key]
+                    self._confirmed.discard(key)
+                    if self._pubsub is None:
+                        # reconnecting, only the remaining keys are
+                        # subscribed again
+                        continue
+                    try:
+                        await self._send('unsubscribe', key)
+                    except self.connection_errors:
+                        logger.debug('SSE hub could not unsubscribe %s, '
+                                     'its connection is broken.', key[1])
+        if removed and self.instrumentation is not None:
+            self.instrumentation.unsubscribed(subscription)
+
+    async def messages(self, channel='sse', patterns=None, heartbeat=None,
+                       types=None, predicate=None, throttle=None,
+                       history=None):
+        """Asynchronous message generator from the given channels.
+
+        :param channel: Name or list of names of the channels.
+        :param patterns: List of channel patterns.
+        :param heartbeat: Seconds without events after which a comment is
+                          sent.
+        :param types: Optional list of accepted event types.
+        :param predicate: Optional callable filtering events on their data.
+        :param throttle: Optional minimum time in seconds between two events
+                         of the same channel and type, see
+                         :class:`invenio_sse.coalesce.Throttle`.
+        :param history: Optional coroutine function called with the channel
+                        once subscribed, returning the events to replay
+                        before the live ones. Ignored when listening to
+                        several channels or to patterns.
+        """
+        subscription = await self.subscribe(
+            channel, patterns or (), types=types, predicate=predicate)
+        multiplexed = subscription.multiplexed
+        frame = attrgetter('channel_frame' if multiplexed else 'frame')
+        throttle = Throttle(throttle) if throttle else None
+        try:
+            replayed = None
+            if history is not None and not multiplexed:
+                # Live events published while reading the history are
+                # queued by the subscription and skipped below.
+                await subscription.wait_ready(self.poll_timeout)
+                replayed = set()
+                for event in await history(subscription.channels[0]):
+                    replayed.add(event.id)
+                    if subscription.accepts(event):
+                        yield event.frame
+            while True:
+                timeout = heartbeat
+                if throttle is not None:
+                    wait = throttle.timeout()
+                    if wait is not None and (timeout is None or
+                                             wait < timeout):
+                        timeout = wait
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), timeout)
+                except asyncio.TimeoutError:
+                    due = throttle.due() if throttle is not None else ()
+                    if not due:
+                        yield HEARTBEAT
+                    for event in due:
+                        yield frame(event)
+                    continue
+                if event is None:
+                    for event in throttle.flush() if throttle else ():
+                        yield frame(event)
+                    if subscription.retry is not None:
+                        yield format_sse_retry(subscription.retry)
+                    return
+                if replayed:
+                    if event.id in replayed:
+                        continue
+                    replayed = None
+                if throttle is not None:
+                    send = throttle.offer(event)
+                    for due in throttle.due():
+                        yield frame(due)
+                    if not send:
+                        continue
+                yield frame(event)
+        finally:
+            await self.unsubscribe(subscription)
+
+    async def _run(self):
+        """Read messages from Redis until no subscriber is left."""
+        try:
+            while self._subscriptions:
+                pubsub = self._pubsub
+                try:
+                    message = await pubsub.get_message(
+                        timeout=self.poll_timeout)
+                except self.connection_errors:
+                    logger.warning('SSE hub lost its Redis connection, '
+                                   'reconnecting.', exc_info=True)
+                    self._discard(pubsub)
+                    if not await self._reconnect():
+                        logger.error(
+                            'SSE hub could not reconnect to Redis.')
+                        self._stop()
+                        return
+                    continue
+                if message:
+                    self.dispatch(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('SSE hub lost its Redis connection.')
+            self._stop()
+        finally:
+            self._task = None
+
+    async def _reconnect(self):
+        """Open a new pub/sub connection, waiting between the attempts."""
+        for attempt, delay in enumerate(self.backoff.delays(), 1):
+            await asyncio.sleep(delay)
+            try:
+                await self._resubscribe()
+                return True
+            except self.connection_errors:
+                logger.warning('SSE hub failed to reconnect to Redis '
+                               '(attempt %d).', attempt)
+                self._discard(self._pubsub)
+        return False
+
+    async def _resubscribe(self):
+        """Subscribe a new pub/sub connection to all the channels."""
+        async with self._commands:
+            if self._pubsub is None:
+                self._pubsub = self._pubsub_factory()
+            self._confirmed = set()
+            for key in list(self._subscriptions):
+                await self._send('subscribe', key)
+
+    def _close(self, pubsub):
+        """Close a pub/sub connection, ignoring errors."""
+        async def close():
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
+        asyncio.ensure_future(close())
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub(state):
+    """Get the asyncio hub of a SSE state for the running event loop.
+
+    :param state: The :class:`invenio_sse.ext._SSEState`.
+    :returns: An :class:`AsyncSSEHub`.
+    """
+    loop = asyncio.get_event_loop()
+    hubs = _hubs.setdefault(loop, weakref.WeakKeyDictionary())
+    if state not in hubs:
+        hubs[state] = AsyncSSEHub(
+            state.broker.async_client(),
+            queue_size=state.app.config['SSE_SUBSCRIBER_QUEUE_SIZE'],
+            overflow=state.app.config['SSE_SUBSCRIBER_OVERFLOW'],
+            overflow_retry=state.app.config['SSE_SUBSCRIBER_OVERFLOW_RETRY'],
+            codec=state.codec,
+            instrumentation=state.instrumentation,
+            backoff=state.backoff,
+            drop_retry=state.app.config['SSE_REDIS_RECONNECT_CLIENT_RETRY'],
+        )
+    return hubs[state]
+
+
+async def messages(state, channel='sse', patterns=None, types=None,
+                   predicate=None, throttle=None, last_event_id=None):
+    """Asynchronous message generator from the given channels.
+
+    :param state: The :class:`invenio_sse.ext._SSEState`.
+    :param channel: Name or list of names of the channels.
+    :param patterns: List of channel patterns.
+    :param types: Optional list of accepted event types.
+    :param predicate: Optional predicate on the data of the events, or name
+                      of a registered one.
+    :param throttle: Optional minimum time in seconds between two events of
+                     the same channel and type.
+    :param last_event_id: ID of the last event received by the client; the
+                          events published after it are replayed from the
+                          channel history, if enabled.
+    """
+    history = None
+    if last_event_id and state.app.config['SSE_HISTORY_MAXLEN']:
+        async def history(channel):
+            # The brokers read their history with blocking calls.
+            return await asyncio.get_event_loop().run_in_executor(
+                None, state.history, channel, last_event_id)
+    frames = get_hub(state).messages(
+        channel, patterns=patterns,
+        heartbeat=state.app.config['SSE_HEARTBEAT_INTERVAL'],
+        types=types, predicate=state.get_predicate(predicate),
+        throttle=throttle, history=history)
+    instrumentation = state.instrumentation
+    try:
+        async for frame in frames:
+            if instrumentation is not None:
+                instrumentation.written(len(frame))
+            yield frame
+    finally:
+        await frames.aclose()
+
+
+async def send_events(send, receive, messages, headers=None):
+    """Stream SSE frames as an ASGI HTTP response.
+
+    The stream ends when the client disconnects or the generator is
+    exhausted; the generator is closed in both cases.
+
+    :param send: The ASGI ``send`` callable.
+    :param receive: The ASGI ``receive`` callable.
+    :param messages: An asynchronous generator of SSE frames, e.g.
+                     :meth:`invenio_sse.ext._SSEState.messages_async`.
+    :param headers: Optional list of additional ``(name, value)`` headers.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+        ] + list(headers or []),
+    })
+
+    async def stream():
+        async for frame in messages:
+            await send({
+                'type': 'http.response.body',
+                'body': frame,
+                'more_body': True,
+            })
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(stream()),
+             asyncio.ensure_future(disconnect())]
+    try:
+        done, _ = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await messages.aclose()
+
+
+async def compress_frames(frames, compressor):
+    """Compress the frames of an asynchronous stream.
+
+    :param frames: Asynchronous generator of SSE frames.
+    :param compressor: A :class:`invenio_sse.compression.StreamCompressor`.
+    """
+    try:
+        yield compressor.preamble
+        async for frame in frames:
+            yield compressor.compress(frame)
+        yield compressor.finish()
+    finally:
+        await frames.aclose()
+
+
+async def send_error(send, status):
+    """Send an empty ASGI HTTP response with an error status.
+
+    :param send: The ASGI ``send`` callable.
+    :param status: The HTTP status code.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-length', b'0')],
+    })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def create_asgi_app(app, authorize, default_channel='sse',
+                    allow_patterns=False):
+    """Create an ASGI application streaming server-sent events.
+
+    :param app: The Flask application with Invenio-SSE initialized.
+    :param authorize: Function or coroutine function called with the ASGI
+                      scope, the list of channels and the list of patterns
+                      of a request, returning whether it may stream them.
+                      Refused requests get a 403 response.
+    :param default_channel: Channel used when the request has no
+                            ``channel`` query argument.
+    :param allow_patterns: Whether requests may subscribe to channel
+                           patterns, otherwise they get a 400 response.
+    :returns: An ASGI application, serving only HTTP requests. Requests
+              with a ``Last-Event-ID`` header first receive the events they
+              missed, when ``SSE_HISTORY_MAXLEN`` is set.
+    """
+    state = app.extensions['invenio-sse']
+
+    config = app.config
+
+    async def sse(scope, receive, send):
+        if scope['type'] != 'http':
+            # Neither the lifespan nor the websocket protocols are used.
+            return
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        channels = query.get('channel', [default_channel])
+        patterns = query.get('pattern', [])
+        if patterns and not allow_patterns:
+            return await send_error(send, 400)
+        allowed = authorize(scope, channels, patterns)
+        if inspect.isawaitable(allowed):
+            allowed = await allowed
+        if not allowed:
+            return await send_error(send, 403)
+
+        request_headers = dict(scope.get('headers', ()))
+        last_event_id = request_headers.get(b'last-event-id')
+        messages = state.messages_async(
+            channel=channels,
+            patterns=patterns or None,
+            types=query.get('type'),
+            last_event_id=last_event_id and last_event_id.decode('latin-1'),
+        )
+        headers = []
+        if config['SSE_COMPRESSION']:
+            headers.append((b'vary', b'Accept-Encoding'))
+            encoding = negotiate_encoding(
+                request_headers.get(
+                    b'accept-encoding', b'').decode('latin-1'),
+                config['SSE_COMPRESSION_ENCODINGS'])
+            if encoding:
+                headers.append(
+                    (b'content-encoding', encoding.encode('latin-1')))
+                messages = compress_frames(messages, StreamCompressor(
+                    encoding, level=config['SSE_COMPRESSION_LEVEL'],
+                    dictionary=config['SSE_COMPRESSION_DICTIONARY']))
+        await send_events(send, receive, messages, headers=headers)
+
+    return sse
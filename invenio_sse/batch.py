@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Batched publishing of server-sent events."""
+
+from __future__ import absolute_import, print_function
+
+import time
+
+
+class PublishBatch(object):
+    """Buffer events and publish them to the broker in batches.
+
+    Events are flushed when the batch holds ``max_size`` events, when the
+    oldest buffered event is older than ``max_delay`` seconds while adding a
+    new one, and when leaving the ``with`` block without error.
+    """
+
+    def __init__(self, state, max_size=100, max_delay=None):
+        """Initialize the batch.
+
+        :param state: The :class:`invenio_sse.ext._SSEState`.
+        :param max_size: Maximum number of buffered events.
+        :param max_delay: Maximum time in seconds an event stays buffered.
+        """
+        self.state = state
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.results = []
+        self._events = []
+        self._started = None
+
+    def __enter__(self):
+        """Start buffering events."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Flush the buffered events, or drop them on error."""
+        if exc_type is None:
+            self.flush()
+        else:
+            self._events = []
+
+    def __len__(self):
+        """Get the number of buffered events."""
+        return len(self._events)
+
+    def publish(self, data, type_=None, id_=None, retry=None, channel='sse'):
+        """Buffer an event.
+
+        Accepts the same arguments as
+        :meth:`invenio_sse.ext._SSEState.publish`.
+        """
+        if not self._events:
+            self._started = time.time()
+        self._events.append(
+            (channel, self.state._message(channel, data, type_, id_, retry)))
+        if len(self._events) >= self.max_size or (
+                self.max_delay is not None and
+                time.time() - self._started >= self.max_delay):
+            self.flush()
+
+    def flush(self):
+        """Publish the buffered events at once, e.g. through a pipeline.
+
+        :returns: The number of subscribers that received each event.
+        """
+        if not self._events:
+            return []
+        events, self._events = self._events, []
+        results = self.state.broker.publish_many(events)
+        instrumentation = self.state.instrumentation
+        if instrumentation is not None:
+            for (channel, _), subscribers in zip(events, results):
+                instrumentation.published(channel, subscribers)
+        self.results.extend(results)
+        return results
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Brokers carrying the events from the publishers to the subscribers.
+
+The broker is set with ``SSE_BROKER``:
+
+- :class:`RedisBroker` (default) uses Redis pub/sub, and Redis streams for
+  the history;
+- :class:`MemoryBroker` delivers the events within the process, for
+  single-process deployments and tests;
+- :class:`PostgreSQLBroker` uses PostgreSQL ``LISTEN``/``NOTIFY``.
+
+A broker publishes event messages and creates pub/sub connections with the
+interface of the Redis ones, consumed by the hubs of
+:mod:`invenio_sse.hub`; see :class:`Broker`.
+"""
+
+from .base import Broker
+from .memory import MemoryBroker
+from .postgresql import PostgreSQLBroker
+from .redis import RedisBroker
+
+__all__ = ('Broker', 'MemoryBroker', 'PostgreSQLBroker', 'RedisBroker')
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Base class of the brokers."""
+
+from __future__ import absolute_import, print_function
+
+from ..codecs import default_codec
+from ..hub import SSEHub
+
+
+class Broker(object):
+    """Interface of the brokers.
+
+    Pub/sub connections returned by :meth:`pubsub` provide the subset of
+    :class:`redis.client.PubSub` used by :class:`invenio_sse.hub.SSEHub`:
+    ``subscribe()``, ``unsubscribe()``, ``psubscribe()``,
+    ``punsubscribe()``, ``get_message(timeout)`` and ``close()``, with
+    messages as returned by Redis.
+    """
+
+    hub_class = SSEHub
+    """Class of the hubs consuming the pub/sub connections."""
+
+    assigns_ids = False
+    """Whether the broker numbers the messages published without ID, see
+    :class:`invenio_sse.ids.RedisCounterIDGenerator`."""
+
+    def __init__(self, app, codec=None):
+        """Initialize the broker.
+
+        :param app: An instance of :class:`flask.Flask`.
+        :param codec: Codec serializing the messages, see
+                      :mod:`invenio_sse.codecs`.
+        """
+        self.app = app
+        self.codec = codec or default_codec
+
+    def publish(self, channel, message):
+        """Publish an event message.
+
+        :param channel: Name of the channel.
+        :param message: Dictionary with the ``data``, ``event``, ``id`` and
+                        ``retry`` fields of the event.
+        :returns: The number of subscribers that received it, or ``None`` if
+                  the broker cannot tell.
+        """
+        raise NotImplementedError()
+
+    def publish_many(self, messages):
+        """Publish several event messages.
+
+        :param messages: List of ``(channel, message)``.
+        :returns: The result of :meth:`publish` for each message.
+        """
+        return [self.publish(channel, message)
+                for channel, message in messages]
+
+    def history(self, channel, last_event_id):
+        """Get the events published to a channel after the given one.
+
+        :param channel: Name of the channel.
+        :param last_event_id: ID of the last event received by the client.
+        :returns: List of :class:`invenio_sse.hub.Event`, empty when the
+                  broker keeps no history.
+        """
+        return []
+
+    def pubsub(self):
+        """Create a pub/sub connection."""
+        raise NotImplementedError()
+
+    def async_client(self):
+        """Create a client whose ``pubsub()`` is an asyncio pub/sub.
+
+        :raises RuntimeError: If the broker does not support asyncio.
+        """
+        raise RuntimeError(
+            '{0} does not support asyncio.'.format(type(self).__name__))
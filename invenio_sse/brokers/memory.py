@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""In-process broker."""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict, deque
+from fnmatch import fnmatchcase
+
+from ..hub import Event, decode_channel
+from .base import Broker
+
+
+class MemoryBus(object):
+    """Deliver the messages published in a process to its pub/sub objects.
+
+    A single bus is shared by all the applications of the process, so that
+    e.g. the events published by the REST API reach the streams of the UI
+    application. The counter and history of a channel are forgotten once
+    nothing was published to it for their time to live, as Redis expires
+    their keys.
+    """
+
+    def __init__(self):
+        """Initialize the bus."""
+        self.counters = defaultdict(int)
+        self.histories = {}
+        self.expires = OrderedDict()
+        self.lock = threading.RLock()
+        self._pubsubs = weakref.WeakSet()
+
+    def attach(self, pubsub):
+        """Deliver the messages to a pub/sub object."""
+        with self.lock:
+            self._pubsubs.add(pubsub)
+
+    def detach(self, pubsub):
+        """Stop delivering the messages to a pub/sub object."""
+        with self.lock:
+            self._pubsubs.discard(pubsub)
+
+    def publish(self, channel, payload):
+        """Deliver a payload to the subscribers of a channel.
+
+        :returns: The number of receiving subscriptions, counting each
+                  matching pattern, like Redis ``PUBLISH``.
+        """
+        with self.lock:
+            return sum(pubsub.deliver(channel, payload)
+                       for pubsub in list(self._pubsubs))
+
+    def touch(self, channel, ttl):
+        """Keep the counter and history of a channel for ``ttl`` seconds."""
+        with self.lock:
+            self.expires.pop(channel, None)
+            self.expires[channel] = time.time() + ttl
+
+    def expire(self, now=None):
+        """Forget the counters and histories of the expired channels.
+
+        Channels are checked in the order they were last published to.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            while self.expires:
+                channel, expires = next(iter(self.expires.items()))
+                if expires > now:
+                    break
+                del self.expires[channel]
+                self.counters.pop(channel, None)
+                self.histories.pop(channel, None)
+
+    def clear(self):
+        """Forget the event counters and histories."""
+        with self.lock:
+            self.counters.clear()
+            self.histories.clear()
+            self.expires.clear()
+
+
+bus = MemoryBus()
+"""Bus of the current process."""
+
+
+class MemoryPubSub(object):
+    """Pub/sub object of :class:`MemoryBroker`.
+
+    Provides the subset of :class:`redis.client.PubSub` used by the hubs.
+    """
+
+    def __init__(self, bus):
+        """Initialize the pub/sub object.
+
+        :param bus: The :class:`MemoryBus` delivering the messages.
+        """
+        self.bus = bus
+        self.channels = set()
+        self.patterns = set()
+        self._messages = deque()
+        self._ready = threading.Condition()
+
+    def subscribe(self, *channels):
+        """Subscribe to channels."""
+        self._subscribe('subscribe', self.channels, channels)
+
+    def unsubscribe(self, *channels):
+        """Unsubscribe from channels."""
+        self._unsubscribe('unsubscribe', self.channels, channels)
+
+    def psubscribe(self, *patterns):
+        """Subscribe to channel patterns, in the syntax of :mod:`fnmatch`."""
+        self._subscribe('psubscribe', self.patterns, patterns)
+
+    def punsubscribe(self, *patterns):
+        """Unsubscribe from channel patterns."""
+        self._unsubscribe('punsubscribe', self.patterns, patterns)
+
+    def deliver(self, channel, payload):
+        """Queue a published payload if it matches the subscriptions.
+
+        :returns: The number of matching channels and patterns.
+        """
+        messages = []
+        if channel in self.channels:
+            messages.append(self._message('message', channel, payload))
+        for pattern in list(self.patterns):
+            if fnmatchcase(channel, pattern):
+                messages.append(self._message(
+                    'pmessage', channel, payload, pattern=pattern))
+        if messages:
+            self._put(*messages)
+        return len(messages)
+
+    def get_message(self, timeout=0.0):
+        """Get the next message, waiting at most ``timeout`` seconds."""
+        with self._ready:
+            if not self._messages and timeout:
+                self._ready.wait(timeout)
+            if self._messages:
+                return self._messages.popleft()
+
+    def close(self):
+        """Unsubscribe from everything."""
+        self.bus.detach(self)
+        self.channels.clear()
+        self.patterns.clear()
+
+    def _subscribe(self, command, names, new):
+        """Add subscriptions and queue their confirmations."""
+        self.bus.attach(self)
+        for name in new:
+            name = decode_channel(name)
+            names.add(name)
+            self._put(self._message(
+                command, name, len(self.channels) + len(self.patterns)))
+
+    def _unsubscribe(self, command, names, old):
+        """Remove subscriptions and queue their confirmations."""
+        for name in old:
+            name = decode_channel(name)
+            names.discard(name)
+            self._put(self._message(
+                command, name, len(self.channels) + len(self.patterns)))
+
+    def _message(self, type_, channel, data, pattern=None):
+        """Build a message as returned by Redis."""
+        return {
+            'type': type_,
+            'pattern': pattern.encode('utf-8') if pattern else None,
+            'channel': channel.encode('utf-8'),
+            'data': data,
+        }
+
+    def _put(self, *messages):
+        """Queue messages and wake the reader up."""
+        with self._ready:
+            self._messages.extend(messages)
+            self._ready.notify()
+
+
+class AsyncMemoryPubSub(MemoryPubSub):
+    """Asyncio pub/sub object of :class:`MemoryBroker`.
+
+    Messages may be published from any thread, the reader is woken up in
+    the event loop which created the pub/sub object.
+    """
+
+    def __init__(self, bus):
+        """Initialize the pub/sub object."""
+        super(AsyncMemoryPubSub, self).__init__(bus)
+        self._loop = asyncio.get_event_loop()
+        self._wakeup = asyncio.Event()
+
+    async def subscribe(self, *channels):
+        """Subscribe to channels."""
+        super(AsyncMemoryPubSub, self).subscribe(*channels)
+
+    async def unsubscribe(self, *channels):
+        """Unsubscribe from channels."""
+        super(AsyncMemoryPubSub, self).unsubscribe(*channels)
+
+    async def psubscribe(self, *patterns):
+        """Subscribe to channel patterns."""
+        super(AsyncMemoryPubSub, self).psubscribe(*patterns)
+
+    async def punsubscribe(self, *patterns):
+        """Unsubscribe from channel patterns."""
+        super(AsyncMemoryPubSub, self).punsubscribe(*patterns)
+
+    async def get_message(self, timeout=0.0):
+        """Get the next message, waiting at most ``timeout`` seconds."""
+        message = super(AsyncMemoryPubSub, self).get_message()
+        if message is None and timeout:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            message = super(AsyncMemoryPubSub, self).get_message()
+        return message
+
+    async def reset(self):
+        """Unsubscribe from everything."""
+        self.close()
+
+    def _put(self, *messages):
+        """Queue messages and wake the reader up in its event loop."""
+        super(AsyncMemoryPubSub, self)._put(*messages)
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # The event loop is closed.
+            pass
+
+
+class _AsyncClient(object):
+    """Create the asyncio pub/sub objects of a bus."""
+
+    def __init__(self, bus):
+        self.bus = bus
+
+    def pubsub(self):
+        """Create an asyncio pub/sub object."""
+        return AsyncMemoryPubSub(self.bus)
+
+
+class MemoryBroker(Broker):
+    """Deliver the events to the subscribers of the current process.
+
+    Meant for tests and single process deployments, as events published by
+    other processes are not received. The history of the channels is kept
+    in memory when ``SSE_HISTORY_MAXLEN`` is set, and the events published
+    without ID are numbered per channel, so that
+    :class:`invenio_sse.ids.RedisCounterIDGenerator` can be used. Both are
+    dropped ``SSE_HISTORY_TTL`` seconds after the last event of a channel.
+    """
+
+    assigns_ids = True
+
+    def __init__(self, app, codec=None, bus=bus):
+        """Initialize the broker.
+
+        :param bus: The :class:`MemoryBus`, by default the one of the
+                    process.
+        """
+        super(MemoryBroker, self).__init__(app, codec=codec)
+        self.bus = bus
+
+    def publish(self, channel, message):
+        """Publish an event message, adding it to the history if enabled."""
+        maxlen = self.app.config['SSE_HISTORY_MAXLEN']
+        with self.bus.lock:
+            self.bus.expire()
+            if message['id'] is None or maxlen:
+                self.bus.touch(channel, self.app.config['SSE_HISTORY_TTL'])
+            if message['id'] is None:
+                self.bus.counters[channel] += 1
+                message = dict(message, id=self.bus.counters[channel])
+            payload = self.codec.dumps(message)
+            if maxlen:
+                history = self.bus.histories.get(channel)
+                if history is None or history.maxlen != maxlen:
+                    history = self.bus.histories[channel] = deque(
+                        history or (), maxlen=maxlen)
+                history.append((str(message['id']), payload))
+            # Delivered under the lock for the events to keep their order.
+            return self.bus.publish(channel, payload)
+
+    def history(self, channel, last_event_id):
+        """Get the events published to a channel after the given one."""
+        last_event_id = str(last_event_id)
+        with self.bus.lock:
+            self.bus.expire()
+            history = list(self.bus.histories.get(channel, ()))
+        for index, (id_, _) in enumerate(history):
+            if id_ == last_event_id:
+                events = (Event.from_payload(channel, payload, self.codec)
+                          for _, payload in history[index + 1:])
+                return [event for event in events if event]
+        return []
+
+    def pubsub(self):
+        """Create a pub/sub object."""
+        return MemoryPubSub(self.bus)
+
+    def async_client(self):
+        """Create a client of asyncio pub/sub objects."""
+        return _AsyncClient(self.bus)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""PostgreSQL broker.
+
+Requires ``pip install invenio-sse[postgresql]``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import re
+import select
+import threading
+from collections import deque
+
+from ..hub import SSEHub, decode_channel
+from .base import Broker
+
+try:
+    import psycopg2
+    from psycopg2 import sql
+    from psycopg2.pool import PoolError, ThreadedConnectionPool
+except ImportError:  # pragma: no cover
+    psycopg2 = None
+
+
+def database_url(app):
+    """Get the URL of the PostgreSQL database of the broker.
+
+    :param app: The Flask application.
+    :returns: ``SSE_BROKER_URL`` or ``SQLALCHEMY_DATABASE_URI``, without the
+              SQLAlchemy driver name.
+    """
+    url = app.config['SSE_BROKER_URL'] or \
+        app.config.get('SQLALCHEMY_DATABASE_URI')
+    if not url:
+        raise RuntimeError('SSE_BROKER_URL is not set.')
+    return re.sub(r'^(\w+)\+\w+://', r'\1://', url)
+
+
+class PostgreSQLSSEHub(SSEHub):
+    """Hub listening to PostgreSQL notifications.
+
+    ``LISTEN`` has no patterns, thus channel patterns are refused.
+    """
+
+    supports_patterns = False
+
+    if psycopg2 is not None:
+        connection_errors = (psycopg2.OperationalError,
+                             psycopg2.InterfaceError)
+
+
+class PostgreSQLPubSub(object):
+    """Pub/sub object of :class:`PostgreSQLBroker`.
+
+    Provides the subset of :class:`redis.client.PubSub` used by the hubs,
+    with a dedicated connection in autocommit mode.
+    """
+
+    def __init__(self, dsn):
+        """Initialize the pub/sub object.
+
+        :param dsn: URL of the database.
+        """
+        self.dsn = dsn
+        self.channels = set()
+        self._connection = None
+        self._messages = deque()
+
+    @property
+    def connection(self):
+        """Connection listening to the channels, opened on first use."""
+        if self._connection is None:
+            self._connection = psycopg2.connect(self.dsn)
+            self._connection.autocommit = True
+        return self._connection
+
+    def subscribe(self, *channels):
+        """Listen to channels."""
+        for channel in channels:
+            channel = decode_channel(channel)
+            self._execute('LISTEN {0}', channel)
+            self.channels.add(channel)
+            self._confirm('subscribe', channel)
+
+    def unsubscribe(self, *channels):
+        """Stop listening to channels."""
+        for channel in channels:
+            channel = decode_channel(channel)
+            self._execute('UNLISTEN {0}', channel)
+            self.channels.discard(channel)
+            self._confirm('unsubscribe', channel)
+
+    def get_message(self, timeout=0.0):
+        """Get the next message, waiting at most ``timeout`` seconds."""
+        if not self._messages:
+            connection = self.connection
+            self._receive(connection)
+            if not self._messages and timeout and \
+                    select.select([connection], [], [], timeout)[0]:
+                self._receive(connection)
+        if self._messages:
+            return self._messages.popleft()
+
+    def close(self):
+        """Close the connection."""
+        self.channels.clear()
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            connection.close()
+
+    def _execute(self, statement, channel):
+        """Run a ``LISTEN`` or ``UNLISTEN`` statement."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                sql.SQL(statement).format(sql.Identifier(channel)))
+
+    def _receive(self, connection):
+        """Queue the notifications received by the connection."""
+        connection.poll()
+        while connection.notifies:
+            notify = connection.notifies.pop(0)
+            self._messages.append({
+                'type': 'message',
+                'pattern': None,
+                'channel': notify.channel.encode('utf-8'),
+                'data': notify.payload.encode('utf-8'),
+            })
+
+    def _confirm(self, type_, channel):
+        """Queue the confirmation of a command, as sent by Redis."""
+        self._messages.append({
+            'type': type_,
+            'pattern': None,
+            'channel': channel.encode('utf-8'),
+            'data': len(self.channels),
+        })
+
+
+class PostgreSQLBroker(Broker):
+    """Publish the events with PostgreSQL ``LISTEN``/``NOTIFY``.
+
+    Uses the database of ``SSE_BROKER_URL``, by default the one of
+    Invenio-DB, so that no Redis server is needed. Notifications are
+    neither stored nor numbered, thus the channel history and
+    :class:`invenio_sse.ids.RedisCounterIDGenerator` are not available.
+
+    PostgreSQL limits channel names to 63 bytes and payloads to 8000 bytes.
+    The publishing connections are pooled, up to
+    ``SSE_POSTGRESQL_MAX_CONNECTIONS`` per process, and publishers wait
+    ``SSE_POSTGRESQL_POOL_TIMEOUT`` seconds for a free connection.
+    """
+
+    hub_class = PostgreSQLSSEHub
+
+    max_payload_size = 7999
+    """Maximum size in bytes of a notification payload."""
+
+    def __init__(self, app, codec=None):
+        """Initialize the broker."""
+        if psycopg2 is None:
+            raise RuntimeError(
+                'You must use `pip install invenio-sse[postgresql]` to '
+                'publish server-sent events with PostgreSQL.')
+        super(PostgreSQLBroker, self).__init__(app, codec=codec)
+        self.dsn = database_url(app)
+        self.max_connections = app.config['SSE_POSTGRESQL_MAX_CONNECTIONS']
+        self.pool_timeout = app.config['SSE_POSTGRESQL_POOL_TIMEOUT']
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # ThreadedConnectionPool fails instead of waiting when it is full.
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+
+    @property
+    def pool(self):
+        """Pool of the publishing connections of the current process."""
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadedConnectionPool(
+                    1, self.max_connections, self.dsn)
+                self._slots = threading.BoundedSemaphore(
+                    self.max_connections)
+                self._pid = os.getpid()
+            return self._pool
+
+    def publish(self, channel, message):
+        """Publish an event message.
+
+        :returns: ``None``, PostgreSQL does not report the listeners.
+        """
+        return self.publish_many([(channel, message)])[0]
+
+    def publish_many(self, messages):
+        """Publish several event messages with a single connection.
+
+        :raises ValueError: If a message exceeds the payload size limit of
+            PostgreSQL, before any message is sent.
+        :raises psycopg2.pool.PoolError: If no connection was free within
+            ``SSE_POSTGRESQL_POOL_TIMEOUT`` seconds.
+        """
+        notifications = []
+        for channel, message in messages:
+            payload = self.codec.dumps(message)
+            if len(payload) > self.max_payload_size:
+                raise ValueError(
+                    'Event of {0} bytes on channel {1!r} exceeds the '
+                    'PostgreSQL notification limit of {2} bytes.'.format(
+                        len(payload), channel, self.max_payload_size))
+            notifications.append((channel, payload.decode('utf-8')))
+
+        pool, slots = self.pool, self._slots
+        if self.pool_timeout is None:
+            acquired = slots.acquire(False)
+        else:
+            acquired = slots.acquire(timeout=self.pool_timeout)
+        if not acquired:
+            raise PoolError('connection pool exhausted')
+        try:
+            connection = pool.getconn()
+            try:
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    for notification in notifications:
+                        cursor.execute(
+                            'SELECT pg_notify(%s, %s)', notification)
+            except Exception:
+                pool.putconn(connection, close=True)
+                raise
+            else:
+                pool.putconn(connection)
+        finally:
+            slots.release()
+        return [None] * len(notifications)
+
+    def pubsub(self):
+        """Create a pub/sub object."""
+        return PostgreSQLPubSub(self.dsn)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Redis broker."""
+
+from __future__ import absolute_import, print_function
+
+from ..connections import SUBSCRIBER, create_client, redis_options, redis_url
+from ..hub import Event, ShardedSSEHub, SSEHub
+from .base import Broker
+
+try:
+    from redis.asyncio import StrictRedis as AsyncStrictRedis
+    from redis.asyncio.sentinel import Sentinel as AsyncSentinel
+except ImportError:  # pragma: no cover
+    AsyncStrictRedis = None
+
+PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+if ARGV[4] ~= '0' then
+    local last = redis.call('XREVRANGE', KEYS[2], '+', '-', 'COUNT', 1)[1]
+    local last_id = last and tonumber(string.match(last[1], '^%d+'))
+    if last_id and last_id >= id then
+        id = last_id + 1
+        redis.call('SET', KEYS[1], id)
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+local start, stop = string.find(ARGV[2], ARGV[3], 1, true)
+local payload = string.sub(ARGV[2], 1, start - 1) .. id ..
+                string.sub(ARGV[2], stop + 1)
+if ARGV[4] ~= '0' then
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[4], id .. '-0',
+                'id', id, 'msg', payload)
+    redis.call('EXPIRE', KEYS[2], ARGV[5])
+end
+return redis.call(ARGV[6], ARGV[1], payload)
+"""
+"""Publish an event numbered by a per-channel Redis counter.
+
+``KEYS``: counter and history keys. ``ARGV``: channel, payload, placeholder
+of the ID in the payload, history length, time to live of the keys and
+publishing command, ``PUBLISH`` or ``SPUBLISH``.
+
+The counter never falls behind the history, e.g. when it expired or was
+evicted before the stream, so that IDs keep increasing.
+
+On Redis Cluster, both keys must be in the slot of the channel, e.g. with
+``SSE_EVENT_ID_COUNTER_KEY = 'sse:counter:{{{channel}}}'`` and
+``SSE_HISTORY_KEY = 'sse:history:{{{channel}}}'``.
+"""
+
+ID_PLACEHOLDER = '__sse_event_id__'
+
+
+class RedisBroker(Broker):
+    """Publish the events with Redis pub/sub.
+
+    Connections are configured with the ``SSE_REDIS_*`` variables, see
+    :mod:`invenio_sse.connections`. When ``SSE_HISTORY_MAXLEN`` is set, the
+    events of each channel are also kept in a Redis stream.
+    """
+
+    assigns_ids = True
+
+    def __init__(self, app, codec=None):
+        """Initialize the Redis clients."""
+        super(RedisBroker, self).__init__(app, codec=codec)
+        self._redis = create_client(app)
+        self._subscriber_redis = create_client(app, SUBSCRIBER)
+        self.sharded = app.config['SSE_REDIS_SHARDED_PUBSUB']
+        self.hub_class = ShardedSSEHub if self.sharded else SSEHub
+        self._publish_script = self._redis.register_script(PUBLISH_SCRIPT)
+
+    def publish(self, channel, message):
+        """Publish an event message, adding it to the history if enabled."""
+        if not self.app.config['SSE_HISTORY_MAXLEN']:
+            return self._send(self._redis, channel, message)
+        pipe = self._redis.pipeline(transaction=False)
+        self._send(pipe, channel, message)
+        return pipe.execute()[-1]
+
+    def publish_many(self, messages):
+        """Publish several event messages through a single pipeline."""
+        pipe = self._redis.pipeline(transaction=False)
+        published = []
+        for channel, message in messages:
+            self._send(pipe, channel, message)
+            published.append(len(pipe) - 1)
+        replies = pipe.execute()
+        return [replies[index] for index in published]
+
+    def history(self, channel, last_event_id):
+        """Get the events published to a channel after the given one.
+
+        Requires ``SSE_HISTORY_MAXLEN`` to be set when publishing.
+
+        :param channel: Name of the channel.
+        :param last_event_id: ID of the last event received by the client.
+        :returns: List of :class:`invenio_sse.hub.Event` in publication
+                  order, empty if the given event is not in the history
+                  (anymore).
+        """
+        key = self._history_key(channel)
+        last_event_id = str(last_event_id).encode('utf-8')
+        if last_event_id.isdigit():
+            # IDs assigned by the Redis counter are also the stream IDs.
+            entry_id = last_event_id + b'-0'
+            entry = self._redis.xrange(key, min=entry_id, max=entry_id)
+            if entry and entry[0][1][b'id'] == last_event_id:
+                entries = self._redis.xrange(key, min=last_event_id + b'-1')
+                events = (Event.from_payload(channel, fields[b'msg'],
+                                             self.codec)
+                          for _, fields in entries)
+                return [event for event in events if event]
+
+        payloads = []
+        end = '+'
+        while True:
+            entries = self._redis.xrevrange(key, max=end, count=100)
+            if end != '+':
+                entries = entries[1:]
+            if not entries:
+                return []
+            for _, fields in entries:
+                if fields[b'id'] == last_event_id:
+                    events = (Event.from_payload(channel, payload, self.codec)
+                              for payload in reversed(payloads))
+                    return [event for event in events if event]
+                payloads.append(fields[b'msg'])
+            end = entries[-1][0]
+
+    def _history_key(self, channel):
+        """Get the Redis key of the history of a channel."""
+        return self.app.config['SSE_HISTORY_KEY'].format(channel=channel)
+
+    def _send(self, client, channel, message):
+        """Send the Redis commands publishing an event message.
+
+        :param client: Redis client or pipeline.
+        :param channel: Name of the channel.
+        :param message: Message built by :meth:`_message`.
+        :returns: The result of the ``PUBLISH`` or ``SPUBLISH`` command.
+        """
+        maxlen = self.app.config['SSE_HISTORY_MAXLEN']
+        if message['id'] is None:
+            payload = self.codec.dumps(dict(message, id=ID_PLACEHOLDER))
+            return self._publish_script(
+                keys=[
+                    self.app.config['SSE_EVENT_ID_COUNTER_KEY'].format(
+                        channel=channel),
+                    self._history_key(channel),
+                ],
+                args=[channel, payload, self.codec.dumps(ID_PLACEHOLDER),
+                      maxlen or 0, self.app.config['SSE_HISTORY_TTL'],
+                      'SPUBLISH' if self.sharded else 'PUBLISH'],
+                client=client,
+            )
+
+        payload = self.codec.dumps(message)
+        if maxlen:
+            key = self._history_key(channel)
+            client.xadd(key, {'id': str(message['id']), 'msg': payload},
+                        maxlen=maxlen, approximate=True)
+            client.expire(key, self.app.config['SSE_HISTORY_TTL'])
+        if self.sharded:
+            return client.spublish(channel, payload)
+        return client.publish(channel, payload)
+
+    def pubsub(self):
+        """Create a pub/sub connection."""
+        return self._subscriber_redis.pubsub()
+
+    def async_client(self):
+        """Create the asyncio Redis client of the subscribers."""
+        app = self.app
+        if AsyncStrictRedis is None:
+            raise RuntimeError(
+                'You must install `redis>=5.0.0` to stream server-sent '
+                'events with asyncio.')
+        if app.config['SSE_REDIS_CLUSTER']:
+            raise RuntimeError(
+                'Redis Cluster is not supported with asyncio, the asyncio '
+                'client of redis-py has no cluster pub/sub.')
+        options = redis_options(app, SUBSCRIBER)
+        if app.config['SSE_REDIS_SENTINELS']:
+            return AsyncSentinel(
+                app.config['SSE_REDIS_SENTINELS'],
+                sentinel_kwargs=app.config['SSE_REDIS_SENTINEL_OPTIONS'],
+            ).master_for(app.config['SSE_REDIS_SENTINEL_SERVICE'],
+                         redis_class=AsyncStrictRedis, **options)
+        return AsyncStrictRedis.from_url(redis_url(app), **options)
@@ -26,6 +26,7 @@
 
 from __future__ import absolute_import, print_function
 
+import json
 import sys
 
 import click
@@ -55,9 +56,33 @@ def sse():
 @click.option('--channel',
               help='Channel to direct events to different clients, by default '
               'sse')
+@click.option('--lines', is_flag=True,
+              help='Publish each line as a separate event whose data is the '
+              'line decoded as JSON. Cannot be combined with --id.')
 @with_appcontext
-def publish(data, type_=None, id_=None, retry=None, channel='sse'):
+def publish(data, type_=None, id_=None, retry=None, channel='sse',
+            lines=False):
     """Publish a message."""
+    if lines:
+        if id_ is not None:
+            raise click.BadParameter(
+                'cannot be combined with --lines, the events need distinct '
+                'IDs.', param_hint='--id')
+        events = []
+        for number, line in enumerate(data, 1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as e:
+                raise click.BadParameter(
+                    'line {0} is not valid JSON: {1}'.format(number, e),
+                    param_hint='DATA')
+            events.append(dict(data=value, type_=type_, retry=retry,
+                               channel=channel))
+        current_sse.publish_many(events)
+        return
+
     current_sse.publish(
         data=data.readlines(),
         type_=type_,
@@ -67,11 +92,15 @@ def publish(data, type_=None, id_=None, retry=None, channel='sse'):
 
 
 @sse.command('subscribe')
-@click.option('--channel',
+@click.option('--channel', multiple=True,
               help='Channel to direct events to different clients, by default '
-              'sse')
+              'sse. Can be repeated')
+@click.option('--pattern', multiple=True,
+              help='Pattern of channels to subscribe to. Can be repeated')
 @with_appcontext
-def subscribe(channel='sse'):
-    """Subscribe a channel."""
-    for message in current_sse.messages(channel=channel):
-        print(message)
+def subscribe(channel=(), pattern=()):
+    """Subscribe to channels."""
+    if not channel and not pattern:
+        channel = ('sse', )
+    for message in current_sse.messages(channel=channel, patterns=pattern):
+        print(message.decode('utf-8'))
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Coalescing of high-frequency events.
+
+Publishers collapse the events published with the same coalescing key
+within ``SSE_COALESCE_WINDOW`` seconds to the latest one:
+
+.. code-block:: python
+
+    current_sse.publish({'progress': 42}, channel=channel,
+                        coalesce='autosave')
+
+The first event of a key is published immediately, the following ones at
+most once per window, so that the last value is always delivered. Deferred
+events are published by a daemon thread, and the pending ones when the
+process exits.
+
+Streams may throttle the events they send in the same way, per channel and
+event type, with ``current_sse.messages(channel, throttle=0.5)``.
+"""
+
+from __future__ import absolute_import, print_function
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class Coalescer(object):
+    """Collapse the events published with the same key within a window."""
+
+    max_keys = 1024
+    """Number of keys above which the expired ones are forgotten."""
+
+    def __init__(self, publish, window):
+        """Initialize the coalescer.
+
+        :param publish: Callable publishing a message to a channel.
+        :param window: Minimum time in seconds between two publications of
+                       the same key.
+        """
+        self.publish = publish
+        self.window = window
+        self._published = {}
+        self._pending = {}
+        self._due = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = os.getpid()
+        atexit.register(self.flush)
+
+    def __call__(self, key, channel, message):
+        """Publish a message now, or with the latest one of its key.
+
+        :param key: Coalescing key of the message.
+        :param channel: Name of the channel.
+        :param message: Message built by
+                        :meth:`invenio_sse.ext._SSEState._message`.
+        :returns: The result of ``publish``, or ``None`` when deferred.
+        """
+        now = time.time()
+        with self._condition:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork.
+                self._published, self._pending, self._due = {}, {}, {}
+                self._thread = None
+                self._pid = os.getpid()
+            deferred = key in self._pending
+            self._pending[key] = (channel, message)
+            if deferred:
+                return None
+            wait = self._published.get(key, now - self.window) + \
+                self.window - now
+            if wait > 0:
+                self._due[key] = now + wait
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name='sse-coalescer')
+                    self._thread.daemon = True
+                    self._thread.start()
+                self._condition.notify()
+                return None
+            del self._pending[key]
+            self._mark(key, now)
+        return self.publish(channel, message)
+
+    def __len__(self):
+        """Get the number of deferred messages."""
+        return len(self._pending)
+
+    def flush(self, key=None):
+        """Publish the deferred messages.
+
+        :param key: Key of the message to publish, by default all of them.
+        """
+        with self._condition:
+            keys = list(self._pending) if key is None else [key]
+        self._flush(keys)
+
+    def _flush(self, keys):
+        """Publish the deferred messages of some keys, logging failures."""
+        now = time.time()
+        with self._condition:
+            messages = []
+            for key in keys:
+                self._due.pop(key, None)
+                if key in self._pending:
+                    messages.append(self._pending.pop(key))
+                    self._mark(key, now)
+        for channel, message in messages:
+            try:
+                self.publish(channel, message)
+            except Exception:
+                logger.exception('Could not publish a coalesced event to '
+                                 'channel %s.', channel)
+
+    def _run(self):
+        """Publish the deferred messages when they are due."""
+        while True:
+            with self._condition:
+                while True:
+                    now = time.time()
+                    keys = [key for key, due in self._due.items()
+                            if due <= now]
+                    if keys:
+                        break
+                    self._condition.wait(
+                        min(self._due.values()) - now if self._due else None)
+            self._flush(keys)
+
+    def _mark(self, key, now):
+        """Record the publication time of a key."""
+        self._published[key] = now
+        if len(self._published) > self.max_keys:
+            self._published = dict(
+                (key, published)
+                for key, published in self._published.items()
+                if published > now - self.window)
+
+
+class Throttle(object):
+    """Send at most one event per channel and type within an interval.
+
+    Events received meanwhile collapse to the latest one, sent when the
+    interval has elapsed.
+    """
+
+    def __init__(self, interval):
+        """Initialize the throttle.
+
+        :param interval: Minimum time in seconds between two events of the
+                         same channel and type.
+        """
+        self.interval = interval
+        self._sent = {}
+        self._pending = OrderedDict()
+
+    def offer(self, event, now=None):
+        """Get whether an event can be sent now, otherwise defer it.
+
+        :param event: An :class:`invenio_sse.hub.Event`.
+        :returns: Whether to send the event.
+        """
+        now = time.time() if now is None else now
+        key = (event.channel, event.type)
+        if key not in self._pending and \
+                now - self._sent.get(key, now - self.interval) >= \
+                self.interval:
+            self._sent[key] = now
+            return True
+        self._pending[key] = event
+        return False
+
+    def timeout(self, now=None):
+        """Get the time in seconds until the next deferred event is due.
+
+        :returns: The time, or ``None`` without deferred events.
+        """
+        if not self._pending:
+            return None
+        now = time.time() if now is None else now
+        return max(0, min(self._sent[key] for key in self._pending) +
+                   self.interval - now)
+
+    def due(self, now=None):
+        """Get the deferred events which can be sent now."""
+        now = time.time() if now is None else now
+        events = []
+        for key in list(self._pending):
+            if now - self._sent[key] >= self.interval:
+                events.append(self._pending.pop(key))
+                self._sent[key] = now
+        return events
+
+    def flush(self):
+        """Get all the deferred events."""
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""JSON codecs used to publish and format events.
+
+Events are serialized to JSON when published to Redis, and their data again
+when formatted for the clients. The codec doing it is configured with
+``SSE_JSON_CODEC``; all codecs produce bytes, so that payloads go to Redis
+and frames to the clients without being re-encoded.
+
+- :class:`JSONCodec` uses the standard library (default).
+- :class:`OrjsonCodec` uses `orjson <https://pypi.org/project/orjson/>`_.
+- :class:`UjsonCodec` uses `ujson <https://pypi.org/project/ujson/>`_.
+- :func:`fastest_codec` picks the fastest installed one.
+
+Faster codecs output compact JSON, without spaces after separators.
+"""
+
+from __future__ import absolute_import, print_function
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+
+class JSONCodec(object):
+    """JSON codec of the standard library."""
+
+    def dumps(self, obj):
+        """Serialize an object.
+
+        :param obj: Any JSON serializable object.
+        :returns: The UTF-8 encoded JSON document.
+        """
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        """Deserialize a JSON document.
+
+        :param data: UTF-8 encoded JSON document.
+        :returns: The deserialized object.
+        """
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """JSON codec using orjson."""
+
+    def __init__(self):
+        """Initialize the codec."""
+        if orjson is None:
+            raise RuntimeError(
+                'You must use `pip install orjson` to use OrjsonCodec.')
+
+    def dumps(self, obj):
+        """Serialize an object.
+
+        :param obj: Any JSON serializable object.
+        :returns: The UTF-8 encoded JSON document.
+        """
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        """Deserialize a JSON document.
+
+        :param data: UTF-8 encoded JSON document.
+        :returns: The deserialized object.
+        """
+        return orjson.loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    """JSON codec using ujson."""
+
+    def __init__(self):
+        """Initialize the codec."""
+        if ujson is None:
+            raise RuntimeError(
+                'You must use `pip install ujson` to use UjsonCodec.')
+
+    def dumps(self, obj):
+        """Serialize an object.
+
+        :param obj: Any JSON serializable object.
+        :returns: The UTF-8 encoded JSON document.
+        """
+        return ujson.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        """Deserialize a JSON document.
+
+        :param data: UTF-8 encoded JSON document.
+        :returns: The deserialized object.
+        """
+        return ujson.loads(data)
+
+
+def fastest_codec():
+    """Get the fastest installed codec, falling back to the standard one."""
+    if orjson is not None:
+        return OrjsonCodec()
+    if ujson is not None:
+        return UjsonCodec()
+    return JSONCodec()
+
+
+default_codec = JSONCodec()
+"""Codec used when none is given."""
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Compression of server-sent event streams.
+
+Streams are compressed with gzip or deflate when ``SSE_COMPRESSION`` is
+enabled and the client accepts it. Every event is followed by a
+``Z_SYNC_FLUSH``, so that it is delivered as soon as it is published:
+compression saves bandwidth without adding latency.
+
+Browsers do not support preset deflate dictionaries, thus
+``SSE_COMPRESSION_DICTIONARY`` is sent as an SSE comment at the start of
+each stream instead. Later events refer to its strings, e.g. the keys of
+the JSON data, from their first occurrence. The compressor is warmed up
+with it once per process and copied for each stream.
+"""
+
+from __future__ import absolute_import, print_function
+
+import threading
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+ENCODINGS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+"""Window bits of the supported content encodings."""
+
+_warmed = {}
+_lock = threading.Lock()
+
+
+def negotiate_encoding(accept_encoding, encodings=('gzip', 'deflate')):
+    """Choose the content encoding of a stream.
+
+    :param accept_encoding: Value of the ``Accept-Encoding`` header.
+    :param encodings: Supported encodings, by order of preference.
+    :returns: The encoding, or ``None`` to send the stream uncompressed.
+    """
+    if not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding).best_match(
+        [encoding for encoding in encodings if encoding in ENCODINGS])
+
+
+def format_sse_comment(text):
+    """Encode text as an SSE comment, ignored by the clients."""
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return b''.join(b': ' + line + b'\n' for line in text.splitlines()) + \
+        b'\n'
+
+
+class StreamCompressor(object):
+    """Compress the frames of a stream, flushing each of them."""
+
+    def __init__(self, encoding, level=6, dictionary=None):
+        """Initialize the compressor.
+
+        :param encoding: ``gzip`` or ``deflate``.
+        :param level: Compression level, from 1 (fastest) to 9 (smallest).
+        :param dictionary: Optional text sent as a comment at the start of
+                           the stream, see :mod:`invenio_sse.compression`.
+        """
+        self.encoding = encoding
+        key = (encoding, level, dictionary)
+        with _lock:
+            if key not in _warmed:
+                compressor = zlib.compressobj(
+                    level, zlib.DEFLATED, ENCODINGS[encoding])
+                preamble = b''
+                if dictionary:
+                    preamble = compressor.compress(
+                        format_sse_comment(dictionary))
+                preamble += compressor.flush(zlib.Z_SYNC_FLUSH)
+                _warmed[key] = (compressor, preamble)
+            compressor, self.preamble = _warmed[key]
+            self._compressor = compressor.copy()
+
+    def compress(self, frame):
+        """Compress a frame and flush it."""
+        return self._compressor.compress(frame) + \
+            self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        """Terminate the compressed stream."""
+        return self._compressor.flush()
+
+
+def compress_frames(frames, compressor):
+    """Compress the frames of a stream.
+
+    :param frames: Iterable of SSE frames, closed when the stream ends.
+    :param compressor: A :class:`StreamCompressor`.
+    """
+    try:
+        yield compressor.preamble
+        for frame in frames:
+            yield compressor.compress(frame)
+        yield compressor.finish()
+    finally:
+        close = getattr(frames, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Redis connections of the publishers and of the subscribers.
+
+Publishing commands and pub/sub subscriptions use distinct connection
+pools: a subscribed connection cannot run other commands and blocks while
+waiting for messages, so it must not count against, nor wait for, the
+connections used to publish.
+
+Pools are shared by all the applications of a process using the same URL
+and options, e.g. the ones of the UI and of the REST API. They are
+configured with the ``SSE_REDIS_*`` variables, or replaced altogether with
+``SSE_REDIS_CLIENT_FACTORY``.
+
+Besides a single server, the clients can connect to:
+
+- the master of a Sentinel-managed deployment, set with
+  ``SSE_REDIS_SENTINELS`` and ``SSE_REDIS_SENTINEL_SERVICE``; pub/sub
+  connections resolve the current master each time they connect, so the
+  hubs resubscribe to the new master after a failover;
+- a Redis Cluster, with ``SSE_REDIS_CLUSTER``. Events are broadcast to all
+  the nodes, unless ``SSE_REDIS_SHARDED_PUBSUB`` uses ``SPUBLISH`` and
+  ``SSUBSCRIBE`` (Redis 7) to keep each channel on the shard owning it.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import threading
+
+from redis import BlockingConnectionPool, ConnectionPool, StrictRedis
+from redis.sentinel import Sentinel
+
+from .utils import obj_or_import_string
+
+try:
+    from redis.cluster import RedisCluster
+except ImportError:  # pragma: no cover
+    RedisCluster = None
+
+PUBLISHER = 'publisher'
+"""Role of the connections running the publishing and history commands."""
+
+SUBSCRIBER = 'subscriber'
+"""Role of the pub/sub connections."""
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def _shared(key, factory):
+    """Get the object of a key in this process, creating it if needed."""
+    key = (os.getpid(), ) + key
+    with _lock:
+        value = _pools.get(key)
+        if value is None:
+            value = _pools[key] = factory()
+        return value
+
+
+def redis_url(app):
+    """Get the Redis URL of the SSE subsystem.
+
+    :param app: An instance of :class:`flask.Flask`.
+    :returns: ``SSE_REDIS_URL``, or ``CACHE_REDIS_URL`` to use the Redis of
+              Invenio-Cache, or the local Redis server.
+    """
+    return app.config.get('SSE_REDIS_URL') or \
+        app.config.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+
+
+def redis_options(app, role=PUBLISHER):
+    """Get the connection options of a role.
+
+    Subscriber connections have no socket timeout: they wait for messages
+    with the timeout of ``get_message()``.
+
+    :param app: An instance of :class:`flask.Flask`.
+    :param role: :data:`PUBLISHER` or :data:`SUBSCRIBER`.
+    :returns: Keyword arguments of the connection pool.
+    """
+    options = dict(
+        socket_connect_timeout=app.config['SSE_REDIS_SOCKET_CONNECT_TIMEOUT'],
+        socket_keepalive=app.config['SSE_REDIS_SOCKET_KEEPALIVE'],
+        health_check_interval=app.config['SSE_REDIS_HEALTH_CHECK_INTERVAL'],
+    )
+    if role == PUBLISHER:
+        options.update(
+            socket_timeout=app.config['SSE_REDIS_SOCKET_TIMEOUT'],
+            max_connections=app.config['SSE_REDIS_MAX_CONNECTIONS'],
+        )
+    options.update(app.config['SSE_REDIS_OPTIONS'])
+    return options
+
+
+def get_pool(url, pool_timeout=None, **options):
+    """Get the shared connection pool of a URL and options.
+
+    Pools are created once per process, and never shared with a forked
+    child.
+
+    :param url: Redis URL.
+    :param pool_timeout: Seconds to wait for a free connection when the pool
+                         reached ``max_connections``, instead of failing.
+    :param options: Keyword arguments of the pool.
+    :returns: A :class:`redis.ConnectionPool`.
+    """
+    def factory():
+        if pool_timeout is not None and options.get('max_connections'):
+            return BlockingConnectionPool.from_url(
+                url, timeout=pool_timeout, **options)
+        return ConnectionPool.from_url(url, **options)
+
+    return _shared(
+        ('pool', url, pool_timeout, tuple(sorted(options.items()))),
+        factory)
+
+
+def get_sentinel_client(sentinels, service, sentinel_kwargs=None,
+                        **options):
+    """Get the shared client of the master of a Sentinel service.
+
+    :param sentinels: List of ``(host, port)`` of the Sentinel servers.
+    :param service: Name of the service monitored by Sentinel.
+    :param sentinel_kwargs: Connection options of the Sentinel servers.
+    :param options: Connection options of the master.
+    :returns: A :class:`redis.StrictRedis` client.
+    """
+    sentinels = tuple(tuple(sentinel) for sentinel in sentinels)
+    sentinel_kwargs = sentinel_kwargs or {}
+
+    def factory():
+        return Sentinel(
+            sentinels, sentinel_kwargs=sentinel_kwargs,
+        ).master_for(service, redis_class=StrictRedis, **options)
+
+    return _shared(
+        ('sentinel', sentinels, service,
+         tuple(sorted(sentinel_kwargs.items())),
+         tuple(sorted(options.items()))),
+        factory)
+
+
+def get_cluster_client(url, **options):
+    """Get the shared client of a Redis Cluster.
+
+    :param url: Redis URL of any node of the cluster.
+    :param options: Connection options of the nodes; ``max_connections``
+                    applies to each node.
+    :returns: A :class:`redis.cluster.RedisCluster` client.
+    """
+    if RedisCluster is None:
+        raise RuntimeError(
+            'You must install `redis>=5.0.0` to use Redis Cluster.')
+    return _shared(
+        ('cluster', url, tuple(sorted(options.items()))),
+        lambda: RedisCluster.from_url(url, **options))
+
+
+def create_client(app, role=PUBLISHER):
+    """Create the Redis client of a role.
+
+    :param app: An instance of :class:`flask.Flask`.
+    :param role: :data:`PUBLISHER` or :data:`SUBSCRIBER`.
+    :returns: A :class:`redis.StrictRedis` client.
+    """
+    factory = obj_or_import_string(app.config['SSE_REDIS_CLIENT_FACTORY'])
+    if factory:
+        return factory(app, role)
+    if app.config['SSE_REDIS_SENTINELS']:
+        return get_sentinel_client(
+            app.config['SSE_REDIS_SENTINELS'],
+            app.config['SSE_REDIS_SENTINEL_SERVICE'],
+            sentinel_kwargs=app.config['SSE_REDIS_SENTINEL_OPTIONS'],
+            **redis_options(app, role))
+    if app.config['SSE_REDIS_CLUSTER']:
+        return get_cluster_client(redis_url(app), **redis_options(app, role))
+    pool_timeout = app.config['SSE_REDIS_POOL_TIMEOUT'] \
+        if role == PUBLISHER else None
+    return StrictRedis(connection_pool=get_pool(
+        redis_url(app), pool_timeout=pool_timeout,
+        **redis_options(app, role)))
@@ -24,6 +24,7 @@
 
 """Deposit extension for Invenio-SSE."""
 
+from .channels import deposit_channel, publish
 from .ext import InvenioSSEDeposit
 
-__all__ = ('InvenioSSEDeposit', )
+__all__ = ('InvenioSSEDeposit', 'deposit_channel', 'publish')
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Channels of the deposit events.
+
+Publishers and subscribers name the channel of a deposit from its PID with
+``SSE_DEPOSIT_CHANNEL``, so events can be published from anywhere with an
+application context, e.g. a Celery task:
+
+.. code-block:: python
+
+    from invenio_sse.contrib.deposit import publish
+
+    publish('depid', deposit['_deposit']['id'], {'status': 'published'},
+            type_='deposit')
+"""
+
+from __future__ import absolute_import, print_function
+
+from flask import current_app
+
+from invenio_sse import current_sse
+
+
+def deposit_channel(pid_type, pid_value, app=None):
+    """Get the channel of the events of a deposit.
+
+    :param pid_type: PID type of the deposit endpoint.
+    :param pid_value: PID value of the deposit.
+    :param app: An instance of :class:`flask.Flask`, defaults to the current
+        application.
+    :returns: The name of the channel.
+    """
+    app = app or current_app
+    return app.config['SSE_DEPOSIT_CHANNEL'].format(
+        pid_type=pid_type, pid_value=pid_value)
+
+
+def publish(pid_type, pid_value, data, **kwargs):
+    """Publish an event to the streams of a deposit.
+
+    :param pid_type: PID type of the deposit endpoint.
+    :param pid_value: PID value of the deposit.
+    :param data: Event data.
+    :param kwargs: Other arguments of
+        :meth:`invenio_sse.ext._SSEState.publish`.
+    :returns: The number of subscribers that received the event, if known.
+    """
+    return current_sse.publish(
+        data, channel=deposit_channel(pid_type, pid_value), **kwargs)
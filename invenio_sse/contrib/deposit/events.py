@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Publication of the changes of the deposits to their streams."""
+
+from __future__ import absolute_import, print_function
+
+import logging
+from collections import OrderedDict
+from copy import deepcopy
+
+from flask import current_app, has_app_context
+from invenio_db import db
+from invenio_deposit.api import Deposit
+from invenio_records.models import RecordMetadata
+from invenio_records.signals import after_record_delete, after_record_insert, \
+    after_record_update, before_record_update
+from jsonpatch import make_patch
+from sqlalchemy import event
+
+from invenio_sse import current_sse
+
+from .channels import deposit_channel
+
+try:
+    from invenio_files_rest.signals import file_uploaded
+    from invenio_records_files.models import RecordsBuckets
+except ImportError:  # pragma: no cover
+    file_uploaded = RecordsBuckets = None
+
+logger = logging.getLogger(__name__)
+
+
+class DepositEvents(object):
+    """Publish the changes of the deposits to their channels.
+
+    The changes of a transaction are collected from the record signals and
+    published when it commits, one event per deposit however many times it
+    was committed: ``created``, ``updated``, ``published`` or ``deleted``.
+    The data of the event is the id of the deposit and the JSON Patch from
+    its state before the transaction, so that clients keep their copy up to
+    date instead of polling the REST API:
+
+    .. code-block:: javascript
+
+        source.addEventListener('updated', function(e) {
+            var event = JSON.parse(e.data);
+            deposit = jsonpatch.applyPatch(deposit, event.patch).newDocument;
+        });
+
+    File uploads are published as ``file`` events once stored.
+    """
+
+    info_key = 'invenio-sse-deposit'
+    """Key of the changes of a transaction in the info of its session."""
+
+    def __init__(self, app, pid_types):
+        """Initialize the publisher.
+
+        :param app: An instance of :class:`flask.Flask`.
+        :param pid_types: PID types of the deposit endpoints.
+        """
+        self.app = app
+        self.pid_types = pid_types
+
+    def connect(self):
+        """Connect to the record signals and the session events."""
+        after_record_insert.connect(self.inserted, sender=self.app)
+        before_record_update.connect(self.updating, sender=self.app)
+        after_record_update.connect(self.updated, sender=self.app)
+        after_record_delete.connect(self.deleted, sender=self.app)
+        if file_uploaded is not None:
+            file_uploaded.connect(self.file_uploaded, sender=self.app)
+        for name, listener in (('after_commit', session_committed),
+                               ('after_rollback', session_rolled_back)):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+
+    def changes(self, session=None):
+        """Get the changes of the current transaction.
+
+        :param session: The session, by default the current one.
+        :returns: Ordered dictionary of the changes by record id.
+        """
+        info = (session or db.session).info
+        return info.setdefault(self.info_key, OrderedDict())
+
+    def inserted(self, sender, record=None, **kwargs):
+        """Record the creation of a deposit."""
+        if isinstance(record, Deposit):
+            self.changes()[record.id] = dict(
+                pid_value=record['_deposit']['id'],
+                before=None,
+                after=deepcopy(dict(record)),
+            )
+
+    def updating(self, sender, record=None, **kwargs):
+        """Record the state of a deposit before its first update."""
+        if not isinstance(record, Deposit):
+            return
+        changes = self.changes()
+        if record.id not in changes:
+            # the record shares its nested values with its model, only the
+            # database still has the state before the transaction
+            with db.session.no_autoflush:
+                before = db.session.query(RecordMetadata.json).filter_by(
+                    id=record.id).scalar()
+            changes[record.id] = dict(
+                pid_value=record['_deposit']['id'], before=before)
+
+    def updated(self, sender, record=None, **kwargs):
+        """Record the new state of a deposit."""
+        change = self.changes().get(getattr(record, 'id', None))
+        if change is not None:
+            change['after'] = deepcopy(dict(record))
+
+    def deleted(self, sender, record=None, **kwargs):
+        """Record the deletion of a deposit."""
+        if isinstance(record, Deposit):
+            change = self.changes().setdefault(
+                record.id, dict(pid_value=record['_deposit']['id']))
+            change['deleted'] = True
+
+    def file_uploaded(self, sender, obj=None, **kwargs):
+        """Publish the upload of a file of a deposit.
+
+        The signal is sent once the file is committed.
+        """
+        data = db.session.query(RecordMetadata.json).join(
+            RecordsBuckets, RecordsBuckets.record_id == RecordMetadata.id
+        ).filter(RecordsBuckets.bucket_id == obj.bucket_id).scalar()
+        pid_value = (data or {}).get('_deposit', {}).get('id')
+        if pid_value is not None:
+            self.publish([self.event(pid_value, 'file', dict(
+                key=obj.key, version_id=str(obj.version_id)))])
+
+    def event(self, pid_value, type_, data=None):
+        """Get the events of a deposit for all its channels.
+
+        :param pid_value: PID value of the deposit.
+        :param type_: Type of the event.
+        :param data: Other event data.
+        :returns: List of :meth:`invenio_sse.ext._SSEState.publish`
+            arguments.
+        """
+        data = dict(data or {}, id=pid_value)
+        return [
+            dict(data=data, type_=type_,
+                 channel=deposit_channel(pid_type, pid_value, app=self.app))
+            for pid_type in self.pid_types
+        ]
+
+    def events(self, changes):
+        """Get the events of the changes of a transaction.
+
+        :param changes: Changes returned by :meth:`changes`.
+        :returns: Iterator of lists of events, see :meth:`event`.
+        """
+        for change in changes.values():
+            if change.get('deleted'):
+                if change.get('before', True) is not None:
+                    yield self.event(change['pid_value'], 'deleted')
+                continue
+            if 'after' not in change:
+                continue
+            before = change['before'] or {}
+            patch = make_patch(before, change['after']).patch
+            if change['before'] is None:
+                type_ = 'created'
+            elif not patch:
+                continue
+            elif (before.get('_deposit', {}).get('status') != 'published' and
+                  change['after']['_deposit'].get('status') == 'published'):
+                type_ = 'published'
+            else:
+                type_ = 'updated'
+            yield self.event(change['pid_value'], type_, dict(patch=patch))
+
+    def publish(self, events):
+        """Publish events in one batch.
+
+        Errors are logged, as the changes are already committed.
+
+        :param events: Iterable of lists of events, see :meth:`event`.
+        """
+        try:
+            current_sse.publish_many(
+                event for group in events for event in group)
+        except Exception:
+            logger.exception('Could not publish the SSE deposit events.')
+
+
+def session_committed(session):
+    """Publish the changes of a committed transaction."""
+    changes = session.info.pop(DepositEvents.info_key, None)
+    if not changes or not has_app_context():
+        return
+    ext = current_app.extensions.get('invenio-sse-deposit')
+    if ext is not None and ext.events is not None:
+        ext.events.publish(ext.events.events(changes))
+
+
+def session_rolled_back(session):
+    """Drop the changes of a rolled back transaction."""
+    session.info.pop(DepositEvents.info_key, None)
@@ -26,9 +26,35 @@
 
 from __future__ import absolute_import, print_function
 
+import logging
+
 import pkg_resources
+from flask import current_app, has_app_context
+from invenio_db import db
+from invenio_records.signals import after_record_delete, after_record_update
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
 
+from .events import DepositEvents
+from .permissions import PermissionCache
 from .rest import create_blueprint
+from .revalidation import Revalidator
+
+try:
+    from invenio_access.models import ActionRoles, ActionSystemRoles, \
+        ActionUsers
+except ImportError:  # pragma: no cover
+    ActionRoles = ActionSystemRoles = ActionUsers = None
+
+logger = logging.getLogger(__name__)
+
+INVALIDATIONS_KEY = 'invenio-sse-deposit-permissions'
+"""Key of the pending cache invalidations in the info of a session.
+
+Holds the ``(pid_type, pid_value)`` pairs of the changed deposits, and
+``None`` when the access rules changed.
+"""
 
 
 class InvenioSSEDeposit(object):
@@ -53,12 +79,83 @@ class InvenioSSEDeposit(object):
     def init_app(self, app):
         """Flask application initialization.
 
-        Initialize the REST endpoints for SSE.
+        Initialize the REST endpoints for SSE, invalidate their cached
+        permissions on the changes of the deposits and access rules,
+        revalidate the permissions of the open streams, and publish the
+        changes of the deposits.
 
         :param app: An instance of :class:`flask.Flask`.
         """
+        endpoints = app.config['DEPOSIT_REST_ENDPOINTS'] or {}
+        self.pid_types = set(
+            options['pid_type'] for options in endpoints.values())
+        self.permission_cache = PermissionCache(app)
+        self.revalidator = Revalidator(
+            app, permission_cache=self.permission_cache)
         blueprint = create_blueprint(
-            app.config['DEPOSIT_REST_ENDPOINTS']
+            endpoints, permission_cache=self.permission_cache,
+            revalidator=self.revalidator,
         )
 
+        self.events = None
+        if app.config['SSE_DEPOSIT_EVENTS']:
+            self.events = DepositEvents(app, self.pid_types)
+            self.events.connect()
+
         app.register_blueprint(blueprint)
+        app.extensions['invenio-sse-deposit'] = self
+
+        if app.config['SSE_DEPOSIT_PERMISSION_CACHE_TTL']:
+            after_record_update.connect(self.record_changed, sender=app)
+            after_record_delete.connect(self.record_changed, sender=app)
+            for model in (ActionUsers, ActionRoles, ActionSystemRoles):
+                if model is None:
+                    continue
+                for name in ('after_insert', 'after_update', 'after_delete'):
+                    if not event.contains(model, name, access_changed):
+                        event.listen(model, name, access_changed)
+            for name, listener in (
+                    ('after_commit', invalidate_permissions),
+                    ('after_rollback', discard_invalidations)):
+                if not event.contains(db.session, name, listener):
+                    event.listen(db.session, name, listener)
+
+    def record_changed(self, sender, record=None, **kwargs):
+        """Drop the cached permissions of a deposit once its change commits.
+
+        Dropping them earlier would let a client reconnecting before the
+        commit cache the former decision again.
+        """
+        pid_value = (record or {}).get('_deposit', {}).get('id')
+        if pid_value is None:
+            return
+        db.session.info.setdefault(INVALIDATIONS_KEY, set()).update(
+            (pid_type, pid_value) for pid_type in self.pid_types)
+
+
+def access_changed(mapper, connection, target):
+    """Drop all the cached permissions once an access rule change commits."""
+    session = object_session(target) or db.session
+    session.info.setdefault(INVALIDATIONS_KEY, set()).add(None)
+
+
+def invalidate_permissions(session):
+    """Drop the cached permissions changed by a committed transaction."""
+    invalidations = session.info.pop(INVALIDATIONS_KEY, None)
+    if not invalidations or not has_app_context():
+        return
+    ext = current_app.extensions.get('invenio-sse-deposit')
+    if ext is None or not ext.permission_cache.ttl:
+        return
+    try:
+        if None in invalidations:
+            ext.permission_cache.invalidate()
+        else:
+            ext.permission_cache.invalidate(*invalidations)
+    except RedisError:
+        logger.exception('Could not invalidate the SSE permissions.')
+
+
+def discard_invalidations(session):
+    """Drop the cache invalidations of a rolled back transaction."""
+    session.info.pop(INVALIDATIONS_KEY, None)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Cache of the read permission decisions of the deposit streams."""
+
+from __future__ import absolute_import, print_function
+
+import time
+
+from invenio_sse.connections import create_client
+
+
+class PermissionCache(object):
+    """Cache whether users may read the stream of a deposit.
+
+    EventSource clients reconnect often, and checking the permission
+    resolves the PID and loads the deposit from the database. Decisions are
+    instead kept for ``SSE_DEPOSIT_PERMISSION_CACHE_TTL`` seconds, in one
+    Redis hash per deposit shared by all the processes, and dropped when the
+    deposit changes. A change of the access rules increments a generation
+    counter instead, which outdates the decisions of all the deposits
+    without scanning the keyspace.
+    """
+
+    def __init__(self, app):
+        """Initialize the cache.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        self.app = app
+        self._redis = None
+
+    @property
+    def ttl(self):
+        """Seconds a decision is kept, ``None`` when the cache is off."""
+        return self.app.config['SSE_DEPOSIT_PERMISSION_CACHE_TTL']
+
+    @property
+    def redis(self):
+        """Redis client of the cache."""
+        if self._redis is None:
+            self._redis = create_client(self.app)
+        return self._redis
+
+    def key(self, pid_type, pid_value):
+        """Get the Redis key of the decisions of a deposit."""
+        return self.app.config['SSE_DEPOSIT_PERMISSION_CACHE_KEY'].format(
+            pid_type=pid_type, pid_value=pid_value)
+
+    @property
+    def generation_key(self):
+        """Redis key of the generation of the decisions."""
+        return self.app.config['SSE_DEPOSIT_PERMISSION_CACHE_GENERATION_KEY']
+
+    def get(self, pid_type, pid_value, user_id):
+        """Get the cached decision of a user.
+
+        :param pid_type: PID type of the deposit.
+        :param pid_value: PID value of the deposit.
+        :param user_id: ID of the user, ``None`` for anonymous users.
+        :returns: Whether the user may read the stream, or ``None`` if
+                  unknown.
+        """
+        return self.get_many(pid_type, pid_value, [user_id])[user_id]
+
+    def get_many(self, pid_type, pid_value, user_ids):
+        """Get the cached decisions of several users in one round-trip.
+
+        :returns: Dictionary of the decisions, ``None`` if unknown, by user
+                  ID.
+        """
+        user_ids = list(user_ids)
+        if not self.ttl or not user_ids:
+            return dict.fromkeys(user_ids)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self.generation_key)
+        pipe.hmget(self.key(pid_type, pid_value),
+                   [self._field(user_id) for user_id in user_ids])
+        generation, values = pipe.execute()
+        generation = generation or b'0'
+        now = time.time()
+        decisions = {}
+        for user_id, value in zip(user_ids, values):
+            decisions[user_id] = None
+            if value is not None:
+                allowed, expires, value_generation = value.split(b':')
+                if float(expires) >= now and value_generation == generation:
+                    decisions[user_id] = allowed == b'1'
+        return decisions
+
+    def set(self, pid_type, pid_value, user_id, allowed):
+        """Cache the decision of a user.
+
+        :param allowed: Whether the user may read the stream.
+        """
+        if not self.ttl:
+            return
+        key = self.key(pid_type, pid_value)
+        generation = int(self.redis.get(self.generation_key) or 0)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(key, self._field(user_id), '{0}:{1}:{2}'.format(
+            int(bool(allowed)), time.time() + self.ttl, generation))
+        pipe.expire(key, int(self.ttl) + 1)
+        pipe.execute()
+
+    def invalidate(self, *deposits):
+        """Drop the decisions of deposits, by default of all of them.
+
+        :param deposits: ``(pid_type, pid_value)`` pairs of the deposits.
+        """
+        if deposits:
+            self.redis.delete(*(self.key(*deposit) for deposit in deposits))
+        else:
+            self.redis.incr(self.generation_key)
+
+    def _field(self, user_id):
+        """Get the hash field of the decision of a user."""
+        return 'anonymous' if user_id is None else str(user_id)
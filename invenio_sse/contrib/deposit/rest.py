@@ -27,21 +27,34 @@
 from __future__ import absolute_import, print_function
 
 from copy import deepcopy
+from functools import partial
 
-from flask import Blueprint, Response, url_for
+from flask import Blueprint, abort
 from flask.views import MethodView
+from flask_login import current_user
+from invenio_db import db
 from invenio_deposit.search import DepositSearch
 from invenio_records_rest.utils import obj_or_import_string
 from invenio_records_rest.views import need_record_permission, pass_record
+from werkzeug.exceptions import Forbidden, Unauthorized
 
 from invenio_sse import current_sse
 
+from .channels import deposit_channel
 
-def create_blueprint(endpoints, url_prefix=''):
+
+def create_blueprint(endpoints, url_prefix='', permission_cache=None,
+                     revalidator=None):
     """Create Invenio-SSE-Deposit blueprint.
 
     :param endpoints: List of endpoints configuration.
     :param url_prefix: Prefix of the blueprint's URL.
+    :param permission_cache: Optional
+        :class:`invenio_sse.contrib.deposit.permissions.PermissionCache` of
+        the read permission decisions.
+    :param revalidator: Optional
+        :class:`invenio_sse.contrib.deposit.revalidation.Revalidator` of
+        the open streams.
     :returns: The configured blueprint.
     """
     blueprint = Blueprint(
@@ -60,8 +73,18 @@ def create_blueprint(endpoints, url_prefix=''):
             search_class=obj_or_import_string(
                 options.get('search_class', DepositSearch)
             ),
+            permission_cache=permission_cache,
+            revalidator=revalidator,
         )
 
+        if revalidator is not None:
+            revalidator.add_endpoint(
+                options['pid_type'],
+                obj_or_import_string(options.get(
+                    'record_class', 'invenio_deposit.api:Deposit')),
+                ctx['read_permission_factory'],
+            )
+
         # Extend blueprint for SSE
         deposit_sse = DepositSSE.as_view(
             DepositSSE.view_name.format(endpoint),
@@ -86,22 +109,65 @@ class DepositSSE(MethodView):
 
     def __init__(self, pid_type, ctx):
         """Constructor."""
+        self.pid_type = pid_type
         for key, value in ctx.items():
             setattr(self, key, value)
 
-    @pass_record
-    @need_record_permission('read_permission_factory')
-    def get(self, pid, record):
+    def get(self, pid_value):
         """Initialize SSE connection.
 
-        Permission required: `read_permission_factory`.
+        Permission required: `read_permission_factory`. The decision is
+        cached by the ``permission_cache``, so that reconnecting clients
+        neither resolve the PID nor load the deposit, and checked again
+        periodically by the ``revalidator`` while the stream is open.
+
+        :param pid_value: Lazy PID value (from url).
+        :returns: the established SSE channel.
+        """
+        user_id = current_user.get_id()
+        allowed = None
+        if self.permission_cache is not None:
+            allowed = self.permission_cache.get(
+                self.pid_type, pid_value.value, user_id)
+        if allowed is None:
+            try:
+                allowed = self.check_read_permission(pid_value=pid_value)
+            except (Forbidden, Unauthorized):
+                allowed = False
+            if self.permission_cache is not None:
+                self.permission_cache.set(
+                    self.pid_type, pid_value.value, user_id, allowed)
+        if not allowed:
+            abort(403 if current_user.is_authenticated else 401)
+
+        subscribed = None
+        if self.revalidator is not None and self.revalidator.interval:
+            subscribed = partial(self.revalidator.register, self.pid_type,
+                                 pid_value.value, user_id)
+        channel = deposit_channel(self.pid_type, pid_value.value)
+        self.release(pid_value)
+        return current_sse.response(
+            current_sse.messages(channel=channel, subscribed=subscribed))
+
+    def release(self, pid_value):
+        """Release the database resources of the request before streaming.
+
+        The stream may stay open for hours without using the database, so
+        the deposit loaded by the permission check is dropped and the
+        connection of the session is returned to the pool.
+
+        :param pid_value: Lazy PID value (from url).
+        """
+        vars(pid_value).pop('data', None)
+        db.session.remove()
+
+    @pass_record
+    @need_record_permission('read_permission_factory')
+    def check_read_permission(self, pid, record):
+        """Check that the current user may read the deposit.
 
         :param pid: Pid object (from url).
         :param record: Record object resolved from the pid.
-        :returns: the established SSE channel.
+        :returns: ``True``, aborts otherwise.
         """
-        channel = url_for('.depid_sse', pid_value=pid.pid_value)
-        return Response(
-            current_sse.messages(channel=channel),
-            mimetype='text/event-stream',
-        )
+        return True
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Periodic revalidation of the permissions of the deposit streams."""
+
+from __future__ import absolute_import, print_function
+
+import logging
+import os
+import threading
+import time
+import weakref
+
+from flask import g
+from flask_principal import AnonymousIdentity, Identity, identity_loaded
+from invenio_accounts.models import User
+from invenio_db import db
+from invenio_pidstore.errors import PersistentIdentifierError
+from invenio_pidstore.resolver import Resolver
+from invenio_records_rest.proxies import current_records_rest
+
+logger = logging.getLogger(__name__)
+
+
+class Revalidator(object):
+    """Stop the deposit streams of the users who lost access.
+
+    Permissions are otherwise only checked when a stream opens. Every
+    ``SSE_DEPOSIT_REVALIDATE_INTERVAL`` seconds, a background thread checks
+    the open streams of the process in one batch: each deposit is loaded
+    once for all its streams, and the decision is computed once per user,
+    or taken from the
+    :class:`invenio_sse.contrib.deposit.permissions.PermissionCache`.
+    """
+
+    def __init__(self, app, permission_cache=None):
+        """Initialize the revalidator.
+
+        :param app: An instance of :class:`flask.Flask`.
+        :param permission_cache: Optional
+            :class:`invenio_sse.contrib.deposit.permissions.PermissionCache`.
+        """
+        self.app = app
+        self.permission_cache = permission_cache
+        self.endpoints = {}
+        self.pid = os.getpid()
+        self._streams = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def interval(self):
+        """Seconds between two checks, ``None`` when disabled."""
+        return self.app.config['SSE_DEPOSIT_REVALIDATE_INTERVAL']
+
+    def add_endpoint(self, pid_type, record_class, permission_factory=None):
+        """Register the deposits of a REST endpoint.
+
+        :param pid_type: PID type of the deposits.
+        :param record_class: Class of the deposits.
+        :param permission_factory: Read permission factory of the endpoint,
+                                   by default the one of
+                                   Invenio-Records-REST.
+        """
+        self.endpoints[pid_type] = (
+            Resolver(pid_type=pid_type, object_type='rec',
+                     getter=record_class.get_record),
+            permission_factory,
+        )
+
+    def register(self, pid_type, pid_value, user_id, subscription):
+        """Revalidate the stream of a user.
+
+        :param pid_type: PID type of the deposit.
+        :param pid_value: PID value of the deposit.
+        :param user_id: ID of the user, ``None`` for anonymous users.
+        :param subscription: The :class:`invenio_sse.hub.Subscription` of the
+                             stream.
+        """
+        with self._lock:
+            if self.pid != os.getpid():
+                # The thread does not survive a fork.
+                self._streams, self._thread = {}, None
+                self.pid = os.getpid()
+            self._streams.setdefault((pid_type, pid_value), {}).setdefault(
+                user_id, weakref.WeakSet()).add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='sse-deposit-revalidator')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def revalidate(self):
+        """Check the permissions of all the open streams.
+
+        :returns: The number of stopped streams.
+        """
+        stopped = 0
+        with self.app.app_context():
+            try:
+                for (pid_type, pid_value), users in self._open().items():
+                    for user_id in self.denied(pid_type, pid_value, users):
+                        for subscription in users[user_id]:
+                            subscription.stop(discard=True)
+                            stopped += 1
+            finally:
+                db.session.remove()
+        if stopped:
+            logger.info('Stopped %d unauthorized SSE deposit streams.',
+                        stopped)
+        return stopped
+
+    def denied(self, pid_type, pid_value, user_ids):
+        """Get the users who may not read a deposit.
+
+        :param pid_type: PID type of the deposit.
+        :param pid_value: PID value of the deposit.
+        :param user_ids: IDs of the users.
+        :returns: List of the IDs of the users without access.
+        """
+        decisions = {}
+        if self.permission_cache is not None:
+            decisions = self.permission_cache.get_many(
+                pid_type, pid_value, user_ids)
+        missing = [user_id for user_id in user_ids
+                   if decisions.get(user_id) is None]
+        if missing:
+            resolver, permission_factory = self.endpoints[pid_type]
+            try:
+                _, record = resolver.resolve(pid_value)
+            except PersistentIdentifierError:
+                record = None
+            for user_id in missing:
+                allowed = record is not None and self.can_read(
+                    permission_factory, record, user_id)
+                decisions[user_id] = allowed
+                if self.permission_cache is not None:
+                    self.permission_cache.set(
+                        pid_type, pid_value, user_id, allowed)
+        return [user_id for user_id in user_ids if not decisions[user_id]]
+
+    def can_read(self, permission_factory, record, user_id):
+        """Check if a user may read a deposit, as in a request of the user.
+
+        The user is not logged in, so that no login is recorded or signaled,
+        only the identity of the request is loaded.
+
+        :param permission_factory: Read permission factory of the endpoint.
+        :param record: The deposit.
+        :param user_id: ID of the user, ``None`` for anonymous users.
+        """
+        permission_factory = permission_factory or \
+            current_records_rest.read_permission_factory
+        if permission_factory is None:
+            return True
+        with self.app.test_request_context():
+            if user_id is None:
+                identity = AnonymousIdentity()
+            else:
+                user = User.query.get(user_id)
+                if user is None or not user.active:
+                    return False
+                self._set_current_user(user)
+                identity = Identity(user.id)
+            g.identity = identity
+            identity_loaded.send(self.app, identity=identity)
+            return bool(permission_factory(record=record).can())
+
+    def _set_current_user(self, user):
+        """Set the user of the current request, as Flask-Login does."""
+        login_manager = self.app.login_manager
+        if hasattr(login_manager, '_update_request_context_with_user'):
+            login_manager._update_request_context_with_user(user)
+        else:  # Flask-Login < 0.6
+            from flask import _request_ctx_stack
+            _request_ctx_stack.top.user = user
+
+    def _open(self):
+        """Get the open streams by deposit and user, forgetting the others."""
+        streams = {}
+        with self._lock:
+            for key, users in list(self._streams.items()):
+                for user_id, subscriptions in list(users.items()):
+                    subscriptions = [subscription
+                                     for subscription in subscriptions
+                                     if not subscription.closed]
+                    if subscriptions:
+                        streams.setdefault(key, {})[user_id] = subscriptions
+                    else:
+                        del users[user_id]
+                if not users:
+                    del self._streams[key]
+        return streams
+
+    def _run(self):
+        """Revalidate the streams until none is left."""
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._streams or self.pid != os.getpid():
+                    self._thread = None
+                    return
+            try:
+                self.revalidate()
+            except Exception:
+                logger.exception('SSE deposit revalidation failed.')
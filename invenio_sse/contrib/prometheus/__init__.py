@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Prometheus metrics of Invenio-SSE.
+
+Requires ``pip install invenio-sse[prometheus]``. Initialize the extension
+after Invenio-SSE to record the metrics and serve them at
+``SSE_METRICS_URL``:
+
+.. code-block:: python
+
+    InvenioSSE(app)
+    InvenioSSEPrometheus(app)
+
+Metrics are collected per process; restrict the access to the endpoint
+in the web server if it must not be public.
+"""
+
+from .ext import InvenioSSEPrometheus
+from .instrumentation import PrometheusInstrumentation
+
+__all__ = ('InvenioSSEPrometheus', 'PrometheusInstrumentation')
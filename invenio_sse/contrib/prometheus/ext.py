@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Prometheus extension for Invenio-SSE."""
+
+from __future__ import absolute_import, print_function
+
+from .instrumentation import PrometheusInstrumentation
+from .views import create_blueprint
+
+
+class InvenioSSEPrometheus(object):
+    """Invenio-SSE Prometheus extension."""
+
+    def __init__(self, app=None):
+        """Extension initialization.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Flask application initialization.
+
+        Record the metrics, unless ``SSE_INSTRUMENTATION`` already sets a
+        :class:`PrometheusInstrumentation`, and register the endpoint
+        exporting them if ``SSE_METRICS_URL`` is set.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        state = app.extensions['invenio-sse']
+        if not isinstance(state.instrumentation, PrometheusInstrumentation):
+            if state.instrumentation is not None:
+                raise RuntimeError(
+                    'SSE_INSTRUMENTATION is not a PrometheusInstrumentation.')
+            state.instrumentation = PrometheusInstrumentation(app)
+        if app.config['SSE_METRICS_URL']:
+            app.register_blueprint(
+                create_blueprint(app.config['SSE_METRICS_URL']))
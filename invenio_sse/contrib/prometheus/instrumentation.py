@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Instrumentation recording Prometheus metrics."""
+
+from __future__ import absolute_import, print_function
+
+from invenio_sse.instrumentation import Instrumentation
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+except ImportError:  # pragma: no cover
+    CollectorRegistry = None
+
+
+class PrometheusInstrumentation(Instrumentation):
+    """Record the SSE activity as Prometheus metrics.
+
+    - ``sse_published_events_total``: events published, per channel
+      group, see :meth:`channel_label`;
+    - ``sse_subscriptions``: subscribers of the hubs of the process;
+    - ``sse_queued_events``: events waiting in the subscriber queues;
+    - ``sse_dropped_events_total``: events dropped by full queues;
+    - ``sse_written_bytes_total``: bytes sent to the clients;
+    - ``sse_format_seconds``: time spent formatting each event.
+    """
+
+    format_buckets = (.00001, .00005, .0001, .0005, .001, .005, .01, .05,
+                      float('inf'))
+    """Buckets of the ``sse_format_seconds`` histogram."""
+
+    def __init__(self, app, registry=None):
+        """Initialize the metrics.
+
+        :param app: An instance of :class:`flask.Flask`.
+        :param registry: Registry of the metrics, by default a new one.
+        """
+        if CollectorRegistry is None:
+            raise RuntimeError(
+                'You must use `pip install invenio-sse[prometheus]` to '
+                'export the SSE metrics to Prometheus.')
+        super(PrometheusInstrumentation, self).__init__(app)
+        self.registry = registry or CollectorRegistry()
+        self.published_events = Counter(
+            'sse_published_events', 'Events published.', ['channel'],
+            registry=self.registry)
+        self.subscriptions = Gauge(
+            'sse_subscriptions', 'Subscribers of the hubs.',
+            registry=self.registry)
+        self.queued_events = Gauge(
+            'sse_queued_events', 'Events waiting in the subscriber queues.',
+            registry=self.registry)
+        self.queued_events.set_function(self._queued)
+        self.dropped_events = Counter(
+            'sse_dropped_events', 'Events dropped by full subscriber queues.',
+            registry=self.registry)
+        self.written_bytes = Counter(
+            'sse_written_bytes', 'Bytes sent to the clients.',
+            registry=self.registry)
+        self.format_seconds = Histogram(
+            'sse_format_seconds', 'Time spent formatting events.',
+            buckets=self.format_buckets, registry=self.registry)
+
+    def channel_label(self, channel):
+        """Get the label of a channel.
+
+        Channels are grouped by the part of their names before the last
+        ``:``, so that the number of time series stays bounded with one
+        channel per record, unless ``SSE_METRICS_CHANNEL_LABELS`` is set.
+        Override it to group them differently.
+
+        :param channel: Name of the channel.
+        """
+        if self.app.config['SSE_METRICS_CHANNEL_LABELS']:
+            return channel
+        return channel.rpartition(':')[0]
+
+    def published(self, channel, subscribers):
+        """Count the published event."""
+        self.published_events.labels(self.channel_label(channel)).inc()
+
+    def subscribed(self, subscription):
+        """Count the new subscriber."""
+        self.subscriptions.inc()
+
+    def unsubscribed(self, subscription):
+        """Count the removed subscriber."""
+        self.subscriptions.dec()
+
+    def formatted(self, event, seconds):
+        """Record the formatting time."""
+        self.format_seconds.observe(seconds)
+
+    def dropped(self, subscription, count):
+        """Count the dropped events."""
+        self.dropped_events.inc(count)
+
+    def written(self, size):
+        """Count the bytes sent."""
+        self.written_bytes.inc(size)
+
+    def _queued(self):
+        """Get the number of events queued in the hub of the process."""
+        state = self.app.extensions.get('invenio-sse')
+        if state is None or state.instrumentation is not self:
+            return 0
+        return state.hub.queued
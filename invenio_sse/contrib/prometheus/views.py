@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Endpoint exporting the Prometheus metrics."""
+
+from __future__ import absolute_import, print_function
+
+from flask import Blueprint, Response, abort, current_app
+
+from invenio_sse import current_sse
+from invenio_sse.utils import obj_or_import_string
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+except ImportError:  # pragma: no cover
+    generate_latest = None
+
+
+def create_blueprint(url):
+    """Create the blueprint of the metrics endpoint.
+
+    :param url: URL of the endpoint.
+    :returns: The configured blueprint.
+    """
+    blueprint = Blueprint('invenio_sse_prometheus', __name__)
+    blueprint.add_url_rule(url, 'metrics', metrics, methods=['GET'])
+    return blueprint
+
+
+def metrics():
+    """Export the metrics of the process in the Prometheus text format.
+
+    Permission required: ``SSE_METRICS_PERMISSION_FACTORY``, if set.
+    """
+    factory = obj_or_import_string(
+        current_app.config['SSE_METRICS_PERMISSION_FACTORY'])
+    if factory is not None and not factory().can():
+        abort(403)
+    return Response(
+        generate_latest(current_sse.instrumentation.registry),
+        mimetype=CONTENT_TYPE_LATEST,
+    )
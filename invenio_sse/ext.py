@@ -26,14 +26,19 @@
 
 from __future__ import absolute_import, print_function
 
-import json
-import time
+import os
+from operator import attrgetter
 
 import pkg_resources
-from redis import StrictRedis
+from flask import current_app, has_request_context, request
 
 from . import config
-from .utils import format_sse_event
+from .batch import PublishBatch
+from .coalesce import Coalescer, Throttle
+from .compression import StreamCompressor, compress_frames, negotiate_encoding
+from .hub import Backoff, queue
+from .instrumentation import measure_written
+from .utils import HEARTBEAT, format_sse_retry, obj_or_import_string
 
 
 class _SSEState(object):
@@ -42,7 +47,26 @@ class _SSEState(object):
     def __init__(self, app, entry_point_group=None):
         """Initialize state."""
         self.app = app
-        self._redis = StrictRedis.from_url(app.config['SSE_REDIS_URL'])
+        self._hub = None
+        self.codec = obj_or_import_string(app.config['SSE_JSON_CODEC'])()
+        self.broker = obj_or_import_string(app.config['SSE_BROKER'])(
+            app, codec=self.codec)
+        self.id_generator = obj_or_import_string(
+            app.config['SSE_EVENT_ID_GENERATOR'])(app)
+        if getattr(self.id_generator, 'assigned_by_redis', False) and \
+                not self.broker.assigns_ids:
+            raise RuntimeError(
+                '{0} does not number the events, choose another '
+                'SSE_EVENT_ID_GENERATOR.'.format(type(self.broker).__name__))
+        self.instrumentation = None
+        if app.config['SSE_INSTRUMENTATION']:
+            self.instrumentation = obj_or_import_string(
+                app.config['SSE_INSTRUMENTATION'])(app)
+        self.coalescer = Coalescer(
+            self._publish, app.config['SSE_COALESCE_WINDOW'])
+        self.predicates = {}
+        for name, predicate in app.config['SSE_PREDICATES'].items():
+            self.register_predicate(name, predicate)
         self.integrations = {}
 
         if entry_point_group:
@@ -57,7 +81,28 @@ class _SSEState(object):
         for ep in pkg_resources.iter_entry_points(entry_point_group):
             self.register_integration(ep.name, ep.load())
 
-    def publish(self, data, type_=None, id_=None, retry=None, channel='sse'):
+    def register_predicate(self, name, predicate):
+        """Register a predicate filtering events on their data.
+
+        :param name: Name used to select the predicate in :meth:`messages`.
+        :param predicate: Callable, or its import path, accepting the data
+                          of an event and returning whether to send it.
+        """
+        self.predicates[name] = obj_or_import_string(predicate)
+
+    def get_predicate(self, predicate):
+        """Get a predicate from its name.
+
+        :param predicate: Name of a registered predicate, a callable or
+                          ``None``.
+        :raises KeyError: If no predicate is registered with the name.
+        """
+        if isinstance(predicate, str):
+            return self.predicates[predicate]
+        return predicate
+
+    def publish(self, data, type_=None, id_=None, retry=None, channel='sse',
+                coalesce=None):
         """Publish data as a server-sent event.
 
         :param data: Event data, any object serialize to JSON.
@@ -68,23 +113,270 @@ class _SSEState(object):
                       the event.
         :param channel: Optional channel to direct events to different clients,
                         by defaul ``sse``.
+        :param coalesce: Optional key collapsing the events of the channel
+                         published with it within ``SSE_COALESCE_WINDOW``
+                         seconds to the latest one, see
+                         :mod:`invenio_sse.coalesce`.
+        :returns: The number of subscribers that received the event, or
+                  ``None`` if the broker cannot tell or the event was
+                  deferred.
+        """
+        message = self._message(channel, data, type_, id_, retry)
+        if coalesce is not None:
+            return self.coalescer((channel, coalesce), channel, message)
+        return self._publish(channel, message)
+
+    def _publish(self, channel, message):
+        """Publish an event message to the broker."""
+        subscribers = self.broker.publish(channel, message)
+        if self.instrumentation is not None:
+            self.instrumentation.published(channel, subscribers)
+        return subscribers
+
+    def publish_many(self, events, **kwargs):
+        """Publish several events at once, e.g. through a Redis pipeline.
+
+        .. code-block:: python
+
+            current_sse.publish_many([
+                dict(data={'state': 'indexed'}, channel=channel)
+                for channel in channels
+            ])
+
+        :param events: Iterable of dictionaries of :meth:`publish` arguments.
+        :param kwargs: Arguments passed to :meth:`batch`.
+        :returns: The number of subscribers that received each event.
+        """
+        with self.batch(**kwargs) as batch:
+            for event in events:
+                batch.publish(**event)
+        return batch.results
+
+    def batch(self, max_size=None, max_delay=None):
+        """Buffer published events and send them to the broker in batches.
+
+        .. code-block:: python
+
+            with current_sse.batch() as batch:
+                for record in records:
+                    batch.publish(data=record['title'], channel=record.id)
+            batch.results
+
+        :param max_size: Maximum number of buffered events, by default
+                         ``SSE_PUBLISH_BATCH_SIZE``.
+        :param max_delay: Maximum time in seconds an event stays buffered, by
+                          default ``SSE_PUBLISH_BATCH_DELAY``.
+        :returns: A :class:`invenio_sse.batch.PublishBatch`.
+        """
+        return PublishBatch(
+            self,
+            max_size=max_size or self.app.config['SSE_PUBLISH_BATCH_SIZE'],
+            max_delay=max_delay or self.app.config['SSE_PUBLISH_BATCH_DELAY'],
+        )
+
+    def history(self, channel, last_event_id):
+        """Get the events published to a channel after the given one.
+
+        Requires ``SSE_HISTORY_MAXLEN`` to be set when publishing.
+
+        :param channel: Name of the channel.
+        :param last_event_id: ID of the last event received by the client.
+        :returns: List of :class:`invenio_sse.hub.Event` in publication
+                  order, empty if the given event is not in the history
+                  (anymore).
         """
-        id_ = id_ or time.time()
-        msg = {"data": data, "event": type_, "id": id_, "retry": retry}
-        self._redis.publish(channel, json.dumps(msg))
+        return self.broker.history(channel, last_event_id)
+
+    def _message(self, channel, data, type_=None, id_=None, retry=None):
+        """Build an event message as published to the broker.
+
+        The data comes last, so that subscribers take its serialization
+        from the payload, see :meth:`invenio_sse.hub.Event.from_payload`.
+        """
+        id_ = id_ or self.id_generator(channel)
+        return {"id": id_, "event": type_, "retry": retry, "data": data}
 
     def _pubsub(self):
-        """Get redis pubsub instance."""
-        return self._redis.pubsub()
-
-    def messages(self, channel='sse'):
-        """Message generator from the given channel."""
-        pubsub = self._pubsub()
-        pubsub.subscribe(channel)
-        for message in pubsub.listen():
-            if message['type'] == 'message':
-                yield format_sse_event(
-                    json.loads(message['data'].decode('utf-8')))
+        """Get a pub/sub connection of the broker."""
+        return self.broker.pubsub()
+
+    @property
+    def hub(self):
+        """Fan-out hub shared by all the subscribers of this process."""
+        if self._hub is None or self._hub.pid != os.getpid():
+            self._hub = self.broker.hub_class(
+                self._pubsub,
+                queue_size=self.app.config['SSE_SUBSCRIBER_QUEUE_SIZE'],
+                idle_timeout=self.app.config['SSE_IDLE_TIMEOUT'],
+                overflow=self.app.config['SSE_SUBSCRIBER_OVERFLOW'],
+                overflow_retry=self.app.config[
+                    'SSE_SUBSCRIBER_OVERFLOW_RETRY'],
+                codec=self.codec,
+                instrumentation=self.instrumentation,
+                backoff=self.backoff,
+                drop_retry=self.app.config['SSE_REDIS_RECONNECT_CLIENT_RETRY'],
+            )
+        return self._hub
+
+    @property
+    def backoff(self):
+        """Backoff of the hubs reconnecting to Redis."""
+        return Backoff(
+            base=self.app.config['SSE_REDIS_RECONNECT_BACKOFF'],
+            cap=self.app.config['SSE_REDIS_RECONNECT_BACKOFF_MAX'],
+            attempts=self.app.config['SSE_REDIS_RECONNECT_ATTEMPTS'],
+        )
+
+    def messages(self, channel='sse', last_event_id=None, patterns=None,
+                 types=None, predicate=None, throttle=None, subscribed=None):
+        """Message generator from the given channels.
+
+        When listening to several channels, or to channel patterns, the data
+        of each event is sent as ``{"channel": ..., "data": ...}`` so that
+        the client knows where it comes from.
+
+        When the channel history is enabled with ``SSE_HISTORY_MAXLEN``,
+        the events published after ``last_event_id`` are replayed before the
+        live ones, so that reconnecting clients do not miss any event. This
+        is only supported for a single channel.
+
+        A comment is sent every ``SSE_HEARTBEAT_INTERVAL`` seconds without
+        events, so that the server notices closed connections and releases
+        their subscription.
+
+        Events are filtered by the hub before being formatted, so that
+        filtered out events cost neither serialization nor bandwidth.
+
+        :param channel: Name or list of names of the channels.
+        :param last_event_id: ID of the last event received by the client,
+                              by default the ``Last-Event-ID`` header of the
+                              current request.
+        :param patterns: List of channel patterns, in the syntax of Redis
+                         ``PSUBSCRIBE``.
+        :param types: Optional list of event types to send; events without
+                      type have the type ``message``.
+        :param predicate: Optional predicate on the data of the events, or
+                          name of a registered one, see
+                          :meth:`register_predicate`.
+        :param throttle: Optional minimum time in seconds between two events
+                         of the same channel and type; the events received
+                         meanwhile collapse to the latest one.
+        :param subscribed: Optional callable called with the
+                           :class:`invenio_sse.hub.Subscription` of the
+                           stream once subscribed, e.g. to stop it from
+                           another thread.
+        """
+        if last_event_id is None and has_request_context():
+            last_event_id = request.headers.get('Last-Event-ID')
+        frames = self._stream(
+            channel, last_event_id, patterns=patterns, types=types,
+            predicate=self.get_predicate(predicate), throttle=throttle,
+            subscribed=subscribed)
+        if self.instrumentation is not None:
+            return measure_written(self.instrumentation, frames)
+        return frames
+
+    def response(self, frames, compress=None):
+        """Create the streaming response of a request.
+
+        .. code-block:: python
+
+            return current_sse.response(current_sse.messages(channel))
+
+        :param frames: Frames of the stream, e.g. :meth:`messages`.
+        :param compress: Whether to compress the stream if the client
+                         accepts it, by default ``SSE_COMPRESSION``.
+        :returns: A ``text/event-stream`` response.
+        """
+        config = self.app.config
+        if compress is None:
+            compress = config['SSE_COMPRESSION']
+        headers = {}
+        if compress:
+            headers['Vary'] = 'Accept-Encoding'
+            encoding = negotiate_encoding(
+                request.headers.get('Accept-Encoding'),
+                config['SSE_COMPRESSION_ENCODINGS'])
+            if encoding:
+                headers['Content-Encoding'] = encoding
+                frames = compress_frames(frames, StreamCompressor(
+                    encoding, level=config['SSE_COMPRESSION_LEVEL'],
+                    dictionary=config['SSE_COMPRESSION_DICTIONARY']))
+        return current_app.response_class(
+            frames, mimetype='text/event-stream', headers=headers)
+
+    def _stream(self, channel, last_event_id=None, patterns=None,
+                types=None, predicate=None, throttle=None, subscribed=None):
+        """Stream the formatted events of channels."""
+        heartbeat = self.app.config['SSE_HEARTBEAT_INTERVAL']
+        throttle = Throttle(throttle) if throttle else None
+        subscription = self.hub.subscribe(
+            channel, patterns or (), types=types, predicate=predicate)
+        if subscribed is not None:
+            subscribed(subscription)
+        multiplexed = subscription.multiplexed
+        frame = attrgetter('channel_frame' if multiplexed else 'frame')
+        try:
+            replayed = None
+            if last_event_id and not multiplexed and \
+                    self.app.config['SSE_HISTORY_MAXLEN']:
+                # Live events published while reading the history are
+                # queued by the subscription and skipped below.
+                subscription.ready.wait(self.hub.poll_timeout)
+                replayed = set()
+                for event in self.history(
+                        subscription.channels[0], last_event_id):
+                    replayed.add(event.id)
+                    if subscription.accepts(event):
+                        yield event.frame
+            while True:
+                timeout = heartbeat
+                if throttle is not None:
+                    wait = throttle.timeout()
+                    if wait is not None and (timeout is None or
+                                             wait < timeout):
+                        timeout = wait
+                try:
+                    event = subscription.get(timeout=timeout)
+                except queue.Empty:
+                    due = throttle.due() if throttle is not None else ()
+                    if not due:
+                        yield HEARTBEAT
+                    for event in due:
+                        yield frame(event)
+                    continue
+                if event is None:
+                    for event in throttle.flush() if throttle else ():
+                        yield frame(event)
+                    if subscription.retry is not None:
+                        yield format_sse_retry(subscription.retry)
+                    return
+                if replayed:
+                    if event.id in replayed:
+                        continue
+                    replayed = None
+                if throttle is not None:
+                    send = throttle.offer(event)
+                    for due in throttle.due():
+                        yield frame(due)
+                    if not send:
+                        continue
+                yield frame(event)
+        finally:
+            subscription.close()
+
+    def messages_async(self, channel='sse', patterns=None, types=None,
+                       predicate=None, throttle=None, last_event_id=None):
+        """Asynchronous message generator from the given channels.
+
+        Counterpart of :meth:`messages` for asyncio servers, see
+        :mod:`invenio_sse.aio`. There is no request context, thus
+        ``last_event_id`` must be given to replay the channel history.
+        """
+        from .aio import messages
+        return messages(self, channel=channel, patterns=patterns,
+                        types=types, predicate=predicate, throttle=throttle,
+                        last_event_id=last_event_id)
 
 
 class InvenioSSE(object):
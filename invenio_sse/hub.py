@@ -0,0 +1,754 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""In-process fan-out of Redis pub/sub messages to SSE subscribers."""
+
+from __future__ import absolute_import, print_function
+
+import collections
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+try:
+    import queue
+except ImportError:  # pragma: no cover
+    import Queue as queue
+
+from redis import exceptions
+
+from .codecs import default_codec
+from .utils import format_sse_event
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_ERRORS = (exceptions.ConnectionError, exceptions.TimeoutError)
+"""Errors after which the pub/sub connection is replaced."""
+
+REUSED_DATA_SIZE = 256
+"""Size in bytes from which the data of a payload is not serialized again.
+
+Smaller data is serialized faster than it is found in the payload.
+"""
+
+
+def serialized_data(payload):
+    """Get the serialized data of a payload published by ``_SSEState``.
+
+    The data is the last member of the published messages. A quote in a
+    JSON string is always escaped, thus the first ``"data":`` is the key of
+    the message, and it follows the ``retry`` member only if the data comes
+    last, e.g. not with the messages of former versions. The codecs write no
+    space between the keys and the colons.
+
+    :param payload: The payload, as bytes.
+    :returns: The bytes of the data, or ``None`` if not found.
+    """
+    start = payload.find(b'"data":')
+    if start < 0 or not 0 <= payload.find(b'"retry":') < start or \
+            not payload.endswith(b'}'):
+        return None
+    return payload[start + 7:-1].strip() or None
+
+
+def decode_channel(channel):
+    """Get the name of a channel as reported by Redis."""
+    if isinstance(channel, bytes):
+        return channel.decode('utf-8')
+    return channel
+
+
+class Event(object):
+    """An event received from Redis, shared by all the subscribers."""
+
+    __slots__ = ('channel', 'message', 'codec', 'data', '_frame',
+                 '_channel_frame')
+
+    def __init__(self, channel, message, codec=None, data=None):
+        """Initialize the event.
+
+        :param channel: Name of the channel the event was published to.
+        :param message: Dictionary with the ``data``, ``event``, ``id`` and
+                        ``retry`` fields of the event.
+        :param codec: Optional codec serializing the data of the event.
+        :param data: Optional data already serialized by the codec.
+        """
+        self.channel = channel
+        self.message = message
+        self.codec = codec or default_codec
+        self.data = data
+        self._frame = None
+        self._channel_frame = None
+
+    @property
+    def type(self):
+        """Type of the event, ``message`` by default as in browsers."""
+        return self.message.get('event') or 'message'
+
+    @property
+    def frame(self):
+        """Formatted SSE frame of the event."""
+        if self._frame is None:
+            self._frame = format_sse_event(
+                self.message, codec=self.codec, data=self.data)
+        return self._frame
+
+    @property
+    def channel_frame(self):
+        """Frame whose data also holds the channel of the event.
+
+        Sent to clients listening to several channels at once, with the
+        data ``{"channel": ..., "data": ...}``.
+        """
+        if self._channel_frame is None:
+            data = {'channel': self.channel, 'data': self.message['data']}
+            self._channel_frame = format_sse_event(
+                dict(self.message, data=data), codec=self.codec)
+        return self._channel_frame
+
+    @property
+    def id(self):
+        """Identifier of the event, as sent to the client."""
+        return self.message.get('id')
+
+    @classmethod
+    def from_payload(cls, channel, data, codec=None):
+        """Decode the payload of a message sent by ``_SSEState.publish()``.
+
+        :param channel: Name of the channel.
+        :param data: The payload.
+        :param codec: Optional codec the payload was serialized with.
+        :returns: The :class:`Event` or ``None`` if the payload is invalid.
+        """
+        codec = codec or default_codec
+        try:
+            message = codec.loads(data)
+            if isinstance(message, dict) and 'data' in message:
+                reused = isinstance(data, bytes) and \
+                    len(data) >= REUSED_DATA_SIZE
+                return cls(channel, message, codec=codec,
+                           data=serialized_data(data) if reused else None)
+        except ValueError:
+            pass
+        logger.warning('Invalid SSE message on %s: %r', channel, data)
+
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'coalesce', 'disconnect')
+"""Ways of handling an event for a subscriber whose queue is full.
+
+- ``drop_oldest`` drops the oldest queued event.
+- ``drop_newest`` drops the new event.
+- ``coalesce`` drops the queued event of the same type, or the oldest one.
+- ``disconnect`` drops all the queued events and ends the stream with a
+  reconnection time hint.
+"""
+
+
+class Backoff(object):
+    """Exponential backoff with full jitter.
+
+    The n-th delay is drawn uniformly between 0 and ``base * 2 ** n``,
+    capped at ``cap`` seconds, so that the processes which lost Redis at the
+    same time do not reconnect all at once.
+    """
+
+    def __init__(self, base=0.1, cap=10.0, attempts=None):
+        """Initialize the backoff.
+
+        :param base: Maximum delay of the first attempt, in seconds.
+        :param cap: Maximum delay of any attempt, in seconds.
+        :param attempts: Number of attempts, unlimited if ``None``.
+        """
+        self.base = base
+        self.cap = cap
+        self.attempts = attempts
+
+    def delays(self):
+        """Iterate over the delays to wait before each attempt."""
+        attempts = itertools.count() if self.attempts is None \
+            else range(self.attempts)
+        for attempt in attempts:
+            yield random.uniform(
+                0, min(self.cap, self.base * 2 ** min(attempt, 32)))
+
+
+class Subscription(object):
+    """A single SSE client listening to a channel of the hub."""
+
+    def __init__(self, hub, channels, patterns=(), maxsize=0,
+                 overflow='drop_oldest', overflow_retry=None, types=None,
+                 predicate=None):
+        """Initialize the subscription.
+
+        :param hub: The :class:`SSEHub` dispatching messages to it.
+        :param channels: Name or list of names of the subscribed channels.
+        :param patterns: List of subscribed channel patterns, in the syntax
+                         of Redis ``PSUBSCRIBE``.
+        :param maxsize: Maximum number of pending messages, ``0`` means
+                        unbounded.
+        :param overflow: One of :data:`OVERFLOW_POLICIES`.
+        :param overflow_retry: Reconnection time in milliseconds sent to
+                               clients disconnected by the ``disconnect``
+                               policy.
+        :param types: Optional list of accepted event types; events without
+                      type have the type ``message``.
+        :param predicate: Optional callable accepting an event if it returns
+                          true for its data.
+        """
+        if isinstance(channels, str):
+            channels = (channels, )
+        self.hub = hub
+        self.channels = tuple(channels)
+        self.patterns = tuple(patterns)
+        self.keys = tuple(('channel', channel) for channel in self.channels) \
+            + tuple(('pattern', pattern) for pattern in self.patterns)
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.overflow_retry = overflow_retry
+        self.types = frozenset(types) if types else None
+        self.predicate = predicate
+        self.dropped = 0
+        self.closed = False
+        self.retry = None
+        self.ready = threading.Event()
+        self.pending = set(self.keys)
+        self.waiting = False
+        self.last_seen = time.time()
+        self._events = collections.deque()
+        self._condition = threading.Condition(threading.Lock())
+
+    def __len__(self):
+        """Get the number of pending messages."""
+        return len(self._events)
+
+    @property
+    def multiplexed(self):
+        """Whether events may come from several channels."""
+        return bool(self.patterns) or len(self.channels) > 1
+
+    def accepts(self, event):
+        """Check if the event passes the filters of the subscription.
+
+        :param event: An :class:`Event`.
+        """
+        if self.types is not None and event.type not in self.types:
+            return False
+        if self.predicate is None:
+            return True
+        try:
+            return bool(self.predicate(event.message['data']))
+        except Exception:
+            logger.exception('SSE predicate failed on %s.', event.channel)
+            return False
+
+    def confirm(self, key):
+        """Mark the Redis subscription of a channel or pattern as confirmed.
+
+        :param key: ``('channel', name)`` or ``('pattern', name)``.
+        """
+        self.pending.discard(key)
+        if not self.pending:
+            self.ready.set()
+
+    def put(self, event):
+        """Enqueue an event, applying the overflow policy if it is full.
+
+        :returns: The number of dropped events.
+        """
+        with self._condition:
+            dropped = self._push(event)
+            self._condition.notify()
+        return dropped
+
+    def get(self, timeout=None):
+        """Wait for the next message.
+
+        :returns: The next :class:`Event`, or ``None`` once the subscription
+                  is closed and all its events consumed.
+        :raises queue.Empty: If no message arrived within ``timeout``.
+        """
+        self.waiting = True
+        try:
+            with self._condition:
+                if timeout is not None:
+                    deadline = time.time() + timeout
+                while not self._events and not self.closed:
+                    if timeout is None:
+                        self._condition.wait()
+                        continue
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise queue.Empty()
+                    self._condition.wait(remaining)
+                return self._pop()
+        finally:
+            self.waiting = False
+            self.last_seen = time.time()
+
+    def is_idle(self, timeout, now=None):
+        """Check if the consumer did not come back for too long.
+
+        A consumer waiting for its next message is never idle. One that
+        did not ask for a message within ``timeout`` seconds is most likely
+        stuck writing to a dead connection, or was never iterated.
+        """
+        now = now or time.time()
+        return not self.waiting and now - self.last_seen > timeout
+
+    def close(self):
+        """Stop receiving messages."""
+        self.hub.unsubscribe(self)
+
+    def stop(self, retry=None, discard=False):
+        """End the stream once the pending events are consumed.
+
+        :param retry: Optional reconnection time hint for the client, in
+                      milliseconds.
+        :param discard: Drop the pending events instead, e.g. when the
+                        client lost access to them.
+        """
+        with self._condition:
+            if discard:
+                self._events.clear()
+            self._close(retry)
+            self._condition.notify_all()
+
+    def _close(self, retry=None):
+        """Mark the subscription as closed."""
+        self.closed = True
+        self.retry = retry
+
+    def _push(self, event):
+        """Add an event to the queue, applying the overflow policy."""
+        if self.closed:
+            return 0
+        if not self.maxsize or len(self._events) < self.maxsize:
+            self._events.append(event)
+            return 0
+
+        if self.overflow == 'drop_newest':
+            dropped = 1
+        elif self.overflow == 'disconnect':
+            dropped = len(self._events) + 1
+            self._events.clear()
+            self._close(self.overflow_retry)
+        else:
+            index = 0
+            if self.overflow == 'coalesce':
+                for index, queued in enumerate(self._events):
+                    if queued.type == event.type:
+                        break
+                else:
+                    index = 0
+            del self._events[index]
+            self._events.append(event)
+            dropped = 1
+        self.dropped += dropped
+        return dropped
+
+    def _pop(self):
+        """Get the oldest queued event, ``None`` if closed and empty."""
+        if self._events:
+            return self._events.popleft()
+
+
+class SSEHub(object):
+    """Share one pub/sub connection among all subscribers of a process.
+
+    The hub subscribes Redis to the union of the channels and patterns its
+    subscribers listen to and dispatches every received message to the
+    queue of each local subscriber of that channel or pattern, from a single
+    background thread.
+    Each message is decoded and formatted once, and the resulting
+    :class:`Event` is shared by all the subscribers.
+    """
+
+    poll_timeout = 1.0
+    """Seconds the reader thread waits for a message before looping."""
+
+    subscription_class = Subscription
+    """Class of the subscriptions."""
+
+    supports_patterns = True
+    """Whether the pub/sub connections can subscribe to channel patterns."""
+
+    connection_errors = CONNECTION_ERRORS
+    """Errors of the pub/sub connections after which the hub reconnects."""
+
+    def __init__(self, pubsub_factory, queue_size=0, idle_timeout=None,
+                 overflow='drop_oldest', overflow_retry=None, codec=None,
+                 instrumentation=None, backoff=None, drop_retry=None):
+        """Initialize the hub.
+
+        :param pubsub_factory: Callable returning a Redis pub/sub object.
+        :param queue_size: Maximum number of pending messages per subscriber.
+        :param idle_timeout: Seconds after which subscribers whose consumer
+                             stopped asking for messages are dropped.
+        :param overflow: Policy applied to subscribers whose queue is full,
+                         see :data:`OVERFLOW_POLICIES`.
+        :param overflow_retry: Reconnection time sent to subscribers
+                               disconnected because of overflow.
+        :param codec: Codec of the published payloads, see
+                      :mod:`invenio_sse.codecs`.
+        :param instrumentation: Optional
+            :class:`invenio_sse.instrumentation.Instrumentation`.
+        :param backoff: :class:`Backoff` between the attempts to reconnect to
+                        Redis, by default retrying forever.
+        :param drop_retry: Optional ``(min, max)`` range of the reconnection
+                           time, in milliseconds, randomly sent to each
+                           subscriber dropped because Redis is unreachable.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy {0}.'.format(overflow))
+        self.codec = codec or default_codec
+        self.instrumentation = instrumentation
+        self.backoff = backoff or Backoff()
+        self.drop_retry = drop_retry
+        self.pid = os.getpid()
+        self.queue_size = queue_size
+        self.idle_timeout = idle_timeout
+        self.overflow = overflow
+        self.overflow_retry = overflow_retry
+        self.dropped = 0
+        self._pubsub_factory = pubsub_factory
+        self._pubsub = None
+        self._subscriptions = {}
+        self._confirmed = set()
+        self._thread = None
+        self._lock = threading.RLock()
+
+    @property
+    def channels(self):
+        """Channels the hub is currently subscribed to."""
+        with self._lock:
+            return set(name for kind, name in self._subscriptions
+                       if kind == 'channel')
+
+    @property
+    def patterns(self):
+        """Channel patterns the hub is currently subscribed to."""
+        with self._lock:
+            return set(name for kind, name in self._subscriptions
+                       if kind == 'pattern')
+
+    @property
+    def queued(self):
+        """Number of events waiting in the queues of the subscribers."""
+        return sum(len(subscription)
+                   for subscription in self._all_subscriptions())
+
+    def subscribe(self, channels, patterns=(), types=None, predicate=None):
+        """Register a new subscriber to channels and channel patterns.
+
+        The ``ready`` event of the subscription is set once Redis confirmed
+        the subscription to all its channels and patterns.
+
+        :param channels: Name or list of names of the channels.
+        :param patterns: List of channel patterns.
+        :param types: Optional list of accepted event types.
+        :param predicate: Optional callable filtering events on their data.
+        :returns: A :class:`Subscription`.
+        """
+        subscription = self._subscription(
+            channels, patterns, types=types, predicate=predicate)
+        with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self._pubsub_factory()
+            for key in subscription.keys:
+                subscribers = self._subscriptions.setdefault(key, set())
+                if not subscribers:
+                    self._send('subscribe', key)
+                if key in self._confirmed:
+                    subscription.confirm(key)
+                subscribers.add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='invenio-sse-hub')
+                self._thread.daemon = True
+                self._thread.start()
+        if self.instrumentation is not None:
+            self.instrumentation.subscribed(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscriber, unsubscribing the channels it was the last of.
+
+        :param subscription: A :class:`Subscription` of this hub.
+        """
+        removed = False
+        with self._lock:
+            for key in subscription.keys:
+                subscribers = self._subscriptions.get(key)
+                if subscribers is None or subscription not in subscribers:
+                    continue
+                removed = True
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[key]
+                    self._confirmed.discard(key)
+                    if self._pubsub is None:
+                        # reconnecting, only the remaining keys are
+                        # subscribed again
+                        continue
+                    try:
+                        self._send('unsubscribe', key)
+                    except self.connection_errors:
+                        logger.debug('SSE hub could not unsubscribe %s, '
+                                     'its connection is broken.', key[1])
+        if removed and self.instrumentation is not None:
+            self.instrumentation.unsubscribed(subscription)
+
+    def dispatch(self, message):
+        """Deliver a Redis pub/sub message to the subscribers of its channel.
+
+        :param message: A message as returned by ``PubSub.get_message()``.
+        """
+        channel = decode_channel(message['channel'])
+        if message['type'] in ('subscribe', 'ssubscribe', 'psubscribe'):
+            key = (
+                'pattern' if message['type'] == 'psubscribe' else 'channel',
+                channel,
+            )
+            with self._lock:
+                if key in self._subscriptions:
+                    self._confirmed.add(key)
+                    for subscription in self._subscriptions[key]:
+                        subscription.confirm(key)
+            return
+        if message['type'] in ('message', 'smessage'):
+            key = ('channel', channel)
+        elif message['type'] == 'pmessage':
+            key = ('pattern', decode_channel(message['pattern']))
+        else:
+            return
+        with self._lock:
+            subscribers = list(self._subscriptions.get(key, ()))
+        if not subscribers:
+            return
+        event = Event.from_payload(channel, message['data'], codec=self.codec)
+        if event is None:
+            return
+        self.deliver(event, subscribers)
+
+    def deliver(self, event, subscribers):
+        """Enqueue an event for the subscribers accepting it.
+
+        The event is only formatted if a subscriber accepts it, once for
+        all of them.
+
+        :param event: An :class:`Event`.
+        :param subscribers: List of :class:`Subscription`.
+        """
+        instrumentation = self.instrumentation
+        subscribers = [s for s in subscribers if s.accepts(event)]
+        if instrumentation is not None:
+            start = time.time()
+        # Format in the dispatching thread rather than in each consumer.
+        if any(not s.multiplexed for s in subscribers):
+            event.frame
+        if any(s.multiplexed for s in subscribers):
+            event.channel_frame
+        if instrumentation is not None:
+            instrumentation.formatted(event, time.time() - start)
+        for subscription in subscribers:
+            dropped = subscription.put(event)
+            if dropped:
+                self.dropped += dropped
+                if instrumentation is not None:
+                    instrumentation.dropped(subscription, dropped)
+
+    def _subscription(self, channels, patterns, **kwargs):
+        """Create a subscription with the settings of the hub."""
+        if patterns and not self.supports_patterns:
+            raise ValueError('Channel patterns are not supported by '
+                             '{0}.'.format(type(self).__name__))
+        return self.subscription_class(
+            self, channels, patterns=patterns, maxsize=self.queue_size,
+            overflow=self.overflow, overflow_retry=self.overflow_retry,
+            **kwargs)
+
+    def _send(self, command, key):
+        """Subscribe or unsubscribe the pub/sub connection.
+
+        :param command: ``subscribe`` or ``unsubscribe``.
+        :param key: ``('channel', name)`` or ``('pattern', name)``.
+        :returns: The result of the pub/sub command.
+        """
+        kind, name = key
+        if kind == 'pattern':
+            command = 'p' + command
+        return getattr(self._pubsub, command)(name)
+
+    def _all_subscriptions(self):
+        """Get all the subscribers of the hub."""
+        with self._lock:
+            return set(
+                subscription
+                for subscribers in self._subscriptions.values()
+                for subscription in subscribers
+            )
+
+    def reap(self):
+        """Drop the subscribers whose consumer is idle.
+
+        Their Redis subscription is released with the last subscriber of the
+        channel, and their consumer gets the end of stream marker if it ever
+        comes back.
+
+        :returns: The number of dropped subscribers.
+        """
+        now = time.time()
+        idle = [
+            subscription for subscription in self._all_subscriptions()
+            if subscription.is_idle(self.idle_timeout, now=now)
+        ]
+        for subscription in idle:
+            self.unsubscribe(subscription)
+            subscription.stop()
+        if idle:
+            logger.info('Dropped %d idle SSE subscribers.', len(idle))
+        return len(idle)
+
+    def _run(self):
+        """Read messages from Redis until no subscriber is left."""
+        reaped = time.time()
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscriptions:
+                        self._thread = None
+                        return
+                    pubsub = self._pubsub
+                try:
+                    message = self._get_message(pubsub)
+                except self.connection_errors:
+                    # e.g. a restart or a Sentinel failover
+                    logger.warning('SSE hub lost its Redis connection, '
+                                   'reconnecting.', exc_info=True)
+                    self._discard(pubsub)
+                    if not self._reconnect():
+                        logger.error('SSE hub could not reconnect to Redis.')
+                        self._stop()
+                        return
+                    continue
+                if message:
+                    self.dispatch(message)
+                if self.idle_timeout and \
+                        time.time() - reaped >= self.poll_timeout:
+                    reaped = time.time()
+                    self.reap()
+        except Exception:
+            logger.exception('SSE hub lost its Redis connection.')
+            self._stop()
+
+    def _get_message(self, pubsub):
+        """Wait for the next message of the pub/sub connection."""
+        return pubsub.get_message(timeout=self.poll_timeout)
+
+    def _reconnect(self):
+        """Open a new pub/sub connection, waiting between the attempts.
+
+        Subscribers stay connected meanwhile, they only miss the events
+        published until the hub subscribed again; streams with history
+        enabled recover them when their client reconnects.
+
+        :returns: Whether the hub subscribed again.
+        """
+        for attempt, delay in enumerate(self.backoff.delays(), 1):
+            time.sleep(delay)
+            try:
+                self._resubscribe()
+                return True
+            except self.connection_errors:
+                logger.warning('SSE hub failed to reconnect to Redis '
+                               '(attempt %d).', attempt)
+                self._discard(self._pubsub)
+        return False
+
+    def _resubscribe(self):
+        """Subscribe a new pub/sub connection to all the channels."""
+        with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self._pubsub_factory()
+            self._confirmed = set()
+            for key in self._subscriptions:
+                self._send('subscribe', key)
+
+    def _discard(self, pubsub):
+        """Close a broken pub/sub connection so that a new one is used."""
+        with self._lock:
+            if self._pubsub is pubsub:
+                self._pubsub = None
+        if pubsub is not None:
+            self._close(pubsub)
+
+    def _stop(self):
+        """Drop every subscriber and the pub/sub connection."""
+        with self._lock:
+            subscriptions = self._all_subscriptions()
+            pubsub = self._pubsub
+            self._subscriptions = {}
+            self._confirmed = set()
+            self._pubsub = None
+            self._thread = None
+        for subscription in subscriptions:
+            subscription.stop(self._drop_retry())
+            if self.instrumentation is not None:
+                self.instrumentation.unsubscribed(subscription)
+        if pubsub is not None:
+            self._close(pubsub)
+
+    def _drop_retry(self):
+        """Draw the reconnection time of a dropped subscriber."""
+        if self.drop_retry:
+            return random.randint(*self.drop_retry)
+
+    def _close(self, pubsub):
+        """Close a pub/sub connection, ignoring errors."""
+        try:
+            pubsub.close()
+        except Exception:
+            pass
+
+
+class ShardedSSEHub(SSEHub):
+    """Hub using the sharded pub/sub of Redis Cluster.
+
+    Channels are subscribed with ``SSUBSCRIBE`` on the node owning their
+    slot, so that the traffic of each channel stays on one shard. Redis has
+    no sharded pattern subscriptions, thus channel patterns are refused.
+    """
+
+    supports_patterns = False
+
+    def _send(self, command, key):
+        """Subscribe or unsubscribe a shard channel."""
+        return getattr(self._pubsub, 's' + command)(key[1])
+
+    def _get_message(self, pubsub):
+        """Wait for the next message of any of the shards."""
+        return pubsub.get_sharded_message(timeout=self.poll_timeout)
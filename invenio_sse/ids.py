@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Generators of event IDs.
+
+The ID of an event published without an explicit one is produced by the
+generator configured in ``SSE_EVENT_ID_GENERATOR``:
+
+- :class:`TimestampIDGenerator` uses the current time, as a float.
+- :class:`SnowflakeIDGenerator` builds time ordered 64 bits integers locally,
+  without any round-trip to Redis once the process has a worker ID.
+- :class:`RedisCounterIDGenerator` lets Redis assign a per-channel
+  monotonic counter while publishing. These IDs are also the keys of the
+  channel history, so clients resume without scanning it.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import threading
+import time
+
+from .connections import create_client
+
+
+class TimestampIDGenerator(object):
+    """Use the current time as event ID."""
+
+    assigned_by_redis = False
+    """Whether the ID is assigned by Redis while publishing."""
+
+    def __init__(self, app):
+        """Initialize the generator.
+
+        :param app: The Flask application.
+        """
+        self.app = app
+
+    def __call__(self, channel):
+        """Get the ID of a new event.
+
+        :param channel: Name of the channel the event is published to.
+        """
+        return time.time()
+
+
+class SnowflakeIDGenerator(TimestampIDGenerator):
+    """Generate time ordered 64 bits integer IDs locally.
+
+    An ID is made of 41 bits of milliseconds since ``epoch``, 10 bits of
+    worker ID and 12 bits of sequence number. IDs are unique as long as no
+    two running processes share a worker ID. The worker ID is taken from
+    ``SSE_EVENT_ID_WORKER``, or else incremented once per process in the
+    ``SSE_EVENT_ID_WORKER_KEY`` Redis counter, modulo 1024: processes get
+    distinct IDs unless more than 1024 are started while one runs.
+    """
+
+    epoch = 1451606400000
+    """Start of the timestamps, in milliseconds (2016-01-01)."""
+
+    def __init__(self, app):
+        """Initialize the generator.
+
+        :param app: The Flask application.
+        """
+        super(SnowflakeIDGenerator, self).__init__(app)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._worker = None
+        self._last = -1
+        self._sequence = 0
+
+    @property
+    def worker(self):
+        """Worker ID of the current process."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._worker = self.app.config['SSE_EVENT_ID_WORKER']
+            if self._worker is None:
+                self._worker = create_client(self.app).incr(
+                    self.app.config['SSE_EVENT_ID_WORKER_KEY']) - 1
+            self._worker &= 0x3ff
+        return self._worker
+
+    def __call__(self, channel):
+        """Get the ID of a new event.
+
+        :param channel: Name of the channel the event is published to.
+        """
+        with self._lock:
+            now = max(int(time.time() * 1000) - self.epoch, self._last)
+            if now == self._last:
+                self._sequence = (self._sequence + 1) & 0xfff
+                if self._sequence == 0:
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last = now
+            return (now << 22) | (self.worker << 12) | self._sequence
+
+
+class RedisCounterIDGenerator(TimestampIDGenerator):
+    """Number the events of each channel with a Redis counter.
+
+    The counter is incremented by the script publishing the event, so IDs
+    are consecutive and follow the order in which Redis received the
+    events, whatever process published them.
+    """
+
+    assigned_by_redis = True
+
+    def __call__(self, channel):
+        """Let Redis assign the ID of the event."""
+        return None
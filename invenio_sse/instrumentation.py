@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Instrumentation hooks of the SSE subsystem.
+
+Set ``SSE_INSTRUMENTATION`` to the import path of a subclass of
+:class:`Instrumentation` to be notified of the publications, subscriptions
+and streamed bytes, e.g. to export metrics.
+:class:`invenio_sse.contrib.prometheus.PrometheusInstrumentation` exports
+them to Prometheus.
+
+Without instrumentation, which is the default, the hooks are not called and
+nothing is measured.
+"""
+
+from __future__ import absolute_import, print_function
+
+
+class Instrumentation(object):
+    """Base class of the instrumentations, ignoring all the notifications.
+
+    Hooks are called from the publishing code, the hub thread and the
+    streaming responses, so they must be thread-safe and fast.
+    """
+
+    def __init__(self, app):
+        """Initialize the instrumentation.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        self.app = app
+
+    def published(self, channel, subscribers):
+        """Notify that an event was published.
+
+        :param channel: Name of the channel.
+        :param subscribers: Number of Redis subscribers that received it.
+        """
+
+    def subscribed(self, subscription):
+        """Notify that a subscriber was registered in a hub.
+
+        :param subscription: The :class:`invenio_sse.hub.Subscription`.
+        """
+
+    def unsubscribed(self, subscription):
+        """Notify that a subscriber was removed from a hub.
+
+        :param subscription: The :class:`invenio_sse.hub.Subscription`.
+        """
+
+    def formatted(self, event, seconds):
+        """Notify that an event was formatted for its subscribers.
+
+        :param event: The :class:`invenio_sse.hub.Event`.
+        :param seconds: Time spent formatting it.
+        """
+
+    def dropped(self, subscription, count):
+        """Notify that events were dropped because a queue was full.
+
+        :param subscription: The :class:`invenio_sse.hub.Subscription`.
+        :param count: Number of dropped events.
+        """
+
+    def written(self, size):
+        """Notify that a frame was sent to a client.
+
+        :param size: Size of the frame in bytes.
+        """
+
+
+def measure_written(instrumentation, frames):
+    """Notify the instrumentation of the size of each streamed frame.
+
+    :param instrumentation: An :class:`Instrumentation`.
+    :param frames: Iterator of frames.
+    """
+    try:
+        for frame in frames:
+            instrumentation.written(len(frame))
+            yield frame
+    finally:
+        frames.close()
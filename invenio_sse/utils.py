@@ -26,10 +26,36 @@
 
 from __future__ import absolute_import, print_function
 
-import json
+from werkzeug.utils import import_string
 
+from .codecs import default_codec
 
-def format_sse_event(event):
+HEARTBEAT = b':\n\n'
+"""SSE comment sent to keep idle connections alive."""
+
+
+def obj_or_import_string(value, default=None):
+    """Import string or return object.
+
+    :param value: Import path or object.
+    :param default: Default value if ``value`` is empty.
+    :returns: The imported object.
+    """
+    if isinstance(value, str):
+        return import_string(value)
+    elif value:
+        return value
+    return default
+
+
+def _field(value):
+    """Encode the value of an SSE field."""
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode('utf-8')
+
+
+def format_sse_event(event, codec=None, data=None):
     r"""Encode a new event following SSE standard.
 
     .. code-block:: text
@@ -41,23 +67,46 @@ def format_sse_event(event):
         data: }\n
         retry: 10000\n\n
 
+    Each line of the serialized data, separated by ``\r\n``, ``\r`` or
+    ``\n`` as in the SSE specification, is sent in its own ``data`` field.
+
     :param event: A dictionary containing the keys ``data``, ``id``, ``retry``
                   and ``event``. Only ``data`` field is mandatory, all the
                   other fields are optional.
-    :returns: A formatted SSE message.
+    :param codec: Optional codec serializing the data, see
+                  :mod:`invenio_sse.codecs`.
+    :param data: Optional data of the event already serialized by the codec,
+                 e.g. taken from the published payload, which is then not
+                 serialized again.
+    :returns: The UTF-8 encoded SSE message.
     """
     assert 'data' in event
 
-    lines = [
-        'data: {0}'.format(line)
-        for line in json.dumps(event['data']).splitlines()
-    ]
+    if data is None:
+        data = (codec or default_codec).dumps(event['data'])
+    if b'\n' in data or b'\r' in data:
+        # bytes.splitlines() only breaks on \r\n, \r and \n
+        data = b'\ndata: '.join(data.splitlines())
 
-    if event.get('event'):
-        lines.insert(0, 'event:{event}'.format(**event))
-    if event.get('id'):
-        lines.append('id:{id}'.format(**event))
-    if event.get('retry'):
-        lines.append('retry:{retry}'.format(**event))
+    parts = []
+    value = event.get('event')
+    if value:
+        parts += (b'event:', _field(value), b'\n')
+    parts += (b'data: ', data, b'\n')
+    value = event.get('id')
+    if value:
+        parts += (b'id:', _field(value), b'\n')
+    value = event.get('retry')
+    if value:
+        parts += (b'retry:', _field(value), b'\n')
+    parts.append(b'\n')
+    return b''.join(parts)
 
-    return '\n'.join(lines) + '\n\n'
+
+def format_sse_retry(retry):
+    """Encode an event only setting the reconnection time of the client.
+
+    :param retry: Reconnection time in milliseconds.
+    :returns: The UTF-8 encoded SSE message.
+    """
+    return b'retry:' + _field(retry) + b'\n\n'
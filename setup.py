@@ -39,6 +39,7 @@ tests_require = [
     'psycopg2>=2.6.1',
     'pytest-cache>=1.0',
     'pytest-invenio>=1.4.0',
+    'redis>=5.0.0',
     'invenio-assets>=1.2.5',
     'elasticsearch>=7.0.0',
     'invenio_search>=1.4.1',
@@ -46,12 +47,25 @@ tests_require = [
 ]
 
 extras_require = {
+    'asyncio': [
+        'redis>=5.0.0',
+    ],
     'deposit': [
         'invenio-deposit>=1.0.0a11',
+        'jsonpatch>=1.15',
     ],
     'docs': [
         'Sphinx>=3',
     ],
+    'orjson': [
+        'orjson>=3.0.0',
+    ],
+    'postgresql': [
+        'psycopg2-binary>=2.7.4',
+    ],
+    'prometheus': [
+        'prometheus-client>=0.7.0',
+    ],
     'tests': tests_require,
 }
 
@@ -65,7 +79,7 @@ setup_requires = [
 
 install_requires = [
     'Flask>=1.0.4',
-    'redis>=2.10.5',
+    'redis>=5.0.0',
 ]
 
 packages = find_packages()
@@ -30,6 +30,7 @@ from __future__ import absolute_import, print_function
 import os
 import shutil
 import tempfile
+import uuid
 from time import sleep
 
 import pytest
@@ -68,6 +69,7 @@ from mock import patch
 from sqlalchemy_utils import create_database, database_exists
 
 from invenio_sse import InvenioSSE
+from invenio_sse.brokers.memory import MemoryBus
 from invenio_sse.contrib.deposit import InvenioSSEDeposit
 
 
@@ -87,6 +89,39 @@ def app():
     shutil.rmtree(instance_path)
 
 
+@pytest.yield_fixture()
+def memory_app():
+    """Flask application fixture using the in-memory broker.
+
+    Needs no Redis server, and each application has its own bus.
+    """
+    instance_path = tempfile.mkdtemp()
+    app = Flask('testapp', instance_path=instance_path)
+    app.config.update(
+        TESTING=True,
+        SSE_BROKER='invenio_sse.brokers.memory:MemoryBroker',
+        SSE_HISTORY_MAXLEN=10,
+    )
+    InvenioSSE(app)
+    app.extensions['invenio-sse'].broker.bus = MemoryBus()
+
+    with app.app_context():
+        yield app
+
+    shutil.rmtree(instance_path)
+
+
+@pytest.yield_fixture()
+def counter_channel(app):
+    """Get a new channel, deleting its Redis counter and history after."""
+    channel = 'counter-{0}'.format(uuid.uuid4().hex)
+    yield channel
+    app.extensions['invenio-sse'].broker._redis.delete(
+        app.config['SSE_EVENT_ID_COUNTER_KEY'].format(channel=channel),
+        app.config['SSE_HISTORY_KEY'].format(channel=channel),
+    )
+
+
 @pytest.yield_fixture()
 def app_deposit():
     """App configuration for using InvenioDeposit."""
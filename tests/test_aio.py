@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Asyncio streaming tests."""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+import zlib
+
+from flask import current_app
+
+from invenio_sse import current_sse
+from invenio_sse.aio import AsyncSubscription, create_asgi_app, get_hub
+from invenio_sse.hub import Event
+
+
+def test_messages_async(app):
+    """Test the asynchronous message generator."""
+    async def receive():
+        messages = current_sse.messages_async(channel='aiochannel')
+        first = asyncio.ensure_future(messages.__anext__())
+        await asyncio.sleep(1)
+        current_sse.publish(data='hello', channel='aiochannel',
+                            type_='mytype', id_=123)
+        frame = await asyncio.wait_for(first, 5)
+        hub = get_hub(current_sse._get_current_object())
+        assert hub.channels == {'aiochannel'}
+        await messages.aclose()
+        assert hub.channels == set()
+        return frame
+
+    frame = asyncio.get_event_loop().run_until_complete(receive())
+    assert frame == b'event:mytype\ndata: "hello"\nid:123\n\n'
+
+
+def test_async_stop():
+    """Test ending an asyncio stream without its pending events."""
+    async def stop():
+        subscription = AsyncSubscription(None, 'channel')
+        subscription.put(Event('channel', {'data': 'pending'}))
+        subscription.stop(discard=True)
+        return await subscription.get()
+
+    assert asyncio.get_event_loop().run_until_complete(stop()) is None
+
+
+def test_asgi_app(app):
+    """Test the ASGI application."""
+    sent = []
+    disconnected = asyncio.Event()
+
+    async def send(message):
+        sent.append(message)
+        if message['type'] == 'http.response.body':
+            disconnected.set()
+
+    async def receive():
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def request():
+        scope = {'type': 'http', 'query_string': b'channel=asgichannel'}
+        task = asyncio.ensure_future(create_asgi_app(app, authorize)(
+            scope, receive, send))
+        await asyncio.sleep(1)
+        current_sse.publish(data='hello', channel='asgichannel', id_=123)
+        await asyncio.wait_for(task, 5)
+
+    asyncio.get_event_loop().run_until_complete(request())
+    start, body = sent
+    assert start['status'] == 200
+    assert (b'content-type', b'text/event-stream') in start['headers']
+    assert body['body'] == b'data: "hello"\nid:123\n\n'
+    assert body['more_body']
+
+
+def test_asgi_replay(memory_app):
+    """Test replaying the missed events to the ASGI requests."""
+    for i in range(1, 4):
+        current_sse.publish(data=i, channel='asgireplay', id_=i)
+    sent = []
+    received = asyncio.Event()
+
+    async def send(message):
+        sent.append(message)
+        if len(sent) == 4:
+            received.set()
+
+    async def receive():
+        await received.wait()
+        return {'type': 'http.disconnect'}
+
+    async def request():
+        scope = {'type': 'http', 'query_string': b'channel=asgireplay',
+                 'headers': [(b'last-event-id', b'1')]}
+        task = asyncio.ensure_future(create_asgi_app(memory_app, authorize)(
+            scope, receive, send))
+        await asyncio.sleep(1)
+        current_sse.publish(data=4, channel='asgireplay', id_=4)
+        await asyncio.wait_for(task, 5)
+
+    asyncio.get_event_loop().run_until_complete(request())
+    assert [message['body'] for message in sent[1:4]] == [
+        b'data: 2\nid:2\n\n', b'data: 3\nid:3\n\n', b'data: 4\nid:4\n\n']
+
+    # other protocols than HTTP are ignored
+    assert asyncio.get_event_loop().run_until_complete(create_asgi_app(
+        memory_app, authorize)({'type': 'lifespan'}, None, None)) is None
+
+
+def authorize(scope, channels, patterns):
+    """Authorize the ASGI requests of the test channels."""
+    return all(name.startswith('asgi') for name in channels + patterns)
+
+
+def test_asgi_refused(app):
+    """Test refusing the unauthorized ASGI requests."""
+    async def request(query_string, **kwargs):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def authorize_async(scope, channels, patterns):
+            return authorize(scope, channels, patterns)
+
+        scope = {'type': 'http', 'query_string': query_string}
+        await create_asgi_app(app, authorize_async, **kwargs)(
+            scope, None, send)
+        return sent[0]['status']
+
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(request(b'channel=private')) == 403
+    assert loop.run_until_complete(request(b'pattern=asgi*')) == 400
+    assert loop.run_until_complete(request(
+        b'channel=asgi&pattern=private*', allow_patterns=True)) == 403
+
+
+def test_asgi_compression(app):
+    """Test compressing the streams of the ASGI application."""
+    current_app.config['SSE_COMPRESSION'] = True
+    sent = []
+    received = asyncio.Event()
+
+    async def send(message):
+        sent.append(message)
+        if len(sent) == 3:
+            received.set()
+
+    async def receive():
+        await received.wait()
+        return {'type': 'http.disconnect'}
+
+    async def request():
+        scope = {'type': 'http', 'query_string': b'channel=asgigzip',
+                 'headers': [(b'accept-encoding', b'gzip, deflate')]}
+        task = asyncio.ensure_future(create_asgi_app(app, authorize)(
+            scope, receive, send))
+        await asyncio.sleep(1)
+        current_sse.publish(data='hello', channel='asgigzip', id_=123)
+        await asyncio.wait_for(task, 5)
+
+    asyncio.get_event_loop().run_until_complete(request())
+    start, preamble, body = sent[:3]
+    assert (b'content-encoding', b'gzip') in start['headers']
+    assert (b'vary', b'Accept-Encoding') in start['headers']
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(preamble['body']) == b''
+    assert decompressor.decompress(body['body']) == \
+        b'data: "hello"\nid:123\n\n'
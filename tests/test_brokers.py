@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Broker tests."""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+import threading
+import time
+
+import mock
+import pytest
+from flask import Flask
+
+from invenio_sse import InvenioSSE
+from invenio_sse.aio import get_hub
+from invenio_sse.brokers import Broker, MemoryBroker, PostgreSQLBroker
+from invenio_sse.brokers.memory import MemoryBus
+from invenio_sse.brokers.postgresql import PostgreSQLPubSub, \
+    PostgreSQLSSEHub, database_url
+
+
+def test_memory_pubsub(memory_app):
+    """Test publishing to the in-memory pub/sub objects."""
+    state = memory_app.extensions['invenio-sse']
+    pubsub = state._pubsub()
+    pubsub.subscribe('mem')
+    pubsub.psubscribe('mem*')
+    assert pubsub.get_message()['type'] == 'subscribe'
+    assert pubsub.get_message()['type'] == 'psubscribe'
+    assert pubsub.get_message() is None
+
+    assert state.publish('hello', channel='mem', id_=1) == 2
+    assert state.publish('hello', channel='memo', id_=2) == 1
+    assert state.publish('hello', channel='other', id_=3) == 0
+    message = pubsub.get_message()
+    assert (message['type'], message['channel']) == ('message', b'mem')
+    message = pubsub.get_message()
+    assert (message['type'], message['pattern']) == ('pmessage', b'mem*')
+    assert pubsub.get_message()['channel'] == b'memo'
+
+    threading.Timer(0.1, state.publish, ['late'],
+                    {'channel': 'mem', 'id_': 4}).start()
+    assert pubsub.get_message(timeout=5)['channel'] == b'mem'
+    pubsub.close()
+    assert state.publish('hello', channel='mem', id_=5) == 0
+
+
+def test_memory_stream(memory_app):
+    """Test streaming and replaying the events of the in-memory broker."""
+    memory_app.config['SSE_EVENT_ID_GENERATOR'] = \
+        'invenio_sse.ids:RedisCounterIDGenerator'
+    InvenioSSE(memory_app)
+    state = memory_app.extensions['invenio-sse']
+    state.broker.bus = MemoryBus()
+    for data in ('first', 'second', 'third'):
+        state.publish(data, channel='memstream')
+    assert [event.id for event in state.history('memstream', 1)] == [2, 3]
+    assert state.history('memstream', 42) == []
+
+    with memory_app.app_context():
+        messages = state.messages('memstream', last_event_id=2)
+        assert next(messages) == b'data: "third"\nid:3\n\n'
+        state.publish('fourth', channel='memstream')
+        assert next(messages) == b'data: "fourth"\nid:4\n\n'
+        messages.close()
+    assert state.hub.channels == set()
+
+
+def test_memory_expire(memory_app):
+    """Test forgetting the idle channels of the in-memory broker."""
+    memory_app.config['SSE_HISTORY_TTL'] = 60
+    state = memory_app.extensions['invenio-sse']
+    bus = state.broker.bus
+    for id_, channel in enumerate(('idle', 'busy', 'idle'), 1):
+        state.publish('hello', channel=channel, id_=id_)
+    assert list(bus.expires) == ['busy', 'idle']
+    assert len(state.history('idle', 1)) == 1
+
+    with mock.patch('time.time', return_value=time.time() + 61):
+        state.publish('hello', channel='busy', id_=4)
+        assert state.history('idle', 1) == []
+    assert set(bus.histories) == {'busy'}
+    assert list(bus.expires) == ['busy']
+
+
+def test_memory_async(memory_app):
+    """Test the asyncio pub/sub of the in-memory broker."""
+    state = memory_app.extensions['invenio-sse']
+
+    async def receive():
+        hub = get_hub(state)
+        messages = hub.messages(channel='memasync')
+        first = asyncio.ensure_future(messages.__anext__())
+        await asyncio.sleep(0.1)
+        threading.Thread(target=state.publish, args=['hello'],
+                         kwargs={'channel': 'memasync', 'id_': 1}).start()
+        frame = await asyncio.wait_for(first, 5)
+        await messages.aclose()
+        return frame
+
+    frame = asyncio.get_event_loop().run_until_complete(receive())
+    assert frame == b'data: "hello"\nid:1\n\n'
+
+
+def test_broker_ids():
+    """Test refusing the Redis counter with brokers not numbering events."""
+    app = Flask('testapp')
+    app.config.update(
+        SSE_BROKER='invenio_sse.brokers.base:Broker',
+        SSE_EVENT_ID_GENERATOR='invenio_sse.ids:RedisCounterIDGenerator',
+    )
+    with pytest.raises(RuntimeError):
+        InvenioSSE(app)
+
+
+def test_postgresql(monkeypatch):
+    """Test the PostgreSQL broker."""
+    psycopg2 = pytest.importorskip('psycopg2')
+    app = Flask('testapp')
+    app.config.update(
+        SSE_BROKER='invenio_sse.brokers.postgresql:PostgreSQLBroker',
+        SQLALCHEMY_DATABASE_URI='postgresql+psycopg2://db:5432/invenio',
+    )
+    InvenioSSE(app)
+    assert database_url(app) == 'postgresql://db:5432/invenio'
+    state = app.extensions['invenio-sse']
+    assert isinstance(state.broker, PostgreSQLBroker)
+    assert isinstance(state.hub, PostgreSQLSSEHub)
+    with pytest.raises(ValueError):
+        state.hub.subscribe([], patterns=['pg*'])
+
+    pool = mock.MagicMock()
+    cursor = pool.getconn.return_value.cursor.return_value.__enter__
+    monkeypatch.setattr(PostgreSQLBroker, 'pool', pool)
+    assert state.publish('hello', channel='pg', id_=1) is None
+    cursor.return_value.execute.assert_called_once_with(
+        'SELECT pg_notify(%s, %s)',
+        ('pg', state.codec.dumps(
+            {'id': 1, 'event': None, 'retry': None, 'data': 'hello'}
+        ).decode('utf-8')))
+    pool.putconn.assert_called_once_with(pool.getconn.return_value)
+
+    # failed connections are closed and returned to the pool
+    pool.reset_mock()
+    cursor.return_value.execute.side_effect = psycopg2.DataError()
+    with pytest.raises(psycopg2.DataError):
+        state.publish('hello', channel='pg')
+    pool.putconn.assert_called_once_with(
+        pool.getconn.return_value, close=True)
+
+    # publishers wait for a free connection instead of failing
+    pool.reset_mock()
+    cursor.return_value.execute.side_effect = None
+    state.broker.pool_timeout = 0.5
+    for _ in range(state.broker.max_connections):
+        state.broker._slots.acquire()
+    threading.Timer(0.1, state.broker._slots.release).start()
+    assert state.publish('hello', channel='pg') is None
+    assert pool.getconn.called
+    state.broker._slots.acquire()
+    pool.reset_mock()
+    state.broker.pool_timeout = 0.1
+    with pytest.raises(psycopg2.pool.PoolError):
+        state.publish('hello', channel='pg')
+    assert not pool.getconn.called
+    state.broker.pool_timeout = None
+    with pytest.raises(psycopg2.pool.PoolError):
+        state.publish('hello', channel='pg')
+    for _ in range(state.broker.max_connections):
+        state.broker._slots.release()
+
+    # payloads over the limit of PostgreSQL are refused before connecting
+    pool.reset_mock()
+    with pytest.raises(ValueError):
+        state.publish('x' * 8000, channel='pg')
+    assert not pool.getconn.called
+
+
+def test_postgresql_pubsub(monkeypatch):
+    """Test listening to PostgreSQL notifications."""
+    psycopg2 = pytest.importorskip('psycopg2')
+    from psycopg2 import sql
+    from psycopg2.extensions import Notify
+    connect = mock.MagicMock()
+    connection = connect.return_value
+    connection.notifies = []
+    cursor = connection.cursor.return_value.__enter__.return_value
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    select = mock.Mock(return_value=([], [], []))
+    monkeypatch.setattr('select.select', select)
+
+    pubsub = PostgreSQLPubSub('postgresql://db:5432/invenio')
+    pubsub.subscribe('pg', b'other')
+    connect.assert_called_once_with('postgresql://db:5432/invenio')
+    assert connection.autocommit is True
+    assert cursor.execute.call_args_list == [
+        mock.call(sql.SQL('LISTEN {0}').format(sql.Identifier('pg'))),
+        mock.call(sql.SQL('LISTEN {0}').format(sql.Identifier('other'))),
+    ]
+    assert pubsub.channels == {'pg', 'other'}
+    assert pubsub.get_message() == {
+        'type': 'subscribe', 'pattern': None, 'channel': b'pg', 'data': 1}
+    assert pubsub.get_message()['data'] == 2
+
+    # waits for the notifications until the timeout
+    assert pubsub.get_message() is None
+    assert not select.called
+    assert pubsub.get_message(timeout=0.5) is None
+    select.assert_called_once_with([connection], [], [], 0.5)
+
+    def notify():
+        connection.notifies.extend([
+            Notify(1, 'pg', '{"data": "é"}'), Notify(1, 'other', '')])
+    select.return_value = ([connection], [], [])
+    select.side_effect = lambda *args: notify() or select.return_value
+    assert pubsub.get_message(timeout=1) == {
+        'type': 'message', 'pattern': None, 'channel': b'pg',
+        'data': '{"data": "é"}'.encode('utf-8')}
+    assert pubsub.get_message() == {
+        'type': 'message', 'pattern': None, 'channel': b'other',
+        'data': b''}
+    assert connection.notifies == []
+
+    cursor.reset_mock()
+    pubsub.unsubscribe(b'pg')
+    cursor.execute.assert_called_once_with(
+        sql.SQL('UNLISTEN {0}').format(sql.Identifier('pg')))
+    assert pubsub.get_message() == {
+        'type': 'unsubscribe', 'pattern': None, 'channel': b'pg',
+        'data': 1}
+
+    pubsub.close()
+    connection.close.assert_called_once_with()
+    assert pubsub.channels == set()
+    pubsub.close()
+    assert connection.close.call_count == 1
+
+
+def test_memory_broker_init():
+    """Test the default bus of the in-memory broker."""
+    app = Flask('testapp')
+    app.config.update(SSE_BROKER=MemoryBroker)
+    InvenioSSE(app)
+    broker = app.extensions['invenio-sse'].broker
+    assert broker.bus is MemoryBroker(app).bus
+    with pytest.raises(RuntimeError):
+        Broker(app).async_client()
@@ -68,9 +68,48 @@ def test_publish(app, script_info):
         message = next(current_sse.messages(channel=channel))
         # check you are receiving the message sent
         assert message.startswith(
-            'event:edit\ndata: ["{\\"hello\\": \\"World\\"}"]\nid:')
-        assert message.endswith('\n\n')
+            b'event:edit\ndata: ["{\\"hello\\": \\"World\\"}"]\nid:')
+        assert message.endswith(b'\n\n')
 
         # and subscribe to the right channel
         (((subscribed, ), _), ) = pubsub.subscribe.call_args_list
         assert subscribed == channel
+
+
+def test_publish_lines(app, script_info):
+    """Test publishing one event per input line."""
+    channel = 'testchannel'
+    runner = CliRunner()
+    pubsub = current_sse._pubsub()
+    pubsub.subscribe(channel)
+    sleep(1)
+    assert pubsub.get_message()['type'] == 'subscribe'
+
+    res = runner.invoke(cli.sse, [
+        'publish', '-', '--channel', channel, '--type', 'edit', '--lines'
+    ], input='{"hello": "World"}\n\n[1, 2]\n', obj=script_info)
+    assert res.exit_code == 0
+
+    sleep(1)
+    messages = [pubsub.get_message(), pubsub.get_message()]
+    assert [json.loads(m['data'].decode('utf-8'))['data']
+            for m in messages] == [{'hello': 'World'}, [1, 2]]
+    assert pubsub.get_message() is None
+
+
+def test_publish_lines_errors(app, script_info):
+    """Test refusing invalid line events."""
+    runner = CliRunner()
+    with mock.patch.object(current_sse, 'publish_many') as publish_many:
+        res = runner.invoke(cli.sse, [
+            'publish', '-', '--lines', '--id', '1'
+        ], input='{"hello": "World"}\n', obj=script_info)
+        assert res.exit_code == 2
+        assert '--id' in res.output
+
+        res = runner.invoke(cli.sse, [
+            'publish', '-', '--lines'
+        ], input='{"hello": "World"}\n\n{"broken"\n', obj=script_info)
+        assert res.exit_code == 2
+        assert 'line 3 is not valid JSON' in res.output
+    assert not publish_many.called
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Event coalescing tests."""
+
+from __future__ import absolute_import, print_function
+
+import json
+import threading
+import time
+
+import mock
+from flask import current_app
+
+from invenio_sse import current_sse
+from invenio_sse.coalesce import Coalescer, Throttle
+from invenio_sse.hub import Event
+
+
+def test_coalescer():
+    """Test collapsing the events published with the same key."""
+    published = []
+    coalescer = Coalescer(lambda *args: published.append(args) or 1, 0.1)
+    assert coalescer('progress', 'channel', 1) == 1
+    assert coalescer('progress', 'channel', 2) is None
+    assert coalescer('progress', 'channel', 3) is None
+    assert coalescer('other', 'channel', 'a') == 1
+    assert len(coalescer) == 1
+    assert published == [('channel', 1), ('channel', 'a')]
+    time.sleep(0.5)
+    assert published[-1] == ('channel', 3)
+    assert len(coalescer) == 0
+
+    # quiet keys are published immediately again
+    assert coalescer('progress', 'channel', 4) == 1
+    assert coalescer('progress', 'channel', 5) is None
+    coalescer.flush()
+    assert published[-1] == ('channel', 5)
+    time.sleep(0.5)
+    assert len(published) == 5
+
+
+def test_coalescer_errors():
+    """Test logging the failures of the deferred publications."""
+    calls = []
+
+    def publish(channel, message):
+        calls.append(message)
+        if message == 2:
+            raise ValueError('broker down')
+
+    coalescer = Coalescer(publish, 0.1)
+    coalescer('progress', 'channel', 1)
+    coalescer('progress', 'channel', 2)
+    with mock.patch('invenio_sse.coalesce.logger') as logger:
+        time.sleep(0.5)
+    assert logger.exception.called
+    assert coalescer._thread.daemon and coalescer._thread.is_alive()
+
+    # the flusher thread keeps running after a failure
+    coalescer('progress', 'channel', 3)
+    time.sleep(0.5)
+    assert calls == [1, 2, 3]
+
+
+def test_throttle():
+    """Test throttling the events of a stream."""
+    throttle = Throttle(1)
+    first, second, third = [
+        Event('channel', {'data': i, 'event': 'progress'}) for i in range(3)]
+    other = Event('channel', {'data': 'other'})
+    assert throttle.offer(first, now=10)
+    assert not throttle.offer(second, now=10.2)
+    assert not throttle.offer(third, now=10.5)
+    assert throttle.offer(other, now=10.5)
+    assert throttle.timeout(now=10.5) == 0.5
+    assert throttle.due(now=10.9) == []
+    assert throttle.due(now=11) == [third]
+    assert throttle.timeout() is None
+    assert not throttle.offer(first, now=11.5)
+    assert throttle.flush() == [first]
+
+
+def test_publish_coalesce(memory_app):
+    """Test publishing coalesced events."""
+    current_app.config['SSE_COALESCE_WINDOW'] = 0.2
+    current_sse.coalescer.window = 0.2
+    pubsub = current_sse._pubsub()
+    pubsub.subscribe('coalesced')
+    time.sleep(1)
+    assert pubsub.get_message()['type'] == 'subscribe'
+
+    for i in range(5):
+        current_sse.publish(i, channel='coalesced', coalesce='progress')
+    time.sleep(1)
+    data = []
+    message = pubsub.get_message()
+    while message:
+        data.append(json.loads(message['data'].decode('utf-8'))['data'])
+        message = pubsub.get_message()
+    assert data == [0, 4]
+
+
+def test_messages_throttle(memory_app):
+    """Test throttling the streamed events."""
+    messages = current_sse.messages(channel='throttled', throttle=0.5)
+    received = []
+    consumer = threading.Thread(
+        target=lambda: received.extend(next(messages) for _ in range(2)))
+    consumer.start()
+    time.sleep(1)
+    for i in range(5):
+        current_sse.publish(i, channel='throttled', id_=i + 1)
+    consumer.join(5)
+    messages.close()
+    assert received == [b'data: 0\nid:1\n\n', b'data: 4\nid:5\n\n']
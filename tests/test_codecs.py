@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""JSON codecs tests."""
+
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from invenio_sse import current_sse
+from invenio_sse.codecs import JSONCodec, OrjsonCodec, UjsonCodec, \
+    fastest_codec
+from invenio_sse.hub import Event
+from invenio_sse.utils import format_sse_event
+
+
+def _codecs():
+    """Get the installed codecs."""
+    codecs = [JSONCodec]
+    for codec in (OrjsonCodec, UjsonCodec):
+        try:
+            codec()
+        except RuntimeError:
+            continue
+        codecs.append(codec)
+    return codecs
+
+
+@pytest.mark.parametrize('codec_class', _codecs())
+def test_codec(codec_class):
+    """Test the codecs round trip."""
+    codec = codec_class()
+    obj = {'data': {'a': [1, 2.5, None, True]}, 'id': 'é'}
+    payload = codec.dumps(obj)
+    assert isinstance(payload, bytes)
+    assert codec.loads(payload) == obj
+    assert codec.loads(payload.decode('utf-8')) == obj
+    assert codec.loads(JSONCodec().dumps(obj)) == obj
+
+    message = format_sse_event({'data': 'hello\nworld'}, codec=codec)
+    assert message == b'data: "hello\\nworld"\n\n'
+    event = Event.from_payload('sse', payload, codec=codec)
+    assert event.message == obj
+    assert Event.from_payload('sse', b'not json', codec=codec) is None
+
+
+@pytest.mark.parametrize('codec_class', _codecs())
+def test_serialized_data(codec_class):
+    """Test reusing the serialized data of the payloads."""
+    codec = codec_class()
+    data = {'data': 'x' * 300, 'retry': ['"data": 1}'], 'y': '\\'}
+    message = {'id': 1, 'event': '"data": "}', 'retry': None, 'data': data}
+    event = Event.from_payload('sse', codec.dumps(message), codec=codec)
+    assert event.data == codec.dumps(data)
+    assert event.frame == format_sse_event(message, codec=codec)
+
+    # payloads whose data is not the last member are serialized again
+    message = {'id': 1, 'data': data, 'event': None, 'retry': None}
+    event = Event.from_payload('sse', codec.dumps(message), codec=codec)
+    assert event.data is None
+    assert event.frame == format_sse_event(message, codec=codec)
+
+    # small data is serialized again
+    message = {'id': 1, 'event': None, 'retry': None, 'data': 'x'}
+    assert Event.from_payload(
+        'sse', codec.dumps(message), codec=codec).data is None
+
+
+def test_fastest_codec():
+    """Test the fastest codec."""
+    assert isinstance(fastest_codec(), tuple(_codecs()))
+
+
+@pytest.mark.parametrize('codec_class', _codecs())
+def test_publish(memory_app, codec_class):
+    """Test publishing with a configured codec."""
+    current_sse.codec = codec_class()
+    assert current_sse.hub.codec is current_sse.codec
+    subscription = current_sse.hub.subscribe(['sse'])
+    try:
+        assert subscription.ready.wait(5)
+        current_sse.publish({'a': 'é'}, type_='test', id_=1)
+        event = subscription.get(timeout=5)
+        assert event.message['data'] == {'a': 'é'}
+        assert event.frame.startswith(b'event:test\n')
+    finally:
+        subscription.close()
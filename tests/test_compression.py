@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Stream compression tests."""
+
+from __future__ import absolute_import, print_function
+
+import zlib
+
+from flask import current_app
+
+from invenio_sse import current_sse
+from invenio_sse.compression import ENCODINGS, StreamCompressor, \
+    compress_frames, negotiate_encoding
+
+FRAMES = [
+    b'event:progress\ndata: {"state": "saving", "progress": 10}\nid:1\n\n',
+    b'event:progress\ndata: {"state": "saving", "progress": 20}\nid:2\n\n',
+]
+
+
+def test_negotiate_encoding():
+    """Test choosing the content encoding."""
+    assert negotiate_encoding('gzip, deflate') == 'gzip'
+    assert negotiate_encoding('gzip;q=0.5, deflate') == 'deflate'
+    assert negotiate_encoding('br, *') == 'gzip'
+    assert negotiate_encoding('gzip;q=0, br') is None
+    assert negotiate_encoding('') is None
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding('gzip', encodings=['deflate']) is None
+
+
+def test_compress_frames():
+    """Test that every frame is decompressed as soon as it is received."""
+    for encoding in ('gzip', 'deflate'):
+        for dictionary in (None, '"state": "saving", "progress"'):
+            compressor = StreamCompressor(encoding, dictionary=dictionary)
+            assert compressor.encoding == encoding
+            chunks = compress_frames(iter(FRAMES), compressor)
+            decompressor = zlib.decompressobj(ENCODINGS[encoding])
+            preamble = decompressor.decompress(next(chunks))
+            if dictionary:
+                assert preamble == b': ' + dictionary.encode('utf-8') + \
+                    b'\n\n'
+            else:
+                assert preamble == b''
+            for frame in FRAMES:
+                assert decompressor.decompress(next(chunks)) == frame
+            decompressor.decompress(next(chunks))
+            assert decompressor.eof
+
+    # the dictionary makes the first event smaller
+    plain = compress_frames(iter(FRAMES), StreamCompressor('gzip'))
+    warmed = compress_frames(iter(FRAMES), StreamCompressor(
+        'gzip', dictionary='event:progress\ndata: {"state": "saving", '
+                           '"progress": '))
+    next(plain), next(warmed)
+    assert len(next(warmed)) < len(next(plain))
+
+
+def test_compress_frames_close():
+    """Test that closing the compressed stream closes the frames."""
+    closed = []
+
+    def frames():
+        try:
+            yield FRAMES[0]
+        finally:
+            closed.append(True)
+
+    chunks = compress_frames(frames(), StreamCompressor('deflate'))
+    next(chunks), next(chunks)
+    chunks.close()
+    assert closed == [True]
+
+
+def test_response(memory_app):
+    """Test the streaming response."""
+    current_app.config['SSE_COMPRESSION'] = True
+    with current_app.test_request_context(
+            headers={'Accept-Encoding': 'gzip'}):
+        response = current_sse.response(iter(FRAMES))
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert zlib.decompress(b''.join(response.response),
+                               ENCODINGS['gzip']) == b''.join(FRAMES)
+
+    with current_app.test_request_context():
+        response = current_sse.response(iter(FRAMES))
+        assert 'Content-Encoding' not in response.headers
+        assert b''.join(response.response) == b''.join(FRAMES)
+
+    with current_app.test_request_context(
+            headers={'Accept-Encoding': 'gzip'}):
+        response = current_sse.response(iter(FRAMES), compress=False)
+        assert 'Content-Encoding' not in response.headers
+        assert 'Vary' not in response.headers
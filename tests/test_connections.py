@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Redis connections tests."""
+
+from __future__ import absolute_import, print_function
+
+import mock
+from flask import current_app
+from redis import BlockingConnectionPool
+
+from invenio_sse import current_sse
+from invenio_sse.connections import PUBLISHER, SUBSCRIBER, create_client, \
+    redis_options, redis_url
+
+
+def test_redis_url(app):
+    """Test the fallback of the Redis URL."""
+    current_app.config.update(SSE_REDIS_URL='redis://sse:6379/1',
+                              CACHE_REDIS_URL='redis://cache:6379/2')
+    assert redis_url(current_app) == 'redis://sse:6379/1'
+    current_app.config['SSE_REDIS_URL'] = None
+    assert redis_url(current_app) == 'redis://cache:6379/2'
+    current_app.config['CACHE_REDIS_URL'] = None
+    assert redis_url(current_app) == 'redis://localhost:6379/0'
+
+
+def test_pools(app):
+    """Test the connection pools of the publishers and subscribers."""
+    current_app.config.update(
+        SSE_REDIS_MAX_CONNECTIONS=7,
+        SSE_REDIS_SOCKET_TIMEOUT=3,
+        SSE_REDIS_OPTIONS={'client_name': 'sse'},
+    )
+    publisher = create_client(current_app)
+    pool = publisher.connection_pool
+    assert isinstance(pool, BlockingConnectionPool)
+    assert pool.max_connections == 7
+    assert pool.connection_kwargs['socket_timeout'] == 3
+    assert pool.connection_kwargs['client_name'] == 'sse'
+    # pools are shared by the clients with the same settings
+    assert create_client(current_app).connection_pool is pool
+
+    subscriber = create_client(current_app, SUBSCRIBER)
+    assert subscriber.connection_pool is not pool
+    assert subscriber.connection_pool.connection_kwargs.get(
+        'socket_timeout') is None
+    assert 'max_connections' not in redis_options(current_app, SUBSCRIBER)
+    assert current_sse._pubsub().connection_pool is \
+        current_sse.broker._subscriber_redis.connection_pool
+
+
+def test_client_factory(app):
+    """Test replacing the Redis clients."""
+    factory = mock.Mock()
+    current_app.config['SSE_REDIS_CLIENT_FACTORY'] = factory
+    assert create_client(current_app) is factory.return_value
+    factory.assert_called_once_with(current_app, PUBLISHER)
+
+
+def test_sentinel(app):
+    """Test connecting to the master of a Sentinel service."""
+    current_app.config.update(
+        SSE_REDIS_SENTINELS=[('sentinel1', 26379), ('sentinel2', 26379)],
+        SSE_REDIS_SENTINEL_SERVICE='sse',
+        SSE_REDIS_SENTINEL_OPTIONS={'password': 'secret'},
+    )
+    with mock.patch('invenio_sse.connections.Sentinel') as sentinel:
+        client = create_client(current_app, SUBSCRIBER)
+        assert create_client(current_app, SUBSCRIBER) is client
+    sentinel.assert_called_once_with(
+        (('sentinel1', 26379), ('sentinel2', 26379)),
+        sentinel_kwargs={'password': 'secret'})
+    master_for = sentinel.return_value.master_for
+    assert master_for.return_value is client
+    assert master_for.call_args[0] == ('sse', )
+    assert 'socket_timeout' not in master_for.call_args[1]
+
+
+def test_cluster(app):
+    """Test connecting to a Redis Cluster."""
+    current_app.config.update(
+        SSE_REDIS_URL='redis://node1:7000/0',
+        SSE_REDIS_CLUSTER=True,
+    )
+    with mock.patch('invenio_sse.connections.RedisCluster') as cluster:
+        client = create_client(current_app)
+    assert client is cluster.from_url.return_value
+    assert cluster.from_url.call_args[0] == ('redis://node1:7000/0', )
+    assert cluster.from_url.call_args[1]['max_connections'] == \
+        current_app.config['SSE_REDIS_MAX_CONNECTIONS']
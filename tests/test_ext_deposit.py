@@ -33,11 +33,16 @@ import time
 import pkg_resources
 import pytest
 from flask import url_for
+from flask_login import user_logged_in
 from flask_security import url_for_security
-from mock import patch
+from invenio_access.models import ActionUsers
+from mock import Mock, patch
+from sqlalchemy import event
+from werkzeug.exceptions import Unauthorized
 
-from invenio_sse import current_sse
-from invenio_sse.contrib.deposit import InvenioSSEDeposit
+from invenio_sse.contrib.deposit import InvenioSSEDeposit, deposit_channel, \
+    publish
+from invenio_sse.contrib.deposit.rest import DepositSSE
 
 
 def test_deposit_extension(app_deposit, deposit_integration):
@@ -58,8 +63,8 @@ def test_deposit_sse(app_deposit, db, deposit, users, deposit_integration):
                 password='tester'
             ))
 
-            channel = url_for('invenio_deposit_sse.depid_sse',
-                              pid_value=deposit['_deposit']['id'])
+            url = url_for('invenio_deposit_sse.depid_sse',
+                          pid_value=deposit['_deposit']['id'])
 
             message = 'Hello World!'
 
@@ -76,7 +81,7 @@ def test_deposit_sse(app_deposit, db, deposit, users, deposit_integration):
                 def run(self):
                     with app_deposit.app_context():
                         # Connect to SSE channel
-                        resp = client.get(channel)
+                        resp = client.get(url)
                         self._return = (resp.status_code,
                                         resp.headers['Content-Type'],
                                         next(resp.response).decode('utf-8'))
@@ -87,9 +92,170 @@ def test_deposit_sse(app_deposit, db, deposit, users, deposit_integration):
             time.sleep(1)
 
             # Publish message
-            current_sse.publish(data=message, channel=channel, type_='message')
+            publish('depid', deposit['_deposit']['id'], message,
+                    type_='message')
 
             (status_code, content_type, msg) = connect_thread.join()
             assert status_code == 200
             assert 'text/event-stream' in content_type
             assert message in msg
+
+
+def test_deposit_permission_cache(app_deposit, db, deposit, users,
+                                  deposit_integration):
+    ext = app_deposit.extensions['invenio-sse-deposit']
+    cache = ext.permission_cache
+    pid_value = deposit['_deposit']['id']
+    cache.invalidate()
+
+    cache.set('depid', pid_value, users[0].id, True)
+    assert cache.get('depid', pid_value, users[0].id) is True
+    assert cache.get('depid', pid_value, None) is None
+
+    # changing the deposit drops its decisions once committed
+    with app_deposit.test_request_context():
+        deposit['title'] = 'bar'
+        deposit.commit()
+        assert cache.get('depid', pid_value, users[0].id) is True
+        db.session.commit()
+    assert cache.get('depid', pid_value, users[0].id) is None
+
+    # changing the access rules drops all the decisions once committed
+    cache.set('depid', pid_value, users[0].id, True)
+    with app_deposit.test_request_context():
+        db.session.add(ActionUsers(action='deposit-admin-access',
+                                   user=users[1]))
+        db.session.flush()
+        assert cache.get('depid', pid_value, users[0].id) is True
+        db.session.commit()
+    assert cache.get('depid', pid_value, users[0].id) is None
+
+    # reconnecting clients reuse the decision
+    with app_deposit.test_request_context():
+        channel = url_for('invenio_deposit_sse.depid_sse',
+                          pid_value=pid_value)
+    with patch.object(DepositSSE, 'check_read_permission',
+                      side_effect=Unauthorized()) as check:
+        with app_deposit.test_client() as client:
+            assert client.get(channel).status_code == 401
+            assert client.get(channel).status_code == 401
+    assert check.call_count == 1
+    assert cache.get('depid', pid_value, None) is False
+
+
+def test_deposit_revalidation(app_deposit, db, deposit, users,
+                              deposit_integration):
+    ext = app_deposit.extensions['invenio-sse-deposit']
+    revalidator = ext.revalidator
+    pid_value = deposit['_deposit']['id']
+    ext.permission_cache.invalidate()
+
+    owner, anonymous, closed = [Mock(closed=False) for _ in range(3)]
+    closed.closed = True
+    revalidator.register('depid', pid_value, str(users[0].id), owner)
+    revalidator.register('depid', pid_value, None, anonymous)
+    revalidator.register('depid', pid_value, str(users[1].id), closed)
+
+    with patch.object(revalidator, 'can_read',
+                      side_effect=lambda factory, record, user_id:
+                      user_id is not None) as can_read:
+        assert revalidator.revalidate() == 1
+    # one check per user, closed streams are forgotten
+    assert can_read.call_count == 2
+    anonymous.stop.assert_called_once_with(discard=True)
+    assert not owner.stop.called
+    assert not closed.stop.called
+
+    # decisions are taken from the permission cache
+    with patch.object(revalidator, 'can_read') as can_read:
+        assert revalidator.revalidate() == 1
+    assert not can_read.called
+
+    # the owner may read the deposit, other users may not
+    with app_deposit.app_context():
+        record = deposit.__class__.get_record(deposit.id)
+        resolver, factory = revalidator.endpoints['depid']
+        with patch.object(user_logged_in, 'send') as logged_in:
+            assert revalidator.can_read(factory, record, str(users[0].id))
+            assert not revalidator.can_read(factory, record, None)
+        # checking does not log the users in
+        assert not logged_in.called
+
+
+def test_deposit_sse_releases_db(app_deposit, db, deposit, users,
+                                 deposit_integration):
+    app_deposit.config['SSE_DEPOSIT_PERMISSION_CACHE_TTL'] = None
+    checked_out = []
+
+    def checkout(*args):
+        checked_out.append(True)
+
+    def checkin(*args):
+        checked_out.pop()
+
+    with app_deposit.test_request_context():
+        with app_deposit.test_client() as client:
+            client.post(url_for_security('login'), data=dict(
+                email=users[0].email,
+                password='tester'
+            ))
+            url = url_for('invenio_deposit_sse.depid_sse',
+                          pid_value=deposit['_deposit']['id'])
+
+            event.listen(db.engine, 'checkout', checkout)
+            event.listen(db.engine, 'checkin', checkin)
+            try:
+                resp = client.get(url)
+                assert resp.status_code == 200
+                frames = []
+                stream = threading.Thread(
+                    target=lambda: frames.append(next(resp.response)))
+                stream.start()
+                time.sleep(1)
+                # the open stream holds no database connection
+                assert checked_out == []
+                publish('depid', deposit['_deposit']['id'], 'released')
+                stream.join(5)
+                assert b'released' in frames[0]
+                resp.close()
+            finally:
+                event.remove(db.engine, 'checkout', checkout)
+                event.remove(db.engine, 'checkin', checkin)
+
+
+def test_deposit_channel(app_deposit):
+    # no request context is needed to publish
+    with app_deposit.app_context():
+        assert deposit_channel('depid', '1') == 'deposit:depid:1'
+    app_deposit.config['SSE_DEPOSIT_CHANNEL'] = 'd:{pid_type}:{pid_value}'
+    assert deposit_channel('depid', 1, app=app_deposit) == 'd:depid:1'
+
+
+def test_deposit_events(app_deposit, db, deposit, users, deposit_integration):
+    state = app_deposit.extensions['invenio-sse']
+    pid_value = deposit['_deposit']['id']
+    channel = deposit_channel('depid', pid_value, app=app_deposit)
+
+    with patch.object(state, 'publish_many') as publish_many:
+        # one event per deposit and transaction
+        with app_deposit.test_request_context():
+            deposit['title'] = 'bar'
+            deposit.commit()
+            deposit['title'] = 'baz'
+            deposit.commit()
+            db.session.commit()
+        assert publish_many.call_count == 1
+        events = list(publish_many.call_args[0][0])
+        assert len(events) == 1
+        assert events[0]['channel'] == channel
+        assert events[0]['type_'] == 'updated'
+        assert events[0]['data']['id'] == pid_value
+        assert {'op': 'replace', 'path': '/title', 'value': 'baz'} in \
+            events[0]['data']['patch']
+
+        # nothing is published when rolled back
+        with app_deposit.test_request_context():
+            deposit['title'] = 'qux'
+            deposit.commit()
+            db.session.rollback()
+        assert publish_many.call_count == 1
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Event ID generators tests."""
+
+from __future__ import absolute_import, print_function
+
+import json
+from time import sleep
+
+import mock
+from flask import current_app
+
+from invenio_sse import current_sse
+from invenio_sse.ids import RedisCounterIDGenerator, SnowflakeIDGenerator, \
+    TimestampIDGenerator
+
+
+def test_timestamp(app):
+    """Test the default generator."""
+    assert isinstance(current_sse.id_generator, TimestampIDGenerator)
+    assert isinstance(current_sse.id_generator('sse'), float)
+
+
+def test_snowflake(app):
+    """Test the snowflake generator."""
+    current_app.config['SSE_EVENT_ID_WORKER'] = 42
+    generator = SnowflakeIDGenerator(app)
+    ids = [generator('sse') for _ in range(10000)]
+    assert ids == sorted(set(ids))
+    assert all((id_ >> 12) & 0x3ff == 42 for id_ in ids)
+    assert ids[-1] < 2 ** 63
+
+    # processes are numbered by Redis by default
+    current_app.config['SSE_EVENT_ID_WORKER'] = None
+    first, second = SnowflakeIDGenerator(app), SnowflakeIDGenerator(app)
+    assert first.worker != second.worker
+    assert first.worker == first.worker
+
+
+def test_redis_counter(app, counter_channel):
+    """Test IDs assigned by the Redis counter."""
+    channel = counter_channel
+    current_app.config['SSE_HISTORY_MAXLEN'] = 10
+    current_sse.id_generator = RedisCounterIDGenerator(app)
+    pubsub = current_sse._pubsub()
+    pubsub.subscribe(channel)
+    sleep(1)
+    assert pubsub.get_message()['type'] == 'subscribe'
+
+    assert current_sse.publish(data='first', channel=channel) == 1
+    current_sse.publish(data='second', channel=channel, type_='mytype')
+    current_sse.publish_many([dict(data='third', channel=channel)])
+
+    sleep(1)
+    messages = [json.loads(pubsub.get_message()['data'].decode('utf-8'))
+                for _ in range(3)]
+    assert [(m['id'], m['data']) for m in messages] == [
+        (1, 'first'), (2, 'second'), (3, 'third')]
+    assert messages[1]['event'] == 'mytype'
+
+    # resuming looks the event up instead of scanning the history
+    with mock.patch.object(current_sse.broker._redis,
+                           'xrevrange') as xrevrange:
+        assert [e.id for e in current_sse.history(channel, 1)] == [2, 3]
+        assert current_sse.history(channel, 3) == []
+        assert not xrevrange.called
+
+
+def test_redis_counter_reset(app, counter_channel):
+    """Test IDs following the history when the counter is lost."""
+    channel = counter_channel
+    current_app.config['SSE_HISTORY_MAXLEN'] = 10
+    current_sse.id_generator = RedisCounterIDGenerator(app)
+    for data in ('old1', 'old2', 'old3'):
+        current_sse.publish(data=data, channel=channel)
+
+    current_sse.broker._redis.delete(
+        current_app.config['SSE_EVENT_ID_COUNTER_KEY'].format(
+            channel=channel))
+    current_sse.publish(data='new4', channel=channel)
+    current_sse.publish(data='new5', channel=channel)
+
+    assert [(e.id, e.message['data'])
+            for e in current_sse.history(channel, 1)] == [
+        (2, 'old2'), (3, 'old3'), (4, 'new4'), (5, 'new5')]
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2016 CERN.
+#
+# Invenio is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Instrumentation tests."""
+
+from __future__ import absolute_import, print_function
+
+from time import sleep
+
+import mock
+import pytest
+from flask import current_app
+
+from invenio_sse import current_sse
+from invenio_sse.instrumentation import Instrumentation
+
+
+class RecordingInstrumentation(Instrumentation):
+    """Instrumentation recording the notifications."""
+
+    def __init__(self, app):
+        """Initialize the records."""
+        super(RecordingInstrumentation, self).__init__(app)
+        self.calls = []
+
+    def published(self, channel, subscribers):
+        """Record the publication."""
+        self.calls.append(('published', channel))
+
+    def subscribed(self, subscription):
+        """Record the subscription."""
+        self.calls.append(('subscribed', subscription.channels))
+
+    def unsubscribed(self, subscription):
+        """Record the unsubscription."""
+        self.calls.append(('unsubscribed', subscription.channels))
+
+    def formatted(self, event, seconds):
+        """Record the formatted event."""
+        assert seconds >= 0
+        self.calls.append(('formatted', event.message['data']))
+
+    def dropped(self, subscription, count):
+        """Record the dropped events."""
+        self.calls.append(('dropped', count))
+
+    def written(self, size):
+        """Record the written bytes."""
+        self.calls.append(('written', size))
+
+
+def test_instrumentation(memory_app):
+    """Test the notifications of the instrumentation."""
+    current_app.config['SSE_HEARTBEAT_INTERVAL'] = 0.5
+    current_sse.instrumentation = instrumentation = \
+        RecordingInstrumentation(current_app)
+    current_sse.hub.queue_size = 1
+
+    messages = current_sse.messages(channel='instrumented')
+    assert next(messages) == b':\n\n'
+    current_sse.publish('hello', channel='instrumented', id_=1)
+    assert next(messages) == b'data: "hello"\nid:1\n\n'
+    current_sse.publish_many([
+        dict(data=i, channel='instrumented', id_=i) for i in (2, 3)])
+    sleep(1)
+    messages.close()
+
+    # publishers, the hub reader and the stream run in different threads
+    def calls(*names):
+        return [call for call in instrumentation.calls if call[0] in names]
+
+    assert calls('published') == [('published', 'instrumented')] * 3
+    assert calls('subscribed', 'written', 'unsubscribed') == [
+        ('subscribed', ('instrumented', )),
+        ('written', 3),
+        ('written', 20),
+        ('unsubscribed', ('instrumented', )),
+    ]
+    assert calls('formatted', 'dropped') == [
+        ('formatted', 'hello'),
+        ('formatted', 2),
+        ('formatted', 3),
+        ('dropped', 1),
+    ]
+
+
+def test_prometheus(memory_app):
+    """Test the Prometheus metrics endpoint."""
+    pytest.importorskip('prometheus_client')
+    from invenio_sse.contrib.prometheus import InvenioSSEPrometheus, \
+        PrometheusInstrumentation
+
+    current_app.config['SSE_METRICS_URL'] = '/sse/metrics'
+    InvenioSSEPrometheus(current_app)
+    assert isinstance(current_sse.instrumentation, PrometheusInstrumentation)
+
+    subscription = current_sse.hub.subscribe(['metrics:1'])
+    try:
+        assert subscription.ready.wait(5)
+        current_sse.publish('hello', channel='metrics:1')
+        sleep(1)
+        with current_app.test_client() as client:
+            res = client.get('/sse/metrics')
+            current_app.config['SSE_METRICS_PERMISSION_FACTORY'] = \
+                lambda: mock.Mock(can=lambda: False)
+            assert client.get('/sse/metrics').status_code == 403
+        assert res.status_code == 200
+        metrics = res.get_data(as_text=True)
+        assert 'sse_published_events_total{channel="metrics"} 1.0' in metrics
+        assert 'sse_subscriptions 1.0' in metrics
+        assert 'sse_queued_events 1.0' in metrics
+        assert 'sse_format_seconds_count 1.0' in metrics
+    finally:
+        subscription.close()
+
+
+def test_prometheus_channel_labels(memory_app):
+    """Test the labels of the channels in the Prometheus metrics."""
+    pytest.importorskip('prometheus_client')
+    from invenio_sse.contrib.prometheus import PrometheusInstrumentation
+
+    instrumentation = PrometheusInstrumentation(current_app)
+    assert instrumentation.channel_label('deposit:depid:1') == 'deposit:depid'
+    assert instrumentation.channel_label('sse') == ''
+    current_app.config['SSE_METRICS_CHANNEL_LABELS'] = True
+    assert instrumentation.channel_label('deposit:depid:1') == \
+        'deposit:depid:1'
@@ -31,9 +31,13 @@ import json
 from time import sleep
 
 import mock
-from flask import Flask
+import pytest
+from flask import Flask, current_app
+from redis import exceptions as redis_exceptions
 
 from invenio_sse import InvenioSSE, current_sse
+from invenio_sse.hub import Backoff, Event, ShardedSSEHub, SSEHub, \
+    Subscription, queue
 
 
 def test_version():
@@ -116,7 +120,350 @@ def test_pubsub(app):
                         return_value=pubsub):
             message = next(current_sse.messages(channel=channel))
             assert message == \
-                'event:mytype2\ndata: "hello2"\nid:789\nretry:456\n\n'
+                b'event:mytype2\ndata: "hello2"\nid:789\nretry:456\n\n'
             # check you subscribe to the right channel
             (((subscribed, ), _), ) = pubsub.subscribe.call_args_list
             assert subscribed == channel
+
+
+def test_hub(app):
+    """Test that all subscribers share a single pub/sub connection."""
+    with app.test_request_context(), \
+            mock.patch.object(current_sse, '_pubsub',
+                              wraps=current_sse._pubsub) as pubsub:
+        hub = current_sse.hub
+        first = hub.subscribe('channel1')
+        second = hub.subscribe('channel1')
+        other = hub.subscribe('channel2')
+        assert hub.channels == {'channel1', 'channel2'}
+
+        sleep(1)
+        current_sse.publish(data='hello', channel='channel1')
+        event = first.get(timeout=5)
+        assert event.frame.startswith(b'data: "hello"\nid:')
+        # the same formatted event is shared by all subscribers
+        assert second.get(timeout=5) is event
+        with pytest.raises(queue.Empty):
+            other.get(timeout=1)
+        assert pubsub.call_count == 1
+
+        first.close()
+        assert hub.channels == {'channel1', 'channel2'}
+        second.close()
+        other.close()
+        assert hub.channels == set()
+
+
+def test_resubscribe(app):
+    """Test replacing the pub/sub connection after a connection error."""
+    hub = current_sse.hub
+    subscription = hub.subscribe('resubscribed')
+    assert subscription.ready.wait(5)
+    broken = hub._pubsub
+    with mock.patch.object(broken, 'get_message',
+                           side_effect=redis_exceptions.ConnectionError):
+        sleep(2)
+    assert hub._pubsub is not broken
+    sleep(1)
+    current_sse.publish(data='hello', channel='resubscribed', id_=1)
+    assert subscription.get(timeout=5).frame == b'data: "hello"\nid:1\n\n'
+    assert not subscription.closed
+    subscription.close()
+
+
+def test_backoff():
+    """Test the jittered exponential backoff."""
+    delays = list(Backoff(base=1, cap=5, attempts=5).delays())
+    assert len(delays) == 5
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= min(5, 2 ** attempt)
+    delays = Backoff(base=1, cap=5).delays()
+    assert all(next(delays) <= 5 for _ in range(100))
+
+
+def test_reconnect(app):
+    """Test dropping the subscribers when Redis stays unreachable."""
+    pubsub = mock.Mock()
+    pubsub.get_message.side_effect = redis_exceptions.ConnectionError
+    factory = mock.Mock(return_value=pubsub)
+    instrumentation = mock.Mock()
+    hub = SSEHub(factory, backoff=Backoff(base=0.01, attempts=3),
+                 drop_retry=(1000, 2000), instrumentation=instrumentation)
+    subscription = hub.subscribe('unreachable')
+    pubsub.subscribe.side_effect = redis_exceptions.ConnectionError
+    assert subscription.get(timeout=5) is None
+    assert 1000 <= subscription.retry <= 2000
+    instrumentation.unsubscribed.assert_called_once_with(subscription)
+    # one connection to subscribe, then one per attempt
+    assert factory.call_count == 4
+    assert pubsub.close.call_count == 4
+
+
+def test_unsubscribe_reconnecting(app):
+    """Test closing subscriptions while the hub is reconnecting."""
+    failures = []
+
+    def get_message(timeout):
+        if failures:
+            raise failures.pop()
+        sleep(timeout)
+
+    pubsub = mock.Mock()
+    pubsub.get_message.side_effect = get_message
+    hub = SSEHub(lambda: pubsub,
+                 backoff=mock.Mock(delays=lambda: iter([1])))
+    hub.poll_timeout = 0.01
+    first, second, third = [hub.subscribe(channel)
+                            for channel in ('first', 'second', 'third')]
+
+    # a broken connection not discarded yet
+    pubsub.unsubscribe.side_effect = redis_exceptions.ConnectionError
+    first.close()
+
+    # the connection is discarded, waiting for the next one
+    failures.append(redis_exceptions.ConnectionError())
+    sleep(0.5)
+    assert hub._pubsub is None
+    second.close()
+    assert pubsub.unsubscribe.call_count == 1
+
+    # only the remaining channels are subscribed again
+    pubsub.subscribe.reset_mock()
+    sleep(1)
+    pubsub.subscribe.assert_called_once_with('third')
+    assert hub.channels == set(['third'])
+    assert not third.closed
+    third.close()
+
+
+def test_sharded(app):
+    """Test sharded pub/sub."""
+    messages = [
+        {'type': 'ssubscribe', 'pattern': None, 'channel': b'shard',
+         'data': 1},
+        {'type': 'smessage', 'pattern': None, 'channel': b'shard',
+         'data': json.dumps({'data': 'hello', 'id': 1}).encode('utf-8')},
+    ]
+
+    def get_sharded_message(timeout):
+        if messages:
+            return messages.pop(0)
+        sleep(timeout)
+
+    pubsub = mock.Mock()
+    pubsub.get_sharded_message.side_effect = get_sharded_message
+    hub = ShardedSSEHub(lambda: pubsub)
+    hub.poll_timeout = 0.01
+    with pytest.raises(ValueError):
+        hub.subscribe([], patterns=['shard*'])
+    subscription = hub.subscribe('shard')
+    assert subscription.ready.wait(5)
+    pubsub.ssubscribe.assert_called_once_with('shard')
+    assert subscription.get(timeout=5).frame == b'data: "hello"\nid:1\n\n'
+    subscription.close()
+    pubsub.sunsubscribe.assert_called_once_with('shard')
+
+    current_sse.broker.sharded = True
+    with mock.patch.object(current_sse.broker._redis, 'spublish',
+                           return_value=3) as spublish:
+        assert current_sse.publish('hello', channel='shard', id_=1) == 3
+    spublish.assert_called_once_with(
+        'shard', current_sse.codec.dumps(
+            {'id': 1, 'event': None, 'retry': None, 'data': 'hello'}))
+
+
+def test_publish_many(app):
+    """Test batched publishing."""
+    pubsub = current_sse._pubsub()
+    pubsub.subscribe('batch1', 'batch2')
+    sleep(1)
+    assert pubsub.get_message()['type'] == 'subscribe'
+    assert pubsub.get_message()['type'] == 'subscribe'
+
+    results = current_sse.publish_many([
+        dict(data='hello 1', channel='batch1'),
+        dict(data='hello 2', channel='batch2', type_='mytype'),
+        dict(data='hello 3', channel='nobody'),
+    ])
+    assert results == [1, 1, 0]
+
+    redis = current_sse.broker._redis
+    with mock.patch.object(redis, 'pipeline',
+                           wraps=redis.pipeline) as pipeline:
+        with current_sse.batch(max_size=2) as batch:
+            for i in range(5):
+                batch.publish(data=i, channel='batch1')
+            assert len(batch) == 1
+        assert len(batch) == 0
+        assert batch.results == [1] * 5
+        assert pipeline.call_count == 3
+
+    sleep(1)
+    received = []
+    message = pubsub.get_message()
+    while message:
+        received.append((message['channel'].decode('utf-8'),
+                         json.loads(message['data'].decode('utf-8'))['data']))
+        message = pubsub.get_message()
+    assert received == [('batch1', 'hello 1'), ('batch2', 'hello 2')] + [
+        ('batch1', i) for i in range(5)]
+
+
+def test_history(app):
+    """Test replaying the events missed by a reconnecting client."""
+    channel = 'historychannel'
+    current_app.config['SSE_HISTORY_MAXLEN'] = 10
+    for id_ in range(1, 4):
+        current_sse.publish(data=id_, channel=channel, id_=id_)
+    current_sse.publish_many([dict(data=4, channel=channel, id_=4)])
+
+    assert [e.id for e in current_sse.history(channel, 1)] == [2, 3, 4]
+    assert current_sse.history(channel, 4) == []
+    assert current_sse.history(channel, 'unknown') == []
+
+    # replay from the Last-Event-ID header then stream live events
+    with app.test_request_context(headers={'Last-Event-ID': '2'}):
+        messages = current_sse.messages(channel=channel)
+    assert next(messages) == b'data: 3\nid:3\n\n'
+    assert next(messages) == b'data: 4\nid:4\n\n'
+    current_sse.publish(data=5, channel=channel, id_=5)
+    assert next(messages) == b'data: 5\nid:5\n\n'
+    messages.close()
+
+
+def test_heartbeat(app):
+    """Test heartbeat comments on idle streams."""
+    current_app.config['SSE_HEARTBEAT_INTERVAL'] = 0.5
+    messages = current_sse.messages(channel='heartbeatchannel')
+    assert next(messages) == b':\n\n'
+    assert current_sse.hub.channels == {'heartbeatchannel'}
+    messages.close()
+    assert current_sse.hub.channels == set()
+
+
+def test_reap(app):
+    """Test dropping subscribers whose consumer is gone."""
+    hub = current_sse.hub
+    hub.idle_timeout = 10
+    idle = hub.subscribe('reapchannel')
+    waiting = hub.subscribe('reapchannel')
+    active = hub.subscribe('reapchannel')
+    idle.last_seen -= 60
+    waiting.last_seen -= 60
+    waiting.waiting = True
+
+    assert hub.reap() == 1
+    assert idle.get(timeout=1) is None
+    assert hub.channels == {'reapchannel'}
+    waiting.close()
+    active.close()
+    assert hub.channels == set()
+
+
+@pytest.mark.parametrize('overflow,expected,dropped', [
+    ('drop_oldest', ['b1', 'a2', 'b2'], 1),
+    ('drop_newest', ['a1', 'b1', 'a2'], 1),
+    ('coalesce', ['a1', 'a2', 'b2'], 1),
+    ('disconnect', [], 4),
+])
+def test_overflow(overflow, expected, dropped):
+    """Test the policies for subscribers whose queue is full."""
+    subscription = Subscription(None, 'channel', maxsize=3,
+                                overflow=overflow, overflow_retry=1000)
+    for data in ('a1', 'b1', 'a2', 'b2'):
+        subscription.put(Event('channel', {'data': data, 'event': data[0]}))
+    assert subscription.dropped == dropped
+
+    received = [subscription.get(timeout=0).message['data']
+                for _ in range(len(subscription))]
+    assert received == expected
+    if overflow == 'disconnect':
+        assert subscription.closed
+        assert subscription.retry == 1000
+
+
+def test_stop():
+    """Test ending a stream with or without its pending events."""
+    subscription = Subscription(None, 'channel')
+    subscription.put(Event('channel', {'data': 'pending'}))
+    subscription.stop(retry=1000)
+    assert subscription.get(timeout=0).message['data'] == 'pending'
+    assert subscription.get(timeout=0) is None
+    assert subscription.retry == 1000
+
+    subscription = Subscription(None, 'channel')
+    subscription.put(Event('channel', {'data': 'pending'}))
+    subscription.stop(discard=True)
+    assert subscription.get(timeout=0) is None
+
+
+def test_overflow_stream(app):
+    """Test disconnecting a stream whose queue is full."""
+    current_app.config.update(
+        SSE_SUBSCRIBER_QUEUE_SIZE=1,
+        SSE_SUBSCRIBER_OVERFLOW='disconnect',
+        SSE_SUBSCRIBER_OVERFLOW_RETRY=1234,
+        SSE_HEARTBEAT_INTERVAL=0.5,
+    )
+    messages = current_sse.messages(channel='overflowchannel')
+    assert next(messages) == b':\n\n'
+    current_sse.publish_many([
+        dict(data=i, channel='overflowchannel') for i in range(2)])
+    sleep(1)
+    assert next(messages) == b'retry:1234\n\n'
+    with pytest.raises(StopIteration):
+        next(messages)
+    assert current_sse.hub.dropped == 2
+
+
+def test_multiplexed(app):
+    """Test streaming several channels and patterns at once."""
+    current_app.config['SSE_HEARTBEAT_INTERVAL'] = 0.5
+    messages = current_sse.messages(
+        channel=['multi1', 'multi2'], patterns=['multipattern.*'])
+    assert next(messages) == b':\n\n'
+    assert current_sse.hub.channels == {'multi1', 'multi2'}
+    assert current_sse.hub.patterns == {'multipattern.*'}
+
+    current_sse.publish_many([
+        dict(data='hello 1', channel='multi1', id_=1),
+        dict(data='hello 2', channel='multipattern.2', id_=2),
+        dict(data='hello 3', channel='other', id_=3),
+        dict(data='hello 4', channel='multi2', id_=4),
+    ])
+    received = []
+    for message in messages:
+        if message != b':\n\n':
+            received.append(message)
+        if len(received) == 3:
+            break
+    assert [json.loads(m.split(b'\n')[0][len(b'data: '):]) for m in received] \
+        == [{'channel': 'multi1', 'data': 'hello 1'},
+            {'channel': 'multipattern.2', 'data': 'hello 2'},
+            {'channel': 'multi2', 'data': 'hello 4'}]
+
+    messages.close()
+    assert current_sse.hub.channels == set()
+    assert current_sse.hub.patterns == set()
+
+
+def test_filters(app):
+    """Test filtering events before sending them."""
+    current_sse.register_predicate('even', lambda data: data % 2 == 0)
+    current_app.config['SSE_HEARTBEAT_INTERVAL'] = 0.5
+    messages = current_sse.messages(
+        channel='filterchannel', types=['edit', 'message'], predicate='even')
+    assert next(messages) == b':\n\n'
+
+    current_sse.publish_many([
+        dict(data=1, channel='filterchannel', type_='edit', id_=1),
+        dict(data=2, channel='filterchannel', type_='delete', id_=2),
+        dict(data=4, channel='filterchannel', type_='edit', id_=4),
+        dict(data=6, channel='filterchannel', id_=6),
+    ])
+    assert next(messages) == b'event:edit\ndata: 4\nid:4\n\n'
+    assert next(messages) == b'data: 6\nid:6\n\n'
+    messages.close()
+
+    with pytest.raises(KeyError):
+        current_sse.messages(channel='filterchannel', predicate='unknown')
@@ -39,11 +39,11 @@ def test_format_sse_json():
         })
 
     # simplest message
-    assert 'data: "hello"\n\n' == format_sse_event({'data': 'hello'})
+    assert b'data: "hello"\n\n' == format_sse_event({'data': 'hello'})
 
     # multilines message
     message = format_sse_event({'data': 'hello\nworld'})
-    assert 'data: "hello\\nworld"\n\n' == message
+    assert b'data: "hello\\nworld"\n\n' == message
 
     # json message
     message = format_sse_event({
@@ -52,14 +52,14 @@ def test_format_sse_json():
             'b': 'world',
         }
     })
-    assert message in ('data: {"a": "hello", "b": "world"}\n\n',
-                       'data: {"b": "world", "a": "hello"}\n\n')
+    assert message in (b'data: {"a": "hello", "b": "world"}\n\n',
+                       b'data: {"b": "world", "a": "hello"}\n\n')
 
     # text with EOM (End Of Message)
     message = format_sse_event({
         'data': 'end of\n\nmessage',
     })
-    assert message == 'data: "end of\\n\\nmessage"\n\n'
+    assert message == b'data: "end of\\n\\nmessage"\n\n'
 
     # complete message
     message = format_sse_event({
@@ -67,4 +67,20 @@ def test_format_sse_json():
         'data': 'end of\n\nmessage',
         'retry': '123'
     })
-    assert message == 'event:hello\ndata: "end of\\n\\nmessage"\nretry:123\n\n'
+    assert message == \
+        b'event:hello\ndata: "end of\\n\\nmessage"\nretry:123\n\n'
+
+
+def test_format_sse_lines():
+    """Test splitting the data lines as in the SSE specification."""
+    class Codec(object):
+        def dumps(self, obj):
+            return obj
+
+    for data in (b'a\nb', b'a\rb', b'a\r\nb'):
+        assert format_sse_event({'data': data, 'id': 1}, codec=Codec()) == \
+            b'data: a\ndata: b\nid:1\n\n'
+
+    message = format_sse_event({'data': {'a': 'é'}, 'event': 'é'})
+    assert isinstance(message, bytes)
+    assert message.decode('utf-8') == 'event:é\ndata: {"a": "\\u00e9"}\n\n'